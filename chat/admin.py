@@ -1,3 +1,25 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Conversation, Message, Participant
+
+
+@admin.register(Conversation)
+class ConversationAdmin(admin.ModelAdmin):
+    list_display = ["product", "buyer", "seller", "updated_at"]
+    search_fields = ["buyer__email", "seller__email", "product__title"]
+    raw_id_fields = ["product", "buyer", "seller"]
+
+
+@admin.register(Participant)
+class ParticipantAdmin(admin.ModelAdmin):
+    list_display = ["user", "conversation", "unread_count", "last_message_at"]
+    search_fields = ["user__email"]
+    raw_id_fields = ["conversation", "user"]
+    readonly_fields = ["last_read_message_id", "last_message_id", "last_message_sender_id"]
+
+
+@admin.register(Message)
+class MessageAdmin(admin.ModelAdmin):
+    list_display = ["conversation", "sender", "created_at"]
+    search_fields = ["body", "sender__email"]
+    raw_id_fields = ["conversation", "sender"]
@@ -0,0 +1,245 @@
+# chat/consumers.py
+"""
+WebSocket endpoint for chat, as a plain ASGI application.
+
+Connect to /ws/chat/?token=<JWT access token> (browsers can't set headers on
+a WebSocket handshake). Frames are JSON:
+
+    client -> server  {"action": "send", "conversation": 12, "body": "Still available?"}
+                      {"action": "read", "conversation": 12, "up_to": 345}   (up_to optional)
+                      {"action": "typing", "conversation": 12}
+                      {"action": "ping"}
+    server -> client  {"type": "message", "message": {id, conversation, sender, body, created_at}}
+                      {"type": "read", "conversation": 12, "unread_count": 0}
+                      {"type": "typing", "conversation": 12, "user": 7, "expires_in": 6}
+                      {"type": "pong"}
+                      {"type": "error", "detail": "..."}
+
+A sent message is stored, then fanned out through the channel layer to the
+user groups of both participants, so every open connection of the buyer and
+the seller (the sender's other tabs included) receives it. A read receipt
+goes to the reader's own group only, so their other tabs clear the badge.
+
+Every frame is a presence heartbeat (chat.presence); idle clients send a
+ping more often than PRESENCE_TTL to stay online. Clients send "typing"
+on keystrokes; the other side is told on the first one and then every
+TYPING_TTL / 2, and hides the indicator after `expires_in` seconds or when
+a message from that user arrives.
+
+A frame that fails unexpectedly is logged and answered with an error frame;
+the connection stays open.
+
+The access token is checked again on every frame and, for idle connections
+that only receive, every CHAT['TOKEN_CHECK_INTERVAL'] seconds and at its
+expiry: once it has expired or been revoked (logout) the connection is
+closed with CLOSE_UNAUTHORIZED.
+"""
+import asyncio
+import json
+import logging
+import time
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from nova_project.write_queue import queued_write
+from users.authentication import CachedJWTAuthentication
+from users.revocation import revocations
+
+from .layers import chat_setting, get_channel_layer, user_group
+from .models import Conversation, Message, Participant
+from .presence import get_presence
+from .serializers import MessageSerializer
+
+# application-defined close codes (4000-4999)
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_NOT_FOUND = 4404
+
+logger = logging.getLogger(__name__)
+
+
+def authenticate_token(raw_token):
+    """(active user, validated token) for a JWT access token, with the same checks as the REST API."""
+    auth = CachedJWTAuthentication()
+    token = auth.get_validated_token(raw_token.encode('utf-8'))
+    return auth.get_user(token), token
+
+
+class ChatConsumer:
+    def __init__(self, scope, receive, send, layer=None):
+        self.scope = scope
+        self.receive = receive
+        self.send = send
+        self.layer = layer or get_channel_layer()
+        self.presence = get_presence()
+        self._last_heartbeat = None
+        self.user = None
+        self.token = None
+        self.channel = None
+        self.closed = False
+        # conversation id -> participant ids, so each conversation is checked once per connection
+        self._participants = {}
+
+    @classmethod
+    async def as_asgi(cls, scope, receive, send):
+        await cls(scope, receive, send).run()
+
+    async def run(self):
+        if (await self.receive())['type'] != 'websocket.connect':
+            return
+        self.user, self.token = await self.authenticate()
+        if self.user is None:
+            await self.send({'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+            return
+
+        self.channel = await self.layer.new_channel()
+        await self.layer.group_add(user_group(self.user.pk), self.channel)
+        await self.send({'type': 'websocket.accept'})
+        await self.touch()
+
+        writer = asyncio.create_task(self.forward_events())
+        watcher = asyncio.create_task(self.watch_token())
+        try:
+            while True:
+                event = await self.receive()
+                if event['type'] == 'websocket.receive' and not self.closed:
+                    if not await self.token_valid():
+                        await self.close(CLOSE_UNAUTHORIZED)
+                        break
+                    await self.touch()
+                    await self.receive_frame(event.get('text') or (event.get('bytes') or b'').decode('utf-8', 'replace'))
+                elif event['type'] == 'websocket.disconnect':
+                    break
+        finally:
+            writer.cancel()
+            watcher.cancel()
+            await self.layer.group_discard(user_group(self.user.pk), self.channel)
+            await self.layer.close_channel(self.channel)
+
+    async def authenticate(self):
+        params = parse_qs(self.scope.get('query_string', b'').decode('latin-1'))
+        token = (params.get('token') or [''])[0]
+        if not token:
+            return None, None
+        try:
+            return await sync_to_async(authenticate_token)(token)
+        except (InvalidToken, AuthenticationFailed):
+            return None, None
+
+    async def token_valid(self):
+        """False once the connection's access token has expired or been revoked."""
+        exp = self.token.get('exp')
+        if exp is not None and exp <= time.time():
+            return False
+        jti = self.token.get(api_settings.JTI_CLAIM)
+        return not (jti and await sync_to_async(revocations.is_revoked, thread_sensitive=False)(jti))
+
+    async def watch_token(self):
+        # a connection that only receives sends no frames to check the token on
+        interval = chat_setting('TOKEN_CHECK_INTERVAL')
+        while await self.token_valid():
+            exp = self.token.get('exp')
+            await asyncio.sleep(interval if exp is None else min(interval, max(exp - time.time(), 0)))
+        await self.close(CLOSE_UNAUTHORIZED)
+
+    async def close(self, code):
+        if not self.closed:
+            self.closed = True
+            await self.send({'type': 'websocket.close', 'code': code})
+
+    async def touch(self):
+        # a busy connection stamps presence a few times per TTL, not per frame
+        now = time.monotonic()
+        if self._last_heartbeat is None or now - self._last_heartbeat >= self.presence.ttl / 4:
+            self._last_heartbeat = now
+            # the presence store is a (possibly remote) cache: keep its I/O off the event loop
+            await sync_to_async(self.presence.heartbeat, thread_sensitive=False)(self.user.pk)
+
+    async def forward_events(self):
+        while True:
+            event = await self.layer.receive(self.channel)
+            if self.closed:
+                return
+            await self.send({'type': 'websocket.send', 'text': json.dumps(event)})
+
+    async def send_json(self, payload):
+        await self.send({'type': 'websocket.send', 'text': json.dumps(payload)})
+
+    async def receive_frame(self, text):
+        try:
+            await self.handle_frame(text)
+        except Exception:
+            logger.exception("Chat frame from user %s failed", self.user.pk)
+            await self.send_json({'type': 'error', 'detail': 'Something went wrong.'})
+
+    async def handle_frame(self, text):
+        try:
+            frame = json.loads(text)
+        except ValueError:
+            return await self.send_json({'type': 'error', 'detail': 'Frames must be JSON.'})
+        action = frame.get('action') if isinstance(frame, dict) else None
+        if action == 'send':
+            return await self.send_message(frame.get('conversation'), frame.get('body'))
+        if action == 'read':
+            return await self.mark_read(frame.get('conversation'), frame.get('up_to'))
+        if action == 'typing':
+            return await self.typing(frame.get('conversation'))
+        if action == 'ping':
+            return await self.send_json({'type': 'pong'})
+        await self.send_json({'type': 'error', 'detail': 'Unknown action.'})
+
+    async def send_message(self, conversation_id, body):
+        participants = await self.participants(conversation_id)
+        if participants is None:
+            return await self.send_json({'type': 'error', 'detail': 'Conversation not found.'})
+
+        serializer = MessageSerializer(data={'body': body})
+        if not serializer.is_valid():
+            return await self.send_json({'type': 'error', 'detail': serializer.errors})
+
+        message = await sync_to_async(queued_write)(
+            Message.objects.post, conversation_id, self.user.pk, serializer.validated_data['body'],
+        )
+        await sync_to_async(self.presence.stop_typing, thread_sensitive=False)(conversation_id, self.user.pk)
+        event = {'type': 'message', 'message': MessageSerializer(message).data}
+        for user_id in set(participants):
+            await self.layer.group_send(user_group(user_id), event)
+
+    async def mark_read(self, conversation_id, up_to=None):
+        if await self.participants(conversation_id) is None:
+            return await self.send_json({'type': 'error', 'detail': 'Conversation not found.'})
+        if up_to is not None and not isinstance(up_to, int):
+            return await self.send_json({'type': 'error', 'detail': 'up_to must be a message id.'})
+
+        unread = await sync_to_async(Participant.objects.mark_read)(conversation_id, self.user.pk, up_to)
+        await self.layer.group_send(user_group(self.user.pk), {
+            'type': 'read', 'conversation': conversation_id, 'unread_count': unread,
+        })
+
+    async def typing(self, conversation_id):
+        participants = await self.participants(conversation_id)
+        if participants is None:
+            return await self.send_json({'type': 'error', 'detail': 'Conversation not found.'})
+        if not await sync_to_async(self.presence.start_typing, thread_sensitive=False)(conversation_id, self.user.pk):
+            return
+        event = {
+            'type': 'typing', 'conversation': conversation_id, 'user': self.user.pk,
+            'expires_in': self.presence.typing_ttl,
+        }
+        for user_id in set(participants) - {self.user.pk}:
+            await self.layer.group_send(user_group(user_id), event)
+
+    async def participants(self, conversation_id):
+        if not isinstance(conversation_id, int):
+            return None
+        if conversation_id not in self._participants:
+            participants = await (
+                Conversation.objects.for_user(self.user).filter(pk=conversation_id)
+                .values_list('buyer_id', 'seller_id').afirst()
+            )
+            if participants is None:
+                return None
+            self._participants[conversation_id] = participants
+        return self._participants[conversation_id]
@@ -0,0 +1,133 @@
+# chat/layers.py
+"""
+Channel layer: how chat events reach open WebSocket connections.
+
+Every connection gets a channel (an inbox) and joins the group of its user,
+`user.<id>`, so group_send(user group) fans an event out to all of that
+user's tabs and devices. The backend is pluggable:
+
+    CHAT = {'CHANNEL_LAYER': 'chat.layers.InMemoryChannelLayer', 'CHANNEL_CAPACITY': 100}
+
+InMemoryChannelLayer keeps everything in this process, which is all a
+single ASGI worker needs. With several workers, plug in a backend that
+implements BaseChannelLayer over a shared broker (e.g. Redis pub/sub).
+"""
+import asyncio
+import itertools
+import logging
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'CHANNEL_LAYER': 'chat.layers.InMemoryChannelLayer',
+    'CHANNEL_CAPACITY': 100,
+    # see chat.presence
+    'PRESENCE_BACKEND': 'chat.presence.InMemoryPresence',
+    'PRESENCE_CACHE_ALIAS': 'shared',
+    'PRESENCE_TTL': 60,
+    'LAST_SEEN_TTL': 30 * 24 * 60 * 60,
+    'TYPING_TTL': 6,
+    # see chat.consumers
+    'TOKEN_CHECK_INTERVAL': 30,
+}
+
+
+def chat_setting(name):
+    return getattr(settings, 'CHAT', {}).get(name, DEFAULTS[name])
+
+
+def user_group(user_id):
+    return f'user.{user_id}'
+
+
+class BaseChannelLayer:
+    async def new_channel(self):
+        raise NotImplementedError
+
+    async def receive(self, channel):
+        """Wait for and return the next event sent to `channel`."""
+        raise NotImplementedError
+
+    async def send(self, channel, event):
+        raise NotImplementedError
+
+    async def group_add(self, group, channel):
+        raise NotImplementedError
+
+    async def group_discard(self, group, channel):
+        raise NotImplementedError
+
+    async def group_send(self, group, event):
+        raise NotImplementedError
+
+    async def close_channel(self, channel):
+        """Forget `channel` and anything queued for it."""
+
+
+class InMemoryChannelLayer(BaseChannelLayer):
+    def __init__(self, capacity=None):
+        self.capacity = capacity or chat_setting('CHANNEL_CAPACITY')
+        self._prefix = uuid.uuid4().hex[:8]
+        self._counter = itertools.count()
+        self._queues = {}
+        self._groups = defaultdict(set)
+        self.dropped = 0
+
+    async def new_channel(self):
+        channel = f'{self._prefix}.{next(self._counter)}'
+        self._queues[channel] = asyncio.Queue(maxsize=self.capacity)
+        return channel
+
+    async def receive(self, channel):
+        return await self._queues[channel].get()
+
+    async def send(self, channel, event):
+        queue = self._queues.get(channel)
+        if queue is None:
+            return
+        if queue.full():
+            # A reader this far behind is stuck; shed its oldest event rather
+            # than let one slow socket hold up delivery to everyone else.
+            queue.get_nowait()
+            self.dropped += 1
+            logger.warning("Chat channel %s is full; dropped its oldest event", channel)
+        queue.put_nowait(event)
+
+    async def group_add(self, group, channel):
+        self._groups[group].add(channel)
+
+    async def group_discard(self, group, channel):
+        members = self._groups.get(group)
+        if members is not None:
+            members.discard(channel)
+            if not members:
+                del self._groups[group]
+
+    async def group_send(self, group, event):
+        for channel in tuple(self._groups.get(group, ())):
+            await self.send(channel, event)
+
+    async def close_channel(self, channel):
+        self._queues.pop(channel, None)
+
+    def stats(self):
+        return {
+            'channels': len(self._queues),
+            'groups': len(self._groups),
+            'dropped': self.dropped,
+        }
+
+
+_layer = None
+
+
+def get_channel_layer():
+    global _layer
+    if _layer is None:
+        _layer = import_string(chat_setting('CHANNEL_LAYER'))()
+    return _layer
@@ -0,0 +1,106 @@
+import asyncio
+import resource
+import statistics
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.tokens import AccessToken
+
+from chat.layers import get_channel_layer
+from chat.models import Conversation
+from chat.routing import websocket_application
+from chat.testing import WebSocketClient
+from products.models import Product
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure how many chat WebSocket connections and messages per second one process "
+        "handles. Drives the ASGI app in-process (no network), storing messages in the "
+        "configured database; the temporary users it creates are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pairs", type=int, default=100, help="Buyer/seller pairs (one conversation each).")
+        parser.add_argument("--tabs", type=int, default=1, help="Open connections per user.")
+        parser.add_argument("--messages", type=int, default=20, help="Messages each buyer sends.")
+        parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for all deliveries.")
+
+    def handle(self, *args, **options):
+        run = uuid.uuid4().hex[:8]
+        pairs = self.setup_pairs(run, options["pairs"])
+        try:
+            report = asyncio.run(self.bench(pairs, options["tabs"], options["messages"], options["timeout"]))
+        finally:
+            User.objects.filter(email__startswith=f"bench-{run}-").delete()
+
+        for label, value in report:
+            self.stdout.write(f"{label:<28}{value}")
+
+    def setup_pairs(self, run, count):
+        pairs = []
+        for i in range(count):
+            buyer = User.objects.create_user(email=f"bench-{run}-b{i}@example.invalid")
+            seller = User.objects.create_user(email=f"bench-{run}-s{i}@example.invalid")
+            product = Product.objects.create(owner=seller, title=f"Bench {i}", description="", price=1)
+            conversation = Conversation.objects.create(product=product, buyer=buyer, seller=seller)
+            pairs.append((conversation.pk, str(AccessToken.for_user(buyer)), str(AccessToken.for_user(seller))))
+        return pairs
+
+    async def bench(self, pairs, tabs, messages, timeout):
+        layer = get_channel_layer()
+        buyers, sellers = [], []
+        for _, buyer_token, seller_token in pairs:
+            buyers.append([WebSocketClient(websocket_application, "/ws/chat/", f"token={buyer_token}") for _ in range(tabs)])
+            sellers.append([WebSocketClient(websocket_application, "/ws/chat/", f"token={seller_token}") for _ in range(tabs)])
+        clients = [c for group in buyers + sellers for c in group]
+
+        started = time.perf_counter()
+        accepted = await asyncio.gather(*(c.connect(timeout) for c in clients))
+        connect_seconds = time.perf_counter() - started
+        if not all(accepted):
+            raise RuntimeError(f"{accepted.count(False)} connections were refused")
+
+        latencies = []
+
+        async def drain(client):
+            for _ in range(messages):
+                event = await client.receive_json(timeout)
+                sent_at = float(event["message"]["body"].split("@", 1)[1])
+                latencies.append(time.perf_counter() - sent_at)
+
+        started = time.perf_counter()
+        receivers = [asyncio.create_task(drain(c)) for c in clients]
+        for (conversation_id, _, _), tabs_of_buyer in zip(pairs, buyers):
+            for n in range(messages):
+                await tabs_of_buyer[0].send_json({
+                    "action": "send", "conversation": conversation_id, "body": f"m{n}@{time.perf_counter()}",
+                })
+        await asyncio.gather(*receivers)
+        elapsed = time.perf_counter() - started
+
+        await asyncio.gather(*(c.disconnect(timeout) for c in clients))
+
+        sent = len(pairs) * messages
+        latencies.sort()
+
+        def pct(p):
+            return f"{latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000:.1f} ms"
+
+        return [
+            ("connections", len(clients)),
+            ("connect time", f"{connect_seconds:.2f} s ({len(clients) / connect_seconds:.0f}/s)"),
+            ("messages sent", sent),
+            ("deliveries", len(latencies)),
+            ("elapsed", f"{elapsed:.2f} s"),
+            ("messages/s (stored)", f"{sent / elapsed:.0f}"),
+            ("deliveries/s (fan-out)", f"{len(latencies) / elapsed:.0f}"),
+            ("latency p50 / p99", f"{pct(0.5)} / {pct(0.99)}"),
+            ("latency mean", f"{statistics.mean(latencies) * 1000:.1f} ms"),
+            ("dropped events", getattr(layer, "dropped", "n/a")),
+            ("max RSS", f"{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB"),
+        ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:51
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_participants(apps, schema_editor):
+    """Give existing conversations their two Participant rows, counted once here."""
+    Conversation = apps.get_model('chat', 'Conversation')
+    Message = apps.get_model('chat', 'Message')
+    Participant = apps.get_model('chat', 'Participant')
+
+    rows = []
+    for conversation in Conversation.objects.iterator():
+        last = Message.objects.filter(conversation=conversation).order_by('-id').first()
+        for user_id in (conversation.buyer_id, conversation.seller_id):
+            rows.append(Participant(
+                conversation=conversation,
+                user_id=user_id,
+                unread_count=Message.objects.filter(conversation=conversation).exclude(sender_id=user_id).count(),
+                last_message_id=last.id if last else None,
+                last_message_preview=last.body[:140] if last else '',
+                last_message_sender_id=last.sender_id if last else None,
+                last_message_at=last.created_at if last else conversation.updated_at,
+            ))
+    Participant.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_conversations'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Participant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('last_read_message_id', models.BigIntegerField(blank=True, null=True)),
+                ('last_message_id', models.BigIntegerField(blank=True, null=True)),
+                ('last_message_preview', models.CharField(blank=True, max_length=140)),
+                ('last_message_sender_id', models.BigIntegerField(blank=True, null=True)),
+                ('last_message_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='conversation',
+            name='chat_conv_buyer_updated_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='conversation',
+            name='chat_conv_seller_updated_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='message',
+            name='chat_msg_conv_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'id'], name='chat_msg_conv_id_idx'),
+        ),
+        migrations.AddField(
+            model_name='participant',
+            name='conversation',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participants', to='chat.conversation'),
+        ),
+        migrations.AddField(
+            model_name='participant',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_participations', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='participant',
+            index=models.Index(fields=['user', '-last_message_at', '-id'], name='chat_part_inbox_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='participant',
+            constraint=models.UniqueConstraint(fields=('conversation', 'user'), name='chat_participant_conversation_user_uniq'),
+        ),
+        migrations.RunPython(create_participants, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,159 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.utils import timezone
 
-# Create your models here.
+# characters of the last message kept for inbox previews
+PREVIEW_LENGTH = 140
+
+
+class ConversationQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """Conversations `user` takes part in, as buyer or as seller."""
+        return self.filter(Q(buyer=user) | Q(seller=user))
+
+
+class Conversation(models.Model):
+    """One buyer talking to a product's owner about that product."""
+    product = models.ForeignKey('products.Product', on_delete=models.CASCADE, related_name='conversations')
+    buyer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='buyer_conversations')
+    seller = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='seller_conversations')
+    created_at = models.DateTimeField(auto_now_add=True)
+    # last message time
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    objects = ConversationQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'buyer'], name='chat_conversation_product_buyer_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.buyer} ↔ {self.seller} about {self.product}"
+
+    @property
+    def participant_ids(self):
+        return (self.buyer_id, self.seller_id)
+
+
+class ParticipantQuerySet(models.QuerySet):
+    def inbox(self, user):
+        """
+        `user`'s conversations, most recent first, with everything an inbox
+        row shows: one range scan of chat_part_inbox_idx plus joins, however
+        long the histories are.
+        """
+        return (
+            self.filter(user=user)
+            .select_related('conversation__product')
+            .only(
+                'user', 'unread_count', 'last_read_message_id', 'last_message_id',
+                'last_message_preview', 'last_message_sender_id', 'last_message_at',
+                'conversation__buyer', 'conversation__seller', 'conversation__product__title',
+            )
+        )
+
+    def mark_read(self, conversation_id, user_id, up_to=None):
+        """
+        Mark `user_id`'s messages read up to message id `up_to` (default:
+        all of them) and return the new unread count.
+        """
+        while True:
+            participant = self.filter(conversation_id=conversation_id, user_id=user_id).first()
+            if participant is None:
+                return None
+            latest = participant.last_message_id or 0
+            target = latest if up_to is None else min(up_to, latest)
+            if target <= (participant.last_read_message_id or 0):
+                return participant.unread_count
+
+            if target == latest:
+                unread = 0
+            else:
+                # only the tail after `target` is counted: (conversation, id) range scan
+                unread = (
+                    Message.objects.filter(conversation_id=conversation_id, id__gt=target)
+                    .exclude(sender_id=user_id).count()
+                )
+            # guarded by last_message_id: if a message landed meanwhile, count again
+            if self.filter(pk=participant.pk, last_message_id=participant.last_message_id).update(
+                last_read_message_id=target, unread_count=unread,
+            ):
+                return unread
+
+
+class Participant(models.Model):
+    """
+    One side of a conversation, with that side's inbox state kept up to date
+    incrementally by Message.objects.post() and Participant.objects.mark_read()
+    rather than counted from the message table on every read.
+    """
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='participants')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='chat_participations')
+    unread_count = models.PositiveIntegerField(default=0)
+    last_read_message_id = models.BigIntegerField(null=True, blank=True)
+    last_message_id = models.BigIntegerField(null=True, blank=True)
+    last_message_preview = models.CharField(max_length=PREVIEW_LENGTH, blank=True)
+    last_message_sender_id = models.BigIntegerField(null=True, blank=True)
+    last_message_at = models.DateTimeField(default=timezone.now)
+
+    objects = ParticipantQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['conversation', 'user'], name='chat_participant_conversation_user_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-last_message_at', '-id'], name='chat_part_inbox_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} in {self.conversation_id} ({self.unread_count} unread)"
+
+    @property
+    def other_user_id(self):
+        conversation = self.conversation
+        return conversation.seller_id if self.user_id == conversation.buyer_id else conversation.buyer_id
+
+
+class MessageQuerySet(models.QuerySet):
+    def post(self, conversation_id, sender_id, body):
+        """
+        Append a message and update both participants' inbox state in the
+        same transaction: preview and time for everyone, +1 unread for the
+        other side; replying marks the conversation read for the sender.
+        """
+        with transaction.atomic():
+            message = self.create(conversation_id=conversation_id, sender_id=sender_id, body=body)
+            participants = Participant.objects.filter(conversation_id=conversation_id)
+            common = {
+                'last_message_id': message.id,
+                'last_message_preview': body[:PREVIEW_LENGTH],
+                'last_message_sender_id': sender_id,
+                'last_message_at': message.created_at,
+            }
+            participants.exclude(user_id=sender_id).update(unread_count=F('unread_count') + 1, **common)
+            participants.filter(user_id=sender_id).update(
+                unread_count=0, last_read_message_id=message.id, **common,
+            )
+            Conversation.objects.filter(pk=conversation_id).update(updated_at=message.created_at)
+        return message
+
+
+class Message(models.Model):
+    """Append-only: messages are never edited, so ids order a conversation's history."""
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages')
+    sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='chat_messages')
+    body = models.TextField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = MessageQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['conversation', 'id'], name='chat_msg_conv_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.sender}: {self.body[:40]}"
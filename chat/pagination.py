@@ -0,0 +1,17 @@
+# chat/pagination.py
+from django.conf import settings
+
+from products.pagination import ProductCursorPagination
+
+
+class MessageCursorPagination(ProductCursorPagination):
+    """Conversation history, newest first; `next` pages further back in time."""
+    page_size = getattr(settings, 'CHAT_HISTORY_PAGE_SIZE', 50)
+    max_page_size = 200
+    # messages are append-only, so id alone orders them (chat_msg_conv_id_idx)
+    ordering = ('-id',)
+
+
+class InboxCursorPagination(ProductCursorPagination):
+    # matches chat_part_inbox_idx
+    ordering = ('-last_message_at', '-id')
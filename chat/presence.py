@@ -0,0 +1,224 @@
+# chat/presence.py
+"""
+Presence: who is online, when they were last seen, who is typing where.
+
+None of it touches the database. A heartbeat (any frame on a chat socket,
+including {"action": "ping"}) stamps the user's last-seen time; a user is
+online while that stamp is younger than PRESENCE_TTL, so they go offline at
+most that long after their last connection closes, even if a worker dies.
+Typing entries expire after TYPING_TTL unless the client keeps typing.
+
+    CHAT = {'PRESENCE_BACKEND': 'chat.presence.InMemoryPresence', 'PRESENCE_TTL': 60, ...}
+
+InMemoryPresence keeps the entries in this process: enough for one ASGI
+worker that also serves the REST API. CachePresence keeps them in
+PRESENCE_CACHE_ALIAS ('shared' by default), so every worker, WebSocket or
+REST, renders the same status.
+
+Serializers read presence through PresenceField; PresenceListSerializer
+looks up every user on a page in one call.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+
+from .layers import chat_setting
+
+
+def _status(last_seen, now, ttl):
+    if last_seen is None:
+        return {'online': False, 'last_seen': None}
+    return {
+        'online': now - last_seen < ttl,
+        'last_seen': datetime.fromtimestamp(last_seen, tz=timezone.utc),
+    }
+
+
+class BasePresence:
+    def __init__(self, ttl=None, last_seen_ttl=None, typing_ttl=None):
+        self.ttl = ttl or chat_setting('PRESENCE_TTL')
+        self.last_seen_ttl = last_seen_ttl or chat_setting('LAST_SEEN_TTL')
+        self.typing_ttl = typing_ttl or chat_setting('TYPING_TTL')
+
+    def heartbeat(self, user_id):
+        """The user is connected right now."""
+        raise NotImplementedError
+
+    def lookup(self, user_ids):
+        """{user_id: {'online': bool, 'last_seen': datetime | None}} for every id, in one call."""
+        raise NotImplementedError
+
+    def start_typing(self, conversation_id, user_id):
+        """
+        Record that the user is typing. Returns True when the others should be
+        told: on the first keystroke, then again every TYPING_TTL / 2 while
+        it goes on, so their indicator never lapses mid-sentence.
+        """
+        raise NotImplementedError
+
+    def stop_typing(self, conversation_id, user_id):
+        raise NotImplementedError
+
+    def typing(self, conversation_id, user_ids):
+        """Which of `user_ids` are typing in the conversation."""
+        raise NotImplementedError
+
+
+class InMemoryPresence(BasePresence):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Both maps are kept in stamp order (re-stamping moves a key to the
+        # end), so expired entries are always at the front and pruning is O(1)
+        # per entry. Sync views read them from worker threads, hence the lock.
+        self._seen = OrderedDict()
+        self._typing = OrderedDict()
+        self._lock = threading.Lock()
+
+    def heartbeat(self, user_id):
+        now = time.time()
+        with self._lock:
+            self._seen[user_id] = now
+            self._seen.move_to_end(user_id)
+            _prune(self._seen, now - self.last_seen_ttl)
+
+    def lookup(self, user_ids):
+        now = time.time()
+        with self._lock:
+            return {user_id: _status(self._seen.get(user_id), now, self.ttl) for user_id in user_ids}
+
+    def start_typing(self, conversation_id, user_id):
+        now = time.time()
+        key = (conversation_id, user_id)
+        with self._lock:
+            _prune(self._typing, now - self.typing_ttl)
+            announced = self._typing.get(key)
+            if announced is not None and now - announced < self.typing_ttl / 2:
+                return False
+            self._typing[key] = now
+            self._typing.move_to_end(key)
+            return True
+
+    def stop_typing(self, conversation_id, user_id):
+        with self._lock:
+            self._typing.pop((conversation_id, user_id), None)
+
+    def typing(self, conversation_id, user_ids):
+        cutoff = time.time() - self.typing_ttl
+        with self._lock:
+            return [
+                user_id for user_id in user_ids
+                if self._typing.get((conversation_id, user_id), cutoff) > cutoff
+            ]
+
+
+class CachePresence(BasePresence):
+    def __init__(self, cache_alias=None, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = caches[cache_alias or chat_setting('PRESENCE_CACHE_ALIAS')]
+
+    @staticmethod
+    def seen_key(user_id):
+        return f'presence:seen:{user_id}'
+
+    @staticmethod
+    def typing_key(conversation_id, user_id):
+        return f'presence:typing:{conversation_id}:{user_id}'
+
+    def heartbeat(self, user_id):
+        self.cache.set(self.seen_key(user_id), time.time(), self.last_seen_ttl)
+
+    def lookup(self, user_ids):
+        user_ids = list(user_ids)
+        stamps = self.cache.get_many([self.seen_key(user_id) for user_id in user_ids])
+        now = time.time()
+        return {user_id: _status(stamps.get(self.seen_key(user_id)), now, self.ttl) for user_id in user_ids}
+
+    def start_typing(self, conversation_id, user_id):
+        key = self.typing_key(conversation_id, user_id)
+        self.cache.set(key, True, self.typing_ttl)
+        # add() is atomic, so only one worker announces per half-TTL
+        return self.cache.add(f'{key}:announced', True, self.typing_ttl / 2)
+
+    def stop_typing(self, conversation_id, user_id):
+        key = self.typing_key(conversation_id, user_id)
+        self.cache.delete_many([key, f'{key}:announced'])
+
+    def typing(self, conversation_id, user_ids):
+        keys = {self.typing_key(conversation_id, user_id): user_id for user_id in user_ids}
+        return [keys[key] for key in self.cache.get_many(list(keys))]
+
+
+def _prune(entries, cutoff):
+    while entries:
+        key, stamp = next(iter(entries.items()))
+        if stamp > cutoff:
+            break
+        del entries[key]
+
+
+_presence = None
+
+
+def get_presence():
+    global _presence
+    if _presence is None:
+        _presence = import_string(chat_setting('PRESENCE_BACKEND'))()
+    return _presence
+
+
+def presence_changed_at(user_id):
+    """
+    When `user_id`'s rendered presence last changed: their last heartbeat
+    while online, the moment it lapsed once offline (None: never seen).
+    Conditional GETs of responses that embed presence fold this into their
+    validators, so a 304 never hides a status change.
+    """
+    presence = get_presence()
+    status = presence.lookup([user_id])[user_id]
+    last_seen = status['last_seen']
+    if last_seen is None or status['online']:
+        return last_seen
+    return last_seen + timedelta(seconds=presence.ttl)
+
+
+# ── serializers ──────────────────────────────────────────────────────────────
+def render_status(status):
+    last_seen = status['last_seen']
+    return {
+        'online': status['online'],
+        'last_seen': serializers.DateTimeField().to_representation(last_seen) if last_seen else None,
+    }
+
+
+class PresenceField(serializers.Field):
+    """
+    {online, last_seen} of the user whose id is at `source`. Rendered in a
+    PresenceListSerializer, the whole list shares one lookup.
+    """
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, user_id):
+        statuses = self.context.get('presence')
+        if statuses is None or user_id not in statuses:
+            statuses = get_presence().lookup([user_id])
+        return render_status(statuses[user_id])
+
+
+class PresenceListSerializer(serializers.ListSerializer):
+    """Looks up the presence of every user on the page before rendering it."""
+
+    def to_representation(self, data):
+        items = list(data.all() if hasattr(data, 'all') else data)
+        fields = [field for field in self.child.fields.values() if isinstance(field, PresenceField)]
+        user_ids = {field.get_attribute(item) for field in fields for item in items}
+        user_ids.discard(None)
+        if user_ids:
+            self.context['presence'] = get_presence().lookup(user_ids)
+        return super().to_representation(items)
@@ -0,0 +1,16 @@
+# chat/routing.py
+from .consumers import CLOSE_NOT_FOUND, ChatConsumer
+
+websocket_urlpatterns = {
+    '/ws/chat/': ChatConsumer.as_asgi,
+}
+
+
+async def websocket_application(scope, receive, send):
+    """Dispatch a WebSocket connection by path; unknown paths are refused."""
+    app = websocket_urlpatterns.get(scope['path'])
+    if app is None:
+        await receive()  # websocket.connect
+        await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
+        return
+    await app(scope, receive, send)
@@ -0,0 +1,44 @@
+# chat/serializers.py
+from rest_framework import serializers
+
+from .models import Conversation, Message, Participant
+from .presence import PresenceField, PresenceListSerializer
+
+# longest message body accepted, over HTTP or the socket
+MAX_MESSAGE_LENGTH = 4000
+
+
+class ConversationSerializer(serializers.ModelSerializer):
+    product_title = serializers.CharField(source='product.title', read_only=True)
+
+    class Meta:
+        model = Conversation
+        fields = ['id', 'product', 'product_title', 'buyer', 'seller', 'created_at', 'updated_at']
+        read_only_fields = ['buyer', 'seller', 'created_at', 'updated_at']
+
+
+class MessageSerializer(serializers.ModelSerializer):
+    body = serializers.CharField(max_length=MAX_MESSAGE_LENGTH, trim_whitespace=True)
+
+    class Meta:
+        model = Message
+        fields = ['id', 'conversation', 'sender', 'body', 'created_at']
+        read_only_fields = ['conversation', 'sender', 'created_at']
+
+
+class InboxSerializer(serializers.ModelSerializer):
+    """One inbox row, rendered from a Participant loaded by Participant.objects.inbox()."""
+    id = serializers.IntegerField(source='conversation_id')
+    product = serializers.IntegerField(source='conversation.product_id')
+    product_title = serializers.CharField(source='conversation.product.title')
+    other_user = serializers.IntegerField(source='other_user_id')
+    other_user_presence = PresenceField(source='other_user_id')
+
+    class Meta:
+        model = Participant
+        fields = [
+            'id', 'product', 'product_title', 'other_user', 'other_user_presence', 'unread_count',
+            'last_read_message_id', 'last_message_id', 'last_message_preview', 'last_message_sender_id',
+            'last_message_at',
+        ]
+        list_serializer_class = PresenceListSerializer
@@ -0,0 +1,14 @@
+# chat/signals.py
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Conversation, Participant
+
+
+@receiver(post_save, sender=Conversation)
+def create_participants(sender, instance, created, **kwargs):
+    if created:
+        Participant.objects.bulk_create([
+            Participant(conversation=instance, user_id=user_id, last_message_at=instance.updated_at)
+            for user_id in instance.participant_ids
+        ])
@@ -0,0 +1,54 @@
+# chat/testing.py
+"""
+Drive an ASGI WebSocket application in-process, without a server or
+network: used by the chat tests and the chat_benchmark command.
+"""
+import asyncio
+import json
+
+
+class WebSocketClient:
+    def __init__(self, application, path, query_string=''):
+        self.application = application
+        self.scope = {
+            'type': 'websocket',
+            'path': path,
+            'query_string': query_string.encode('latin-1'),
+            'headers': [],
+            'subprotocols': [],
+        }
+        self.to_app = asyncio.Queue()
+        self.from_app = asyncio.Queue()
+        self.task = None
+
+    async def connect(self, timeout=5):
+        """Returns True if the application accepted the connection."""
+        self.task = asyncio.create_task(self.application(self.scope, self.to_app.get, self.from_app.put))
+        await self.to_app.put({'type': 'websocket.connect'})
+        event = await asyncio.wait_for(self.from_app.get(), timeout)
+        self.close_code = event.get('code')
+        return event['type'] == 'websocket.accept'
+
+    async def send_json(self, payload):
+        await self.to_app.put({'type': 'websocket.receive', 'text': json.dumps(payload)})
+
+    async def receive_json(self, timeout=5):
+        event = await asyncio.wait_for(self.from_app.get(), timeout)
+        return json.loads(event['text'])
+
+    async def receive_close(self, timeout=5):
+        """The code of the application's next event, which must close the connection."""
+        event = await asyncio.wait_for(self.from_app.get(), timeout)
+        assert event['type'] == 'websocket.close', event
+        return event.get('code')
+
+    async def receive_nothing(self, timeout=0.05):
+        try:
+            await asyncio.wait_for(self.from_app.get(), timeout)
+        except asyncio.TimeoutError:
+            return True
+        return False
+
+    async def disconnect(self, timeout=5):
+        await self.to_app.put({'type': 'websocket.disconnect', 'code': 1000})
+        await asyncio.wait_for(self.task, timeout)
@@ -1,3 +1,355 @@
-from django.test import TestCase
+import time
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from nova_project.test_runner import run_in_other_process
+from products.models import Product
+from users.revocation import revocations
+
+from . import layers, presence
+from .consumers import CLOSE_NOT_FOUND, CLOSE_UNAUTHORIZED
+from .layers import InMemoryChannelLayer
+from .models import PREVIEW_LENGTH, Conversation, Message, Participant
+from .presence import CachePresence, InMemoryPresence
+from .routing import websocket_application
+from .testing import WebSocketClient
+
+User = get_user_model()
+
+
+class ConversationAPITests(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(email='seller@example.com')
+        self.buyer = User.objects.create_user(email='buyer@example.com')
+        self.product = Product.objects.create(owner=self.seller, title='Bike', description='', price=100)
+        self.client = APIClient()
+        self.client.force_authenticate(self.buyer)
+
+    def test_start_conversation_is_idempotent(self):
+        first = self.client.post('/chat/api/conversations/', {'product': self.product.id}, format='json')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((first.data['buyer'], first.data['seller']), (self.buyer.id, self.seller.id))
+        again = self.client.post('/chat/api/conversations/', {'product': self.product.id}, format='json')
+        self.assertEqual((again.status_code, again.data['id']), (200, first.data['id']))
+
+    def test_cannot_message_yourself(self):
+        self.client.force_authenticate(self.seller)
+        response = self.client.post('/chat/api/conversations/', {'product': self.product.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_both_sides_list_the_conversation(self):
+        self.client.post('/chat/api/conversations/', {'product': self.product.id}, format='json')
+        self.client.force_authenticate(self.seller)
+        response = self.client.get('/chat/api/conversations/')
+        self.assertEqual([c['product_title'] for c in response.data['results']], ['Bike'])
+        self.assertEqual(response.data['results'][0]['other_user'], self.buyer.id)
+
+
+class MessageStorageTests(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user(email='seller@example.com')
+        self.buyer = User.objects.create_user(email='buyer@example.com')
+        self.stranger = User.objects.create_user(email='x@example.com')
+        self.product = Product.objects.create(owner=self.seller, title='Bike', description='', price=100)
+        self.conversation = Conversation.objects.create(product=self.product, buyer=self.buyer, seller=self.seller)
+        self.client = APIClient()
+        self.client.force_authenticate(self.seller)
+
+    def state(self, user):
+        return Participant.objects.get(conversation=self.conversation, user=user)
+
+    def test_post_updates_unread_counts_and_previews(self):
+        Message.objects.post(self.conversation.id, self.buyer.id, 'Hi')
+        last = Message.objects.post(self.conversation.id, self.buyer.id, 'x' * (PREVIEW_LENGTH + 10))
+        seller, buyer = self.state(self.seller), self.state(self.buyer)
+        self.assertEqual((seller.unread_count, buyer.unread_count), (2, 0))
+        self.assertEqual(seller.last_message_preview, 'x' * PREVIEW_LENGTH)
+        self.assertEqual((seller.last_message_id, buyer.last_read_message_id), (last.id, last.id))
+
+        # replying marks the conversation read for the replier
+        Message.objects.post(self.conversation.id, self.seller.id, 'Yes')
+        self.assertEqual((self.state(self.seller).unread_count, self.state(self.buyer).unread_count), (0, 1))
+
+    def test_mark_read_partially_then_fully(self):
+        first, _, _ = [Message.objects.post(self.conversation.id, self.buyer.id, str(n)) for n in range(3)]
+        response = self.client.post(f'/chat/api/conversations/{self.conversation.id}/read/',
+                                    {'up_to': first.id}, format='json')
+        self.assertEqual(response.data['unread_count'], 2)
+        response = self.client.post(f'/chat/api/conversations/{self.conversation.id}/read/', format='json')
+        self.assertEqual(response.data['unread_count'], 0)
+        self.assertEqual(self.state(self.seller).unread_count, 0)
+
+    def test_history_pages_back_in_time(self):
+        ids = [Message.objects.post(self.conversation.id, self.buyer.id, str(n)).id for n in range(5)]
+        url = f'/chat/api/conversations/{self.conversation.id}/messages/?page_size=2'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            seen += [m['id'] for m in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(seen, ids[::-1])
+
+    def test_history_is_for_participants_only(self):
+        self.client.force_authenticate(self.stranger)
+        response = self.client.get(f'/chat/api/conversations/{self.conversation.id}/messages/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_inbox_query_count_is_flat(self):
+        for n in range(5):
+            product = Product.objects.create(owner=self.seller, title=f'P{n}', description='', price=1)
+            conversation = Conversation.objects.create(product=product, buyer=self.buyer, seller=self.seller)
+            Message.objects.post(conversation.id, self.buyer.id, 'hello')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/chat/api/conversations/')
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertEqual(len(queries), 1)
+        # most recent message first; the conversation without messages sorts last
+        self.assertEqual(response.data['results'][0]['product_title'], 'P4')
+        self.assertEqual(response.data['results'][-1]['product_title'], 'Bike')
+
+
+class ChatSocketTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        layers._layer = InMemoryChannelLayer()
+        self.addCleanup(setattr, layers, '_layer', None)
+        presence._presence = InMemoryPresence()
+        self.addCleanup(setattr, presence, '_presence', None)
+        self.seller = User.objects.create_user(email='seller@example.com')
+        self.buyer = User.objects.create_user(email='buyer@example.com')
+        self.stranger = User.objects.create_user(email='x@example.com')
+        product = Product.objects.create(owner=self.seller, title='Bike', description='', price=100)
+        self.conversation = Conversation.objects.create(product=product, buyer=self.buyer, seller=self.seller)
+
+    def socket(self, user, path='/ws/chat/'):
+        return WebSocketClient(websocket_application, path, f'token={AccessToken.for_user(user)}')
+
+    async def test_message_fans_out_to_every_connection_of_both_users(self):
+        buyer_phone, buyer_laptop, seller = self.socket(self.buyer), self.socket(self.buyer), self.socket(self.seller)
+        stranger = self.socket(self.stranger)
+        for ws in (buyer_phone, buyer_laptop, seller, stranger):
+            self.assertTrue(await ws.connect())
+
+        await buyer_phone.send_json({'action': 'send', 'conversation': self.conversation.id, 'body': ' Hi! '})
+        for ws in (buyer_phone, buyer_laptop, seller):
+            event = await ws.receive_json()
+            self.assertEqual(event['type'], 'message')
+            self.assertEqual((event['message']['body'], event['message']['sender']), ('Hi!', self.buyer.id))
+        self.assertTrue(await stranger.receive_nothing())
+
+        self.assertEqual(await Message.objects.filter(conversation=self.conversation).acount(), 1)
+        conversation = await Conversation.objects.aget(pk=self.conversation.pk)
+        self.assertGreater(conversation.updated_at, conversation.created_at)
+
+        for ws in (buyer_phone, buyer_laptop, seller, stranger):
+            await ws.disconnect()
+        self.assertEqual(layers._layer.stats()['channels'], 0)
+
+    async def test_read_receipt_reaches_the_readers_other_tabs(self):
+        phone, laptop, buyer = self.socket(self.seller), self.socket(self.seller), self.socket(self.buyer)
+        for ws in (phone, laptop, buyer):
+            await ws.connect()
+        await buyer.send_json({'action': 'send', 'conversation': self.conversation.id, 'body': 'Hi'})
+        for ws in (phone, laptop, buyer):
+            await ws.receive_json()
+
+        await phone.send_json({'action': 'read', 'conversation': self.conversation.id})
+        for ws in (phone, laptop):
+            self.assertEqual(await ws.receive_json(),
+                             {'type': 'read', 'conversation': self.conversation.id, 'unread_count': 0})
+        self.assertTrue(await buyer.receive_nothing())
+        for ws in (phone, laptop, buyer):
+            await ws.disconnect()
+
+    async def test_typing_is_announced_to_the_other_side_only(self):
+        buyer, seller = self.socket(self.buyer), self.socket(self.seller)
+        for ws in (buyer, seller):
+            await ws.connect()
+        for _ in range(3):
+            await buyer.send_json({'action': 'typing', 'conversation': self.conversation.id})
+        event = await seller.receive_json()
+        self.assertEqual((event['type'], event['user']), ('typing', self.buyer.id))
+        # keystrokes within TYPING_TTL / 2 are not re-announced
+        self.assertTrue(await seller.receive_nothing())
+        self.assertTrue(await buyer.receive_nothing())
+        self.assertEqual(presence._presence.typing(self.conversation.id, [self.buyer.id]), [self.buyer.id])
+
+        await buyer.send_json({'action': 'send', 'conversation': self.conversation.id, 'body': 'Hi'})
+        self.assertEqual((await seller.receive_json())['type'], 'message')
+        self.assertEqual(presence._presence.typing(self.conversation.id, [self.buyer.id]), [])
+        for ws in (buyer, seller):
+            await ws.disconnect()
+
+    async def test_connection_marks_user_online(self):
+        ws = self.socket(self.buyer)
+        await ws.connect()
+        await ws.send_json({'action': 'ping'})
+        self.assertEqual(await ws.receive_json(), {'type': 'pong'})
+        self.assertTrue(presence._presence.lookup([self.buyer.id])[self.buyer.id]['online'])
+        await ws.disconnect()
+
+    async def test_non_participant_cannot_post(self):
+        ws = self.socket(self.stranger)
+        await ws.connect()
+        await ws.send_json({'action': 'send', 'conversation': self.conversation.id, 'body': 'spam'})
+        self.assertEqual((await ws.receive_json())['type'], 'error')
+        self.assertFalse(await Message.objects.aexists())
+        await ws.disconnect()
+
+    async def test_bad_frames_get_errors(self):
+        ws = self.socket(self.buyer)
+        await ws.connect()
+        await ws.to_app.put({'type': 'websocket.receive', 'text': 'not json'})
+        self.assertEqual((await ws.receive_json())['detail'], 'Frames must be JSON.')
+        await ws.send_json({'action': 'send', 'conversation': self.conversation.id, 'body': ''})
+        self.assertEqual((await ws.receive_json())['type'], 'error')
+        await ws.disconnect()
+
+    async def test_failing_frame_gets_an_error_and_keeps_the_socket(self):
+        ws = self.socket(self.buyer)
+        await ws.connect()
+        with mock.patch.object(Participant.objects, 'mark_read', side_effect=RuntimeError('boom')), \
+                self.assertLogs('chat.consumers', 'ERROR') as logs:
+            await ws.send_json({'action': 'read', 'conversation': self.conversation.id})
+            self.assertEqual(await ws.receive_json(), {'type': 'error', 'detail': 'Something went wrong.'})
+        self.assertIn('RuntimeError: boom', logs.output[0])
+        await ws.send_json({'action': 'ping'})
+        self.assertEqual(await ws.receive_json(), {'type': 'pong'})
+        await ws.disconnect()
+
+    async def test_revoked_or_expired_token_closes_the_socket(self):
+        token = AccessToken.for_user(self.buyer)
+        ws = WebSocketClient(websocket_application, '/ws/chat/', f'token={token}')
+        self.assertTrue(await ws.connect())
+        await ws.send_json({'action': 'ping'})
+        self.assertEqual(await ws.receive_json(), {'type': 'pong'})
+        await sync_to_async(revocations.revoke_token)(token)
+        await ws.send_json({'action': 'ping'})
+        self.assertEqual(await ws.receive_close(), CLOSE_UNAUTHORIZED)
+        await ws.disconnect()
+
+        ws = self.socket(self.buyer)
+        self.assertTrue(await ws.connect())
+        with mock.patch('chat.consumers.time.time', return_value=time.time() + 24 * 3600):
+            await ws.send_json({'action': 'ping'})
+            self.assertEqual(await ws.receive_close(), CLOSE_UNAUTHORIZED)
+        await ws.disconnect()
+
+    async def test_idle_socket_is_closed_once_its_token_is_revoked(self):
+        token = AccessToken.for_user(self.seller)
+        with override_settings(CHAT={**settings.CHAT, 'TOKEN_CHECK_INTERVAL': 0.05}):
+            ws = WebSocketClient(websocket_application, '/ws/chat/', f'token={token}')
+            self.assertTrue(await ws.connect())
+            await sync_to_async(revocations.revoke_token)(token)
+            # no frame from the client: the periodic check closes it
+            self.assertEqual(await ws.receive_close(), CLOSE_UNAUTHORIZED)
+        await ws.disconnect()
+
+    async def test_connection_requires_valid_token(self):
+        ws = WebSocketClient(websocket_application, '/ws/chat/', 'token=garbage')
+        self.assertFalse(await ws.connect())
+        self.assertEqual(ws.close_code, CLOSE_UNAUTHORIZED)
+
+    async def test_unknown_path_is_refused(self):
+        ws = self.socket(self.buyer, path='/ws/nope/')
+        self.assertFalse(await ws.connect())
+        self.assertEqual(ws.close_code, CLOSE_NOT_FOUND)
+
+
+class InMemoryChannelLayerTests(TestCase):
+    async def test_full_channel_sheds_oldest_event(self):
+        layer = InMemoryChannelLayer(capacity=2)
+        channel = await layer.new_channel()
+        await layer.group_add('g', channel)
+        for n in range(3):
+            await layer.group_send('g', {'n': n})
+        self.assertEqual([(await layer.receive(channel))['n'] for _ in range(2)], [1, 2])
+        self.assertEqual(layer.dropped, 1)
+
+
+class PresenceTests(TestCase):
+    def setUp(self):
+        presence._presence = InMemoryPresence(ttl=60, typing_ttl=6)
+        self.addCleanup(setattr, presence, '_presence', None)
+        self.seller = User.objects.create_user(email='seller@example.com')
+        self.buyer = User.objects.create_user(email='buyer@example.com')
+
+    def test_online_until_ttl_then_last_seen(self):
+        with mock.patch('chat.presence.time.time', return_value=1000.0):
+            presence._presence.heartbeat(self.seller.id)
+        with mock.patch('chat.presence.time.time', return_value=1059.0):
+            status = presence._presence.lookup([self.seller.id, self.buyer.id])
+        self.assertTrue(status[self.seller.id]['online'])
+        self.assertEqual(status[self.buyer.id], {'online': False, 'last_seen': None})
+        with mock.patch('chat.presence.time.time', return_value=1061.0):
+            status = presence._presence.lookup([self.seller.id])[self.seller.id]
+        self.assertFalse(status['online'])
+        self.assertEqual(status['last_seen'].timestamp(), 1000.0)
+
+    def test_typing_reannounced_every_half_ttl_and_expires(self):
+        store = presence._presence
+        with mock.patch('chat.presence.time.time', side_effect=[100.0, 102.0, 103.5, 110.0]):
+            self.assertTrue(store.start_typing(1, self.buyer.id))
+            self.assertFalse(store.start_typing(1, self.buyer.id))
+            self.assertTrue(store.start_typing(1, self.buyer.id))
+            self.assertEqual(store.typing(1, [self.buyer.id]), [])
+
+    def test_cache_backend_matches(self):
+        caches['shared'].clear()
+        store = CachePresence(ttl=60, typing_ttl=6)
+        store.heartbeat(self.seller.id)
+        status = store.lookup([self.seller.id, self.buyer.id])
+        self.assertEqual((status[self.seller.id]['online'], status[self.buyer.id]['online']), (True, False))
+        self.assertTrue(store.start_typing(1, self.buyer.id))
+        self.assertFalse(store.start_typing(1, self.buyer.id))
+        self.assertEqual(store.typing(1, [self.buyer.id, self.seller.id]), [self.buyer.id])
+        store.stop_typing(1, self.buyer.id)
+        self.assertEqual(store.typing(1, [self.buyer.id]), [])
+
+    def test_cache_backend_is_shared_between_processes(self):
+        caches['shared'].clear()
+        run_in_other_process(f'from chat.presence import CachePresence; CachePresence().heartbeat({self.seller.id})')
+        self.assertTrue(CachePresence().lookup([self.seller.id])[self.seller.id]['online'])
+
+    def test_product_page_looks_up_all_sellers_at_once(self):
+        other = User.objects.create_user(email='other@example.com')
+        for owner in (self.seller, other, self.seller):
+            Product.objects.create(owner=owner, title='P', description='', price=1)
+        presence._presence.heartbeat(other.id)
+        with mock.patch.object(presence._presence, 'lookup', wraps=presence._presence.lookup) as lookup:
+            response = self.client.get('/products/api/products/feed/?fields=id,owner_presence')
+        self.assertEqual(lookup.call_count, 1)
+        self.assertEqual([p['owner_presence']['online'] for p in response.json()['results']], [False, True, False])
+        self.assertNotIn('ETag', response)
+        # not rendered unless asked for
+        self.assertNotIn('owner_presence', self.client.get('/products/api/products/feed/').json()['results'][0])
+
+    def test_profile_revalidates_when_presence_changes(self):
+        client = APIClient()
+        client.force_authenticate(self.seller)
+        url = f'/users/api/profile/{self.seller.profile.id}/'
+        response = client.get(url)
+        self.assertEqual(response.data['presence'], {'online': False, 'last_seen': None})
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        presence._presence.heartbeat(self.seller.id)
+        response = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['presence']['online'])
+
+    def test_presence_api(self):
+        presence._presence.heartbeat(self.seller.id)
+        response = self.client.get(f'/chat/api/presence/?users={self.seller.id},{self.buyer.id}')
+        self.assertEqual(
+            {key: value['online'] for key, value in response.json().items()},
+            {str(self.seller.id): True, str(self.buyer.id): False},
+        )
+        self.assertEqual(self.client.get('/chat/api/presence/?users=x').status_code, 400)
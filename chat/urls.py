@@ -0,0 +1,12 @@
+# chat/urls.py
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    # WebSocket endpoint: /ws/chat/ (see chat/routing.py)
+    path('api/conversations/', views.conversation_list_create, name='chat-conversations'),
+    path('api/conversations/<int:id>/messages/', views.conversation_messages, name='chat-messages'),
+    path('api/conversations/<int:id>/read/', views.conversation_read, name='chat-read'),
+    path('api/presence/', views.presence, name='chat-presence'),
+]
@@ -1,3 +1,88 @@
-from django.shortcuts import render
+# chat/views.py
+from django.shortcuts import get_object_or_404
+from rest_framework import permissions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
 
-# Create your views here.
+from products.models import Product
+
+from .models import Conversation, Message, Participant
+from .pagination import InboxCursorPagination, MessageCursorPagination
+from .presence import get_presence, render_status
+from .serializers import ConversationSerializer, InboxSerializer, MessageSerializer
+
+# most users one presence lookup may ask about
+MAX_PRESENCE_USERS = 100
+
+
+# API: my inbox (GET) / start a conversation about a product (POST { product })
+@api_view(['GET', 'POST'])
+@permission_classes([permissions.IsAuthenticated])
+def conversation_list_create(request):
+    if request.method == 'GET':
+        paginator = InboxCursorPagination()
+        page = paginator.paginate_queryset(Participant.objects.inbox(request.user), request)
+        return paginator.get_paginated_response(InboxSerializer(page, many=True).data)
+
+    product = get_object_or_404(Product.objects.only('id', 'owner_id', 'title'), id=request.data.get('product'))
+    if product.owner_id == request.user.pk:
+        return Response({"error": "You can't start a conversation about your own product."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    # one conversation per (product, buyer): asking again returns the existing one
+    conversation, created = Conversation.objects.get_or_create(
+        product=product, buyer=request.user, defaults={'seller_id': product.owner_id},
+    )
+    conversation.product = product
+    return Response(ConversationSerializer(conversation).data,
+                    status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
+def _my_conversation(request, id):
+    return get_object_or_404(Conversation.objects.for_user(request.user).only('id'), id=id)
+
+
+# API: conversation history, newest first, keyset-paged on message id
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def conversation_messages(request, id):
+    conversation = _my_conversation(request, id)
+    paginator = MessageCursorPagination()
+    page = paginator.paginate_queryset(Message.objects.filter(conversation=conversation), request)
+    return paginator.get_paginated_response(MessageSerializer(page, many=True).data)
+
+
+# API: mark read (POST { up_to: <message id> }, default: everything)
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def conversation_read(request, id):
+    conversation = _my_conversation(request, id)
+    up_to = request.data.get('up_to')
+    if up_to is not None:
+        try:
+            up_to = int(up_to)
+        except (TypeError, ValueError):
+            raise ValidationError({'up_to': 'Must be a message id.'})
+    unread = Participant.objects.mark_read(conversation.id, request.user.pk, up_to)
+    return Response({"conversation": conversation.id, "unread_count": unread})
+
+
+# API: online / last seen of many users at once (GET ?users=1,2,3), e.g. the
+# sellers on a page of products. Read from chat.presence, never the database.
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def presence(request):
+    try:
+        user_ids = list(dict.fromkeys(
+            int(part) for part in (request.query_params.get('users') or '').split(',') if part.strip()
+        ))
+    except ValueError:
+        raise ValidationError({'users': 'Must be a comma-separated list of user ids.'})
+    if not user_ids:
+        raise ValidationError({'users': 'This parameter is required.'})
+    if len(user_ids) > MAX_PRESENCE_USERS:
+        raise ValidationError({'users': f'At most {MAX_PRESENCE_USERS} users per request.'})
+
+    statuses = get_presence().lookup(user_ids)
+    return Response({str(user_id): render_status(statuses[user_id]) for user_id in user_ids})
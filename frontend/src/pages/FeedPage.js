@@ -8,26 +8,19 @@ const FeedPage = () => {
   const [sortBy, setSortBy] = useState("date");
   const [menuOpen, setMenuOpen] = useState(false);
 
-  // Fetch products from API
+  // Fetch products from API (sorted server-side)
   useEffect(() => {
     const fetchProducts = async () => {
       try {
-        const data = await apiFetch("/products/api/");
-        setProducts(data);
+        const data = await apiFetch(`/products/api/products/feed/?sort=${sortBy}&fields=id,title,description,price,image1`);
+        setProducts(data.results);
       } catch (err) {
         console.error(err);
         alert("Error loading feed ❌");
       }
     };
     fetchProducts();
-  }, []);
-
-  // Sorting handler
-  const sortedProducts = [...products].sort((a, b) => {
-    if (sortBy === "price") return a.price - b.price;
-    if (sortBy === "name") return a.title.localeCompare(b.title);
-    return new Date(b.created_at) - new Date(a.created_at);
-  });
+  }, [sortBy]);
 
   return (
     <div className="feed-container">
@@ -58,14 +51,14 @@ const FeedPage = () => {
         <label>Sort by: </label>
         <select value={sortBy} onChange={(e) => setSortBy(e.target.value)}>
           <option value="date">Date</option>
-          <option value="name">Name</option>
+          <option value="title">Name</option>
           <option value="price">Price</option>
         </select>
       </div>
 
       {/* Product Cards */}
       <main className="feed-body">
-        {sortedProducts.map((product) => (
+        {products.map((product) => (
           <div key={product.id} className="product-card">
             <img src={product.image1} alt={product.title} />
             <h3>{product.title}</h3>
@@ -5,6 +5,13 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Serve with e.g. `uvicorn nova_project.asgi:application --workers 4`; the
+async endpoints (products/async_views.py, users/async_views.py) then run on
+the event loop without holding a thread per request, and WebSocket
+connections (chat/routing.py) are served by the same process. The default
+chat channel layer is in-process: with several workers, configure a shared
+one (see chat/layers.py) so messages reach sockets held by other workers.
 """
 
 import os
@@ -13,4 +20,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nova_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# imported after Django is set up: the chat consumers use the ORM
+from chat.routing import websocket_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # WebSockets go to the chat router, everything else to Django
+    if scope['type'] == 'websocket':
+        await websocket_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -0,0 +1,132 @@
+# nova_project/db_routing.py
+"""
+Primary / replica database routing with read-your-writes.
+
+    DATABASE_ROUTERS = ['nova_project.db_routing.PrimaryReplicaRouter']
+    DATABASE_ROUTING = {'PRIMARY': 'default', 'REPLICAS': ['replica'], 'STICKY_SECONDS': 5,
+                        'CACHE_ALIAS': 'shared'}
+
+Writes go to PRIMARY. Reads go to a random alias in REPLICAS (to PRIMARY
+when the list is empty), except when they could miss a recent write
+because of replication lag:
+
+  - for the rest of a request once it has written anything;
+  - for STICKY_SECONDS after a request that wrote. ReadYourWritesMiddleware
+    then sets a short-lived cookie, and for a signed-in user also an entry
+    in CACHE_ALIAS, so JWT clients that don't keep cookies stay pinned as
+    well. That cache must be shared: the client's next read may land on
+    another worker.
+
+The user pin is checked once the request's user is known (the session
+user, or the DRF user after authentication); reads made while
+authenticating may still use a replica.
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.functional import empty
+
+DEFAULTS = {
+    'PRIMARY': 'default',
+    'REPLICAS': [],
+    'STICKY_SECONDS': 5,
+    'CACHE_ALIAS': 'shared',
+}
+
+COOKIE_NAME = 'db_primary_until'
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+def routing_setting(name):
+    return getattr(settings, 'DATABASE_ROUTING', {}).get(name, DEFAULTS[name])
+
+
+def pin_key(user_id):
+    return f'db:primary:{user_id}'
+
+
+def _pins():
+    return caches[routing_setting('CACHE_ALIAS')]
+
+
+def _known_user(request):
+    """request.user if it is already resolved; never triggers authentication itself."""
+    user = request.__dict__.get('user')
+    wrapped = getattr(user, '_wrapped', None)
+    if wrapped is empty:
+        return None
+    return wrapped if wrapped is not None else user
+
+
+class RoutingState:
+    def __init__(self, request):
+        self.request = request
+        self.wrote = False
+        self.pinned = self._cookie_pin(request)
+        self.user_checked = self.pinned
+
+    @staticmethod
+    def _cookie_pin(request):
+        try:
+            return float(request.COOKIES.get(COOKIE_NAME, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def use_primary(self):
+        if self.wrote or self.pinned:
+            return True
+        if not self.user_checked:
+            user = _known_user(self.request)
+            if user is not None:
+                self.user_checked = True
+                self.pinned = user.is_authenticated and _pins().get(pin_key(user.pk)) is not None
+        return self.pinned
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = routing_setting('REPLICAS')
+        state = _state.get()
+        if not replicas or (state is not None and state.use_primary()):
+            return routing_setting('PRIMARY')
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return routing_setting('PRIMARY')
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # every alias holds the same data
+        aliases = {routing_setting('PRIMARY'), *routing_setting('REPLICAS')}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+class ReadYourWritesMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState(request)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        if state.wrote and routing_setting('REPLICAS'):
+            seconds = routing_setting('STICKY_SECONDS')
+            response.set_cookie(
+                COOKIE_NAME, str(int(time.time() + seconds) + 1), max_age=seconds, httponly=True, samesite='Lax',
+            )
+            user = _known_user(request)
+            if user is not None and user.is_authenticated:
+                _pins().set(pin_key(user.pk), True, seconds)
+        return response
@@ -0,0 +1,193 @@
+# nova_project/media.py
+"""
+Serving MEDIA_ROOT (product and profile images, their variants).
+
+    urlpatterns += media_urlpatterns()
+
+Django only decides how a file is sent: it checks the path, answers
+conditional requests (ETag / Last-Modified, 304) from a stat(), and sets the
+caching headers. The bytes themselves go one of three ways:
+
+    MEDIA_SERVING = {'ACCEL': 'x-accel', 'ACCEL_PREFIX': '/protected-media/'}
+
+  - 'x-accel' (nginx): an empty response with X-Accel-Redirect to
+    ACCEL_PREFIX + path; nginx serves it from an internal location, e.g.
+
+        location /protected-media/ { internal; alias /srv/nova/media/; }
+
+  - 'x-sendfile' (Apache mod_xsendfile, lighttpd): X-Sendfile with the
+    file's absolute path.
+  - None: Django sends the file itself, honouring a single-range Range
+    header (206 / 416). Fine for development, slow in production: every
+    byte then passes through a Python worker. Under ASGI the blocks are
+    read off the event loop and sent as they are read (Django would
+    otherwise read a synchronous iterator whole before sending it).
+
+With an offload the proxy serves Range requests. Content-hashed names
+(products.images.hashed_name) are cached for a year as immutable; any other
+file for MAX_AGE seconds, then revalidated with its ETag.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+from urllib.parse import quote, urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.urls import re_path
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+DEFAULTS = {
+    'ACCEL': None,
+    'ACCEL_PREFIX': '/protected-media/',
+    'MAX_AGE': 3600,
+}
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# name.<12 hex digits>.ext, as written by products.images.hashed_name
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+BLOCK_SIZE = 64 * 1024
+
+
+def media_setting(name):
+    return getattr(settings, 'MEDIA_SERVING', {}).get(name, DEFAULTS[name])
+
+
+def is_hashed(path):
+    return HASHED_NAME.search(path) is not None
+
+
+def media_urlpatterns():
+    """The serve_media route under MEDIA_URL; none when media lives on another host."""
+    if not settings.MEDIA_URL or urlsplit(settings.MEDIA_URL).netloc:
+        return []
+    prefix = re.escape(settings.MEDIA_URL.lstrip('/'))
+    return [re_path(rf'^{prefix}(?P<path>.*)$', serve_media, name='media')]
+
+
+@require_safe
+def serve_media(request, path):
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+        info = os.stat(fullpath)
+    except (SuspiciousFileOperation, OSError, ValueError):
+        raise Http404('No such file.')
+    if not stat.S_ISREG(info.st_mode):
+        raise Http404('No such file.')
+
+    # same format as nginx's own ETag, so both sides agree when offloaded
+    etag = f'"{int(info.st_mtime):x}-{info.st_size:x}"'
+    last_modified = int(info.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _send(request, path, fullpath, info.st_size, etag, last_modified)
+
+    response.headers.setdefault('ETag', etag)
+    response.headers.setdefault('Last-Modified', http_date(last_modified))
+    if is_hashed(path):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=media_setting('MAX_AGE'))
+    return response
+
+
+def _send(request, path, fullpath, size, etag, last_modified):
+    content_type = mimetypes.guess_type(fullpath)[0] or 'application/octet-stream'
+    accel = media_setting('ACCEL')
+    if accel == 'x-accel':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = quote(media_setting('ACCEL_PREFIX') + path)
+        return response
+    if accel == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = fullpath
+        return response
+
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    if if_range is None or if_range == etag or parse_http_date_safe(if_range) == last_modified:
+        try:
+            byte_range = _byte_range(request.headers.get('Range'), size)
+        except ValueError:
+            response = HttpResponse(status=416, content_type=content_type)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if byte_range is None:
+        if isinstance(request, ASGIRequest):
+            response = _stream(request, fullpath, 0, size - 1, content_type=content_type)
+        else:
+            response = FileResponse(open(fullpath, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = _stream(request, fullpath, start, end, status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def _stream(request, fullpath, start, end, **kwargs):
+    """A StreamingHttpResponse over bytes start..end of the file; async under ASGI."""
+    blocks = _read(fullpath, start, end)
+    response = StreamingHttpResponse(_aiter(blocks) if isinstance(request, ASGIRequest) else blocks, **kwargs)
+    response['Content-Length'] = end - start + 1
+    return response
+
+
+def _byte_range(header, size):
+    """
+    (first, last) byte of a single `bytes=` range, clamped to the file; None
+    to send the whole file (no Range, or one we don't serve: several ranges,
+    other units). ValueError when the range lies outside the file.
+    """
+    match = RANGE.match(header or '')
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # suffix: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    first = int(first)
+    if first >= size:
+        raise ValueError(header)
+    last = int(last) if last else size - 1
+    if last < first:
+        return None
+    return first, min(last, size - 1)
+
+
+def _read(fullpath, start, end):
+    with open(fullpath, 'rb') as fh:
+        fh.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            block = fh.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+async def _aiter(blocks):
+    # each block is read in a worker thread, off the event loop
+    next_block = sync_to_async(next, thread_sensitive=False)
+    try:
+        while (block := await next_block(blocks, None)) is not None:
+            yield block
+    finally:
+        blocks.close()
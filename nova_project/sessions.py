@@ -0,0 +1,20 @@
+# nova_project/sessions.py
+"""
+Database sessions whose writes go through the write queue.
+
+Signup and password reset keep their progress in the session
+(api_send_otp, api_verify_otp, ...), and SessionMiddleware saves it after
+almost every such request, so these rows are the most frequent writes
+after products. SESSION_ENGINE = 'nova_project.sessions'.
+"""
+from django.contrib.sessions.backends import db
+
+from .write_queue import queued_write
+
+
+class SessionStore(db.SessionStore):
+    def save(self, must_create=False):
+        queued_write(super().save, must_create)
+
+    def delete(self, session_key=None):
+        queued_write(super().delete, session_key)
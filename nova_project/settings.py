@@ -12,6 +12,9 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
+
+from nova_project.sqlite import sqlite_options
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -53,6 +56,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'nova_project.db_routing.ReadYourWritesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -88,8 +92,74 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        # WAL, synchronous=NORMAL, mmap, busy timeout, BEGIN IMMEDIATE
+        # (nova_project/sqlite.py)
+        'OPTIONS': sqlite_options(),
+    },
+    # Local stand-in for a read replica: a copy of the primary, refreshed by
+    # hand (sqlite3 db.sqlite3 ".backup db.replica.sqlite3"). Reads only go
+    # here once it is listed in DATABASE_ROUTING['REPLICAS'].
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.replica.sqlite3',
+        'OPTIONS': sqlite_options(),
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+# Writes go to PRIMARY, reads to a random REPLICAS alias; after a request
+# writes, that client's reads stay on PRIMARY for STICKY_SECONDS (replication
+# lag). See nova_project/db_routing.py. The per-user pin (for clients without
+# the cookie) lives in CACHE_ALIAS, which must be shared by all workers.
+DATABASE_ROUTERS = ['nova_project.db_routing.PrimaryReplicaRouter']
+DATABASE_ROUTING = {
+    'PRIMARY': 'default',
+    'REPLICAS': [],
+    'STICKY_SECONDS': 5,
+    'CACHE_ALIAS': 'shared',
+}
+
+# Single writer thread per process (nova_project/write_queue.py): queued
+# writes are serialized and committed BATCH_SIZE at a time instead of
+# contending for SQLite's lock. Off by default.
+WRITE_QUEUE = {
+    'ENABLED': False,
+    'BATCH_SIZE': 50,
+    'TIMEOUT': 30,
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# 'default' is per process: only for entries a worker may rebuild on its own
+# (feed pages). 'shared' is seen by every worker process and holds what must
+# agree across them: OTP codes, JWT revocations, throttle counters, the feed
+# version, cached user rows.
+# Production: set REDIS_URL (redis://host:6379/0; needs the redis package).
+# Without it 'shared' is a directory of files that all workers on this host
+# use; its add()/incr() are not atomic, so under heavy concurrency limits and
+# locks there are best-effort.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'nova',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('SHARED_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'nova-shared-cache')),
+        # culling drops random entries: keep it for real overflow only
+        'OPTIONS': {'MAX_ENTRIES': 100_000},
+    },
 }
+if os.environ.get('REDIS_URL'):
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+
+# the test suite gets a 'shared' cache of its own (a temporary directory)
+TEST_RUNNER = 'nova_project.test_runner.NovaTestRunner'
 
 
 # Password validation
@@ -143,6 +213,16 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# How /media/ files are sent (nova_project/media.py): by Django itself, or
+# with ACCEL = 'x-accel' (nginx, internal location at ACCEL_PREFIX) or
+# 'x-sendfile' (Apache, lighttpd) by the front proxy. Content-hashed uploads
+# are cached as immutable, other files for MAX_AGE seconds.
+MEDIA_SERVING = {
+    'ACCEL': None,
+    'ACCEL_PREFIX': '/protected-media/',
+    'MAX_AGE': 3600,
+}
+
 
 AUTH_USER_MODEL = 'users.User'
 
@@ -152,8 +232,39 @@ AUTH_USER_MODEL = 'users.User'
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 DEFAULT_FROM_EMAIL = 'noreply@nova.com'
 
+# Background mail sender (users/mail.py): messages per SMTP session batch,
+# delivery attempts, first retry delay (doubles each time), idle close.
+MAIL_QUEUE = {
+    'BATCH_SIZE': 50,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_SECONDS': 2,
+    'IDLE_TIMEOUT': 30,
+}
 
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# Chat over WebSockets (chat/layers.py): channel layer backend and how many
+# undelivered events one connection may queue before the oldest is dropped.
+CHAT = {
+    'CHANNEL_LAYER': 'chat.layers.InMemoryChannelLayer',
+    'CHANNEL_CAPACITY': 100,
+    # online / last seen / typing, in the shared cache so that the REST
+    # workers render what the WebSocket workers stamped
+    'PRESENCE_BACKEND': 'chat.presence.CachePresence',
+    'PRESENCE_CACHE_ALIAS': 'shared',
+    'PRESENCE_TTL': 60,
+    'TYPING_TTL': 6,
+}
+
+# One-time codes for signup and password reset (users/otp.py). A code sent by
+# one worker is checked by another, so CACHE_ALIAS must be the shared cache.
+OTP = {
+    'TTL_SECONDS': 600,
+    'MAX_ATTEMPTS': 5,
+    'CACHE_ALIAS': 'shared',
+}
+
+
+# database sessions, saved through the write queue when it is enabled
+SESSION_ENGINE = 'nova_project.sessions'
 
 
 
@@ -163,8 +274,45 @@ from datetime import timedelta
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+        'users.authentication.CachedJWTAuthentication',
+    ),
+    # Sliding-window limits for views with a throttle_scope (users/throttling.py):
+    # '<scope>' is per client IP, '<scope>_email' per account.
+    'DEFAULT_THROTTLE_RATES': {
+        'login': '20/min',
+        'login_email': '5/min',
+        'otp': '10/hour',
+        'otp_email': '3/10min',
+        'otp_verify': '30/hour',
+        'otp_verify_email': '10/10min',
+        'token_refresh': '60/min',
+        'password_change': '10/hour',
+        'password_change_email': '5/hour',
+    },
+}
+
+# Cache holding the throttle counters (users/throttling.py). It must be shared
+# by all workers, or each one enforces the limits on its own.
+THROTTLE_CACHE_ALIAS = 'shared'
+
+# Seconds an authenticated user row stays cached (users/authentication.py);
+# saving or deleting the user drops it immediately. The cache must be shared:
+# the save that drops it may happen in any worker.
+AUTH_USER_CACHE_TIMEOUT = 60
+AUTH_USER_CACHE_ALIAS = 'shared'
+
+# Threads per process for password hashing in the async login view
+# (users/async_views.py); caps concurrent PBKDF2 work under ASGI.
+AUTH_HASH_THREADS = 4
+
+# JWT revocation list (users/revocation.py): per-process bloom filter sized
+# for CAPACITY live revocations; workers resync at most every SYNC_INTERVAL s
+# from the log in the shared cache (a logout must reach every worker).
+TOKEN_REVOCATION = {
+    'CAPACITY': 100000,
+    'ERROR_RATE': 0.01,
+    'SYNC_INTERVAL': 1.0,
+    'CACHE_ALIAS': 'shared',
 }
 
 
@@ -176,6 +324,19 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Product listings: default keyset page size (clients may pass ?page_size= up to the max)
+PRODUCTS_PAGE_SIZE = 20
+PRODUCTS_MAX_PAGE_SIZE = 100
+# Seconds a serialized public feed page stays cached (writes invalidate earlier)
+PRODUCTS_FEED_CACHE_TIMEOUT = 300
+# Cache holding the feed's version (the pages' invalidation and validators);
+# must be shared, or a write only invalidates the worker that handled it
+PRODUCTS_FEED_STATE_CACHE_ALIAS = 'shared'
+# Most operations one POST /products/api/products/batch/ may carry
+PRODUCTS_BATCH_MAX_OPERATIONS = 100
+# Rows fetched, serialized and sent per step of a ?stream=true listing
+PRODUCTS_STREAM_CHUNK_SIZE = 500
+
 LOGIN_URL = '/users/login/'  
 LOGIN_REDIRECT_URL = '/products/dashboard/'
 
@@ -0,0 +1,42 @@
+# nova_project/sqlite.py
+"""
+SQLite connection profile for serving requests from several threads.
+
+    DATABASES['default']['OPTIONS'] = sqlite_options()
+
+Every new connection runs these PRAGMAs (Django's init_command):
+
+  - journal_mode=WAL: readers no longer block the writer, nor the writer
+    readers; only writers wait for each other.
+  - synchronous=NORMAL: in WAL mode a commit no longer waits for an fsync
+    (the WAL is synced at checkpoints). A power cut can lose the last
+    commits but never corrupts the file.
+  - mmap_size: reads go through a memory map instead of read() calls.
+
+The connection also waits up to `busy_timeout` seconds for the write lock
+instead of failing at once, and transactions start with BEGIN IMMEDIATE.
+A DEFERRED transaction that reads and then writes has to upgrade its lock;
+when another writer got there first SQLite fails that upgrade immediately
+with "database is locked", whatever the busy timeout. Taking the lock at
+BEGIN makes it wait its turn like any other writer.
+
+WAL mode is stored in the database file, so the -wal and -shm files next to
+it belong to it; copy a live database with `sqlite3 db.sqlite3 ".backup
+copy.sqlite3"`, not cp.
+"""
+MMAP_SIZE = 256 * 1024 * 1024
+
+
+def sqlite_options(journal_mode='WAL', synchronous='NORMAL', mmap_size=MMAP_SIZE, busy_timeout=20.0,
+                   transaction_mode='IMMEDIATE'):
+    """OPTIONS for a django.db.backends.sqlite3 database (Django 5.1+)."""
+    pragmas = {
+        'journal_mode': journal_mode,
+        'synchronous': synchronous,
+        'mmap_size': mmap_size,
+    }
+    return {
+        'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in pragmas.items()),
+        'timeout': busy_timeout,
+        'transaction_mode': transaction_mode,
+    }
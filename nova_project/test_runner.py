@@ -0,0 +1,53 @@
+# nova_project/test_runner.py
+"""
+Test runner that gives the suite a 'shared' cache of its own.
+
+    TEST_RUNNER = 'nova_project.test_runner.NovaTestRunner'
+
+The 'shared' cache (settings.CACHES) holds a running site's OTP codes,
+revocation log and throttle counters, and tests clear it freely. For the
+length of the run it is therefore a fresh temporary directory, whatever
+SHARED_CACHE_DIR or REDIS_URL say; run_in_other_process() hands that
+directory on to the process it starts.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class NovaTestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.shared_cache_dir = tempfile.mkdtemp(prefix='nova-test-cache-')
+        self._shared_cache = override_settings(CACHES={
+            **settings.CACHES,
+            'shared': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': self.shared_cache_dir,
+                'OPTIONS': {'MAX_ENTRIES': 100_000},
+            },
+        })
+        self._shared_cache.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._shared_cache.disable()
+        shutil.rmtree(self.shared_cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
+
+
+def run_in_other_process(code):
+    """Run `code` in a separate interpreter (as another worker would) and return its last output line."""
+    env = {**os.environ, 'SHARED_CACHE_DIR': settings.CACHES['shared']['LOCATION']}
+    env.pop('REDIS_URL', None)
+    result = subprocess.run(
+        [sys.executable, 'manage.py', 'shell', '-c', code],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True, timeout=60,
+    )
+    lines = result.stdout.strip().splitlines()
+    return lines[-1] if lines else ''
@@ -34,6 +34,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from nova_project.media import media_urlpatterns
+
 urlpatterns = [
     path('admin/', admin.site.urls),
 
@@ -44,11 +46,14 @@ urlpatterns = [
     # PRODUCTS (API + HTML all in one)
     path('products/', include('products.urls')),
 
+    # CHAT (REST; the WebSocket endpoint is routed in asgi.py)
+    path('chat/', include('chat.urls')),
+
     # HOME
     path('', include('home.urls')),
 ]
 
 
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# uploaded images: sent by Django, or handed off to the front proxy
+# (MEDIA_SERVING, see nova_project/media.py)
+urlpatterns += media_urlpatterns()
@@ -0,0 +1,213 @@
+# nova_project/write_queue.py
+"""
+Single-writer queue for SQLite.
+
+SQLite has one write lock per database file. With many request threads
+writing at once they take turns anyway, but each one waits by sleeping and
+retrying (the busy timeout), so under load the lock sits idle between
+writers and the unlucky ones time out.
+
+queued_write(fn, ...) calls fn on one writer thread per process instead,
+and the writer commits whatever has queued up meanwhile as one transaction:
+one lock acquisition and one commit for up to BATCH_SIZE writes. Each call
+runs in its own savepoint, so a call that raises is rolled back alone and
+its caller gets the exception; the others still commit. The caller blocks
+until its write is committed and gets fn's return value.
+
+fn runs in a copy of the caller's context (ContextVars such as the feed
+invalidation deferral and the database routing state carry over). Work that
+must not hold up the other writers (image variants, for instance) goes
+through after_write(), which runs it back on the caller's thread once the
+write is committed.
+
+The queue is off unless enabled; queued_write() then just calls fn. It also
+calls fn directly inside an atomic block: the caller's transaction may
+already hold the lock the writer would wait for.
+
+Settings (all optional), e.g.:
+    WRITE_QUEUE = {'ENABLED': True, 'BATCH_SIZE': 50, 'TIMEOUT': 30}
+"""
+import atexit
+import contextvars
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'BATCH_SIZE': 50,
+    'TIMEOUT': 30.0,
+}
+
+_current_job = contextvars.ContextVar('write_queue_job', default=None)
+
+
+def queue_setting(name):
+    return getattr(settings, 'WRITE_QUEUE', {}).get(name, DEFAULTS[name])
+
+
+class _Job:
+    __slots__ = ('call', 'context', 'future', 'after')
+
+    def __init__(self, call, context):
+        self.call = call
+        self.context = context
+        self.future = Future()
+        self.after = []
+
+
+class WriteQueue:
+    def __init__(self, using=None, batch_size=None, timeout=None):
+        self.using = using or DEFAULT_DB_ALIAS
+        self.batch_size = batch_size or queue_setting('BATCH_SIZE')
+        self.timeout = timeout or queue_setting('TIMEOUT')
+
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._in_flight = 0
+        self._thread = None
+        self._stopping = False
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+
+    # ── caller side ──────────────────────────────────────────────────────────
+    def submit(self, fn, *args, **kwargs):
+        """Call fn(*args, **kwargs) on the writer thread; return its result once committed."""
+        if threading.current_thread() is self._thread or connections[self.using].in_atomic_block:
+            return fn(*args, **kwargs)
+
+        job = _Job(lambda: fn(*args, **kwargs), contextvars.copy_context())
+        with self._cond:
+            self._pending.append(job)
+            self._start()
+            self._cond.notify()
+        try:
+            result = job.future.result(self.timeout)
+        except FutureTimeout:
+            if job.future.cancel():
+                raise OperationalError(f'Write queue: not written within {self.timeout} s.')
+            # already being written: it will finish
+            result = job.future.result()
+        for callback in job.after:
+            callback()
+        return result
+
+    def depth(self):
+        """Writes not yet committed (queued or in the current batch)."""
+        with self._cond:
+            return len(self._pending) + self._in_flight
+
+    def stats(self):
+        with self._cond:
+            return {
+                'queued': len(self._pending),
+                'in_flight': self._in_flight,
+                'written': self.written,
+                'failed': self.failed,
+                'batches': self.batches,
+                'worker_alive': bool(self._thread and self._thread.is_alive()),
+            }
+
+    def stop(self, timeout=10.0):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread:
+            thread.join(timeout)
+
+    def _start(self):
+        # Started lazily so every (forked) worker process gets its own thread.
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='write-queue', daemon=True)
+            self._thread.start()
+
+    # ── writer side ──────────────────────────────────────────────────────────
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                break
+            try:
+                self._write(batch)
+            finally:
+                with self._cond:
+                    self._in_flight -= len(batch)
+                    self._cond.notify_all()
+        connections[self.using].close()
+
+    def _next_batch(self):
+        """Wait for work; returns up to batch_size jobs, or None once stopped and drained."""
+        with self._cond:
+            while not self._pending:
+                if self._stopping:
+                    return None
+                self._cond.wait()
+            size = min(self.batch_size, len(self._pending))
+            batch = [self._pending.popleft() for _ in range(size)]
+            self._in_flight += len(batch)
+            return batch
+
+    def _write(self, batch):
+        # as request_started does for request threads
+        connections[self.using].close_if_unusable_or_obsolete()
+        jobs = [job for job in batch if job.future.set_running_or_notify_cancel()]
+        written = []
+        try:
+            with transaction.atomic(using=self.using):
+                for job in jobs:
+                    try:
+                        with transaction.atomic(using=self.using):
+                            result = job.context.run(self._call, job)
+                    except Exception as exc:
+                        job.future.set_exception(exc)
+                        self.failed += 1
+                    else:
+                        written.append((job, result))
+        except Exception as exc:
+            # the commit itself failed: nothing in the batch was written
+            logger.warning("Write queue batch of %d failed to commit", len(written), exc_info=True)
+            for job, _ in written:
+                job.future.set_exception(exc)
+            self.failed += len(written)
+            return
+        self.batches += 1
+        self.written += len(written)
+        for job, result in written:
+            job.future.set_result(result)
+
+    @staticmethod
+    def _call(job):
+        _current_job.set(job)
+        return job.call()
+
+
+write_queue = WriteQueue()
+atexit.register(write_queue.stop, 5.0)
+
+
+def queued_write(fn, *args, **kwargs):
+    """fn(*args, **kwargs), through the write queue when WRITE_QUEUE['ENABLED']."""
+    if not queue_setting('ENABLED'):
+        return fn(*args, **kwargs)
+    return write_queue.submit(fn, *args, **kwargs)
+
+
+def after_write(callback):
+    """
+    Call `callback` on the calling thread once the current queued write is
+    committed; dropped if it rolls back. Outside the writer, call it now.
+    """
+    job = _current_job.get()
+    if job is None:
+        callback()
+    else:
+        job.after.append(callback)
@@ -5,6 +5,9 @@ class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'products'
 
+    def ready(self):
+        import products.signals
+
 
 
 # from django.apps import AppConfig
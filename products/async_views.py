@@ -0,0 +1,135 @@
+# products/async_views.py
+"""
+Async (ASGI) versions of the public product reads.
+
+Same payloads, filters, ?fields=, cursors and validators as the DRF views in
+products/views.py, but every query goes through the async ORM, so under
+uvicorn a request waiting on the database doesn't hold a thread. DRF views
+are synchronous, so these are plain Django views returning JsonResponse;
+they are read-only (writes stay on the DRF endpoints).
+"""
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.http import require_safe
+from rest_framework.exceptions import APIException, NotAuthenticated
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .cache import acached_feed_page, afeed_changed_at, afeed_version
+from .conditional import conditional_response, make_etag, set_validators
+from .filters import filter_products
+from .models import Product
+from .pagination import ProductCursorPagination
+from .serializers import ProductSerializer, parse_fields, wants_live_fields
+from .streaming import aiter_json_array, streaming_json_response, wants_stream
+
+
+def api_request(request):
+    """DRF Request wrapper for query_params and (lazy) JWT authentication."""
+    return Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+
+
+def api_error(exc):
+    detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    return JsonResponse(detail, status=exc.status_code, safe=False)
+
+
+async def apaginated_products(request, queryset, ordering=None):
+    """paginated_products() with the page fetched by the async ORM; returns the payload."""
+    fields = parse_fields(request.query_params.get('fields'))
+    paginator = ProductCursorPagination()
+    if ordering:
+        paginator.ordering = ordering
+    queryset = ProductSerializer.setup_queryset(queryset, fields, paginator.ordering)
+    page = await paginator.apaginate_queryset(queryset, request)
+    serializer = ProductSerializer(page, many=True, fields=fields, context={'request': request})
+    return {
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link(),
+        'results': serializer.data,
+    }
+
+
+async def astreamed_products(request, queryset, ordering=None):
+    """The ?stream=true mode of views.listed_products(), read with aiterator()."""
+    user = await sync_to_async(lambda: request.user)()
+    if not user.is_authenticated:
+        raise NotAuthenticated("Streaming lists require authentication.")
+    fields = parse_fields(request.query_params.get('fields'))
+    ordering = ordering or ProductCursorPagination.ordering
+    queryset = ProductSerializer.setup_queryset(queryset, fields, ordering).order_by(*ordering)
+    return streaming_json_response(request, aiter_json_array(queryset, request, fields))
+
+
+@require_safe
+async def product_list(request):
+    request = api_request(request)
+    try:
+        products = Product.objects.all()
+        if request.query_params.get('my') == 'true':
+            # authentication may hit the database: keep it off the event loop
+            user = await sync_to_async(lambda: request.user)()
+            if not user.is_authenticated:
+                raise NotAuthenticated()
+            products = products.filter(owner=user)
+        products, ordering = filter_products(products, request.query_params)
+        if wants_stream(request):
+            return await astreamed_products(request, products, ordering)
+        return JsonResponse(await apaginated_products(request, products, ordering))
+    except APIException as exc:
+        return api_error(exc)
+
+
+@require_safe
+async def product_detail(request, id):
+    etag = updated_at = None
+    if not wants_live_fields(request.GET):
+        updated_at = await Product.objects.filter(id=id).values_list('updated_at', flat=True).afirst()
+        etag = make_etag(request, id, updated_at.isoformat()) if updated_at else None
+        response = conditional_response(request, etag, updated_at)
+        if response is not None:
+            return response
+
+    request = api_request(request)
+    try:
+        fields = parse_fields(request.query_params.get('fields'))
+    except APIException as exc:
+        return api_error(exc)
+    products = ProductSerializer.setup_queryset(Product.objects.all(), fields, images='all')
+    product = await products.filter(id=id).afirst()
+    if product is None:
+        return JsonResponse({'detail': 'No Product matches the given query.'}, status=404)
+    serializer = ProductSerializer(product, fields=fields, context={'request': request})
+    return set_validators(JsonResponse(serializer.data), etag, updated_at)
+
+
+@require_safe
+async def product_feed(request):
+    request = api_request(request)
+    try:
+        products, ordering = filter_products(Product.objects.all(), request.query_params)
+    except APIException as exc:
+        return api_error(exc)
+
+    async def abuild():
+        return await apaginated_products(request, products, ordering)
+
+    if wants_live_fields(request.query_params):
+        # seller presence changes without the feed changing: no cache, no validators
+        try:
+            return JsonResponse(await abuild())
+        except APIException as exc:
+            return api_error(exc)
+
+    # validators cost no query, as in the sync feed
+    etag = make_etag(request, await afeed_version())
+    changed_at = await afeed_changed_at()
+    response = conditional_response(request, etag, changed_at)
+    if response is not None:
+        return response
+
+    try:
+        data = await acached_feed_page(request, abuild)
+    except APIException as exc:
+        return api_error(exc)
+    return set_validators(JsonResponse(data), etag, changed_at)
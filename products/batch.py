@@ -0,0 +1,145 @@
+# products/batch.py
+"""
+Batch writes to a seller's own listings.
+
+    POST /products/api/products/batch/
+    {"operations": [
+        {"op": "create", "title": "Lamp", "description": "", "category": "other", "price": "12.00"},
+        {"op": "update", "id": 41, "price": "9.99"},
+        {"op": "delete", "id": 42}
+    ]}
+
+The batch is all or nothing. Every operation is validated and ownership of
+every id is checked with one query first; if anything is wrong nothing is
+written and each result says why (424 for operations that were fine but
+not applied). Otherwise the batch runs in one transaction: one
+bulk_create, one bulk_update, one filtered delete(), one search-index pass
+and one feed-cache invalidation, however many rows it touches.
+
+Images are not part of a batch; they still go through product_detail.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers, status
+
+from .cache import deferred_feed_invalidation, invalidate_feed
+from .models import Product
+from .search import index_products
+
+MAX_OPERATIONS = getattr(settings, 'PRODUCTS_BATCH_MAX_OPERATIONS', 100)
+OPERATIONS = ('create', 'update', 'delete')
+# columns a batch may set
+WRITABLE_FIELDS = ('title', 'description', 'category', 'price')
+SEARCH_FIELDS = frozenset(('title', 'description'))
+
+
+class BatchItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = list(WRITABLE_FIELDS)
+
+
+def apply_batch(user, operations):
+    """
+    Validate and apply `operations` for `user`. Returns (applied, results),
+    results holding one {"op", "id", "status"[, "errors"]} per operation.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise serializers.ValidationError({'operations': 'Expected a non-empty list of operations.'})
+    if len(operations) > MAX_OPERATIONS:
+        raise serializers.ValidationError({'operations': f'At most {MAX_OPERATIONS} operations per batch.'})
+
+    # one instance per mode: binding new serializer fields per item deep-copies them
+    validators = {'create': BatchItemSerializer(), 'update': BatchItemSerializer(partial=True)}
+    results, plan = [], []
+    seen_ids = set()
+    for operation in operations:
+        op = operation.get('op') if isinstance(operation, dict) else None
+        pk = operation.get('id') if isinstance(operation, dict) else None
+        result = {'op': op, 'id': pk}
+        results.append(result)
+        plan.append(None)
+
+        if op not in OPERATIONS:
+            result.update(status=status.HTTP_400_BAD_REQUEST, errors={'op': f'Expected one of: {", ".join(OPERATIONS)}.'})
+            continue
+        if op != 'create':
+            if not isinstance(pk, int) or isinstance(pk, bool):
+                result.update(status=status.HTTP_400_BAD_REQUEST, errors={'id': 'A product id is required.'})
+                continue
+            if pk in seen_ids:
+                result.update(status=status.HTTP_400_BAD_REQUEST, errors={'id': 'Appears more than once in this batch.'})
+                continue
+            seen_ids.add(pk)
+        if op == 'delete':
+            plan[-1] = {}
+            continue
+
+        data = {key: value for key, value in operation.items() if key not in ('op', 'id')}
+        unknown = sorted(set(data) - set(WRITABLE_FIELDS))
+        if unknown:
+            result.update(status=status.HTTP_400_BAD_REQUEST, errors={name: 'Unknown field.' for name in unknown})
+            continue
+        try:
+            plan[-1] = validators[op].run_validation(data)
+        except serializers.ValidationError as exc:
+            result.update(status=status.HTTP_400_BAD_REQUEST, errors=exc.detail)
+
+    # ownership of every referenced product, in one query (as IsOwnerOrReadOnly, per row)
+    owners = dict(Product.objects.filter(pk__in=seen_ids).values_list('pk', 'owner_id'))
+    for result, values in zip(results, plan):
+        if values is None or result['op'] == 'create':
+            continue
+        if result['id'] not in owners:
+            result.update(status=status.HTTP_404_NOT_FOUND, errors={'id': 'No such product.'})
+        elif owners[result['id']] != user.pk:
+            result.update(status=status.HTTP_403_FORBIDDEN, errors={'id': 'Only the owner can change this product.'})
+
+    if any('errors' in result for result in results):
+        for result in results:
+            result.setdefault('status', status.HTTP_424_FAILED_DEPENDENCY)
+        return False, results
+
+    _write(user, results, plan)
+    return True, results
+
+
+def _write(user, results, plan):
+    creates = [(result, values) for result, values in zip(results, plan) if result['op'] == 'create']
+    updates = {result['id']: values for result, values in zip(results, plan) if result['op'] == 'update'}
+    deletes = [result['id'] for result in results if result['op'] == 'delete']
+
+    # the delete's per-row signals (and anything else) collapse into one invalidation
+    with deferred_feed_invalidation(), transaction.atomic():
+        created = [Product(owner=user, **values) for _, values in creates]
+        if created:
+            Product.objects.bulk_create(created)
+            index_products(created)
+        for (result, _), product in zip(creates, created):
+            result.update(id=product.pk, status=status.HTTP_201_CREATED)
+
+        if updates:
+            now = timezone.now()
+            changed = set().union(*updates.values())
+            products = list(Product.objects.filter(pk__in=updates).only('pk', 'title', 'description', *changed))
+            for product in products:
+                for name, value in updates[product.pk].items():
+                    setattr(product, name, value)
+                # bulk_update skips auto_now: move the validators explicitly
+                product.updated_at = now
+            Product.objects.bulk_update(products, [*changed, 'updated_at'])
+            if changed & SEARCH_FIELDS:
+                index_products(products, replace=True)
+
+        if deletes:
+            Product.objects.filter(pk__in=deletes, owner=user).delete()
+
+        if created or updates:
+            invalidate_feed()
+
+    for result in results:
+        if result['op'] == 'update':
+            result['status'] = status.HTTP_200_OK
+        elif result['op'] == 'delete':
+            result['status'] = status.HTTP_204_NO_CONTENT
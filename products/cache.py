@@ -0,0 +1,190 @@
+# products/cache.py
+"""
+Response cache for the public product feed.
+
+Pages are stored under a versioned key:
+    products:feed:v<version>:<hash of absolute request URL>
+Any Product or ProductImage save/delete bumps the version (see products/signals.py), which
+orphans every cached page at once; stale entries simply age out. The bump waits for the
+write's transaction to commit: made earlier, a concurrent read could still see the old
+rows and cache them under the new version.
+
+The pages are per process (the 'default' cache), but the version and its
+timestamp live in the 'shared' cache: a write handled by one worker must
+orphan the pages, and move the validators, of every worker.
+"""
+import asyncio
+import contextvars
+import hashlib
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.utils import timezone
+
+FEED_VERSION_KEY = 'products:feed:version'
+# when the version last moved; the feed's Last-Modified
+FEED_CHANGED_KEY = 'products:feed:changed_at'
+
+# cache holding the version and changed_at, seen by every worker
+FEED_STATE_CACHE_ALIAS = getattr(settings, 'PRODUCTS_FEED_STATE_CACHE_ALIAS', 'shared')
+# seconds a cached feed page lives
+FEED_TIMEOUT = getattr(settings, 'PRODUCTS_FEED_CACHE_TIMEOUT', 300)
+# a rebuild holding the lock longer than this is assumed dead
+LOCK_TIMEOUT = 10
+# how long followers wait for the leader before building themselves
+LOCK_WAIT = 5
+POLL_INTERVAL = 0.05
+
+
+def _state():
+    return caches[FEED_STATE_CACHE_ALIAS]
+
+
+def feed_version():
+    state = _state()
+    version = state.get(FEED_VERSION_KEY)
+    if version is None:
+        # Seed from the clock, not 1, so an evicted counter can never come
+        # back to a version whose pages are still cached.
+        state.add(FEED_VERSION_KEY, time.time_ns(), timeout=None)
+        version = state.get(FEED_VERSION_KEY)
+    return version
+
+
+async def afeed_version():
+    state = _state()
+    version = await state.aget(FEED_VERSION_KEY)
+    if version is None:
+        await state.aadd(FEED_VERSION_KEY, time.time_ns(), timeout=None)
+        version = await state.aget(FEED_VERSION_KEY)
+    return version
+
+
+def bump_feed_version():
+    state = _state()
+    try:
+        state.incr(FEED_VERSION_KEY)
+    except ValueError:
+        state.set(FEED_VERSION_KEY, time.time_ns(), timeout=None)
+    state.set(FEED_CHANGED_KEY, timezone.now(), timeout=None)
+
+
+# set inside deferred_feed_invalidation(): [invalidation pending?]
+_deferred = contextvars.ContextVar('products_feed_invalidation_deferred', default=None)
+
+
+def invalidate_feed():
+    """
+    bump_feed_version() once the current transaction commits (at once outside
+    one; under the write queue, once the writer's batch commits), or just note
+    that one is due inside deferred_feed_invalidation().
+    """
+    pending = _deferred.get()
+    if pending is None:
+        transaction.on_commit(bump_feed_version)
+    else:
+        pending[0] = True
+
+
+@contextmanager
+def deferred_feed_invalidation():
+    """
+    Collapse the invalidations of a batch write (one per row from the save
+    and delete signals) into a single bump, due when the block exits.
+    """
+    pending = [False]
+    token = _deferred.set(pending)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+        if pending[0]:
+            transaction.on_commit(bump_feed_version)
+
+
+def feed_changed_at():
+    return _state().get(FEED_CHANGED_KEY)
+
+
+async def afeed_changed_at():
+    return await _state().aget(FEED_CHANGED_KEY)
+
+
+def _url_digest(request):
+    return hashlib.sha256(request.build_absolute_uri().encode('utf-8')).hexdigest()
+
+
+def feed_page_key(request):
+    return f'products:feed:v{feed_version()}:{_url_digest(request)}'
+
+
+async def afeed_page_key(request):
+    return f'products:feed:v{await afeed_version()}:{_url_digest(request)}'
+
+
+def cached_feed_page(request, build):
+    """Return the cached payload for this feed URL, building it on a miss."""
+    return single_flight(feed_page_key(request), build, FEED_TIMEOUT)
+
+
+async def acached_feed_page(request, abuild):
+    """cached_feed_page() for async views; `abuild` is a coroutine function."""
+    return await asingle_flight(await afeed_page_key(request), abuild, FEED_TIMEOUT)
+
+
+def single_flight(key, build, timeout):
+    """
+    cache.get(key), and on a miss let exactly one caller run build().
+
+    The leader is whoever wins cache.add() on the lock key (atomic on every
+    Django backend), so concurrent misses across threads and processes
+    collapse into one rebuild. Followers poll for the leader's result and
+    fall back to building it themselves if the leader never delivers.
+    """
+    data = cache.get(key)
+    if data is not None:
+        return data
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+        try:
+            data = build()
+            cache.set(key, data, timeout=timeout)
+        finally:
+            cache.delete(lock_key)
+        return data
+
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        data = cache.get(key)
+        if data is not None:
+            return data
+    return build()
+
+
+async def asingle_flight(key, abuild, timeout):
+    """single_flight() for async callers: same lock protocol, but waiting yields to the event loop."""
+    data = await cache.aget(key)
+    if data is not None:
+        return data
+
+    lock_key = f'{key}:lock'
+    if await cache.aadd(lock_key, 1, timeout=LOCK_TIMEOUT):
+        try:
+            data = await abuild()
+            await cache.aset(key, data, timeout=timeout)
+        finally:
+            await cache.adelete(lock_key)
+        return data
+
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(POLL_INTERVAL)
+        data = await cache.aget(key)
+        if data is not None:
+            return data
+    return await abuild()
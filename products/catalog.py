@@ -0,0 +1,254 @@
+# products/catalog.py
+"""
+Bulk catalog import and export, as CSV or JSONL (one JSON object per line).
+
+Both directions stream: import reads one row at a time and writes every
+BATCH_SIZE valid rows with bulk_create in their own transaction; export
+walks the table with .iterator() and yields one line at a time. Memory
+stays flat however many rows go through.
+
+Columns (export writes all of them; import reads the ones it accepts):
+
+    id, owner, title, description, category, price, images, created_at, updated_at
+
+`owner` is the owner's email (an id also works on import). `images` are
+storage paths of files already under MEDIA_ROOT, e.g. product_images/a.jpg:
+a list in JSONL, `;`-separated in CSV. Import always creates new products;
+id, created_at and updated_at are ignored.
+
+bulk_create sends no signals, so import does their work once per batch:
+search indexing and one feed-cache invalidation. Image variants are not
+generated; run `python manage.py generate_image_variants` afterwards.
+"""
+import csv
+import io
+import json
+import posixpath
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+from .cache import invalidate_feed
+from .models import Product, ProductImage
+from .search import index_products
+
+User = get_user_model()
+
+FORMATS = ('csv', 'jsonl')
+COLUMNS = ('id', 'owner', 'title', 'description', 'category', 'price', 'images', 'created_at', 'updated_at')
+IMAGE_SEPARATOR = ';'
+
+BATCH_SIZE = 500
+EXPORT_CHUNK_SIZE = 2000
+# row errors kept in the report; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+
+class CatalogError(Exception):
+    """The input as a whole can't be read (unknown format, bad header)."""
+
+
+def format_for(filename, default=None):
+    """'csv' / 'jsonl' from a file name's extension, else `default`."""
+    ext = posixpath.splitext(filename or '')[1].lower().lstrip('.')
+    return {'csv': 'csv', 'jsonl': 'jsonl', 'ndjson': 'jsonl'}.get(ext, default)
+
+
+# ── import ───────────────────────────────────────────────────────────────────
+class CatalogRowSerializer(serializers.Serializer):
+    owner = serializers.CharField(required=False, allow_blank=True)
+    title = serializers.CharField(max_length=Product._meta.get_field('title').max_length)
+    description = serializers.CharField(allow_blank=True, default='', trim_whitespace=False)
+    category = serializers.ChoiceField(choices=Product.CATEGORY_CHOICES)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    images = serializers.ListField(child=serializers.CharField(), required=False, default=list)
+
+    def to_internal_value(self, data):
+        images = data.get('images')
+        if isinstance(images, str):
+            data = {**data, 'images': [path.strip() for path in images.split(IMAGE_SEPARATOR) if path.strip()]}
+        return super().to_internal_value(data)
+
+    def validate_images(self, paths):
+        for path in paths:
+            if posixpath.normpath(path) != path or path.split('/')[0] in ('', '..'):
+                raise serializers.ValidationError(f'{path}: must be a relative path inside the media storage.')
+            if not default_storage.exists(path):
+                raise serializers.ValidationError(f'{path}: no such file.')
+        return paths
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, line, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def as_dict(self):
+        # owner errors surface when a batch is written, after later lines' field errors
+        errors = sorted(self.errors, key=lambda error: error['line'])
+        return {'created': self.created, 'failed': self.failed, 'errors': errors}
+
+
+def read_rows(stream, fmt):
+    """
+    Yield (line number, row dict | CatalogError) from a text stream. A line
+    that doesn't parse is yielded as an error so the import can go on.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        if reader.fieldnames is None:
+            return
+        if 'title' not in reader.fieldnames:
+            raise CatalogError('CSV header must name the columns, e.g. owner,title,description,category,price,images.')
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'jsonl':
+        for line_num, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield line_num, CatalogError(f'Invalid JSON: {exc}')
+                continue
+            yield line_num, row if isinstance(row, dict) else CatalogError('Each line must be a JSON object.')
+    else:
+        raise CatalogError(f'Unknown format {fmt!r}; expected one of: {", ".join(FORMATS)}.')
+
+
+def import_rows(rows, owner=None, batch_size=BATCH_SIZE):
+    """
+    Validate and create products from (line, row) pairs. Rows without an
+    `owner` column go to `owner`. Invalid rows are reported and skipped;
+    every valid row is created. Returns an ImportReport.
+    """
+    report = ImportReport()
+    # one instance for every row: binding fresh serializer fields per row
+    # (a deepcopy of each) would cost more than validating them
+    validator = CatalogRowSerializer()
+    batch = []
+    for line, row in rows:
+        if isinstance(row, CatalogError):
+            report.add_error(line, {'non_field_errors': [str(row)]})
+            continue
+        try:
+            data = validator.run_validation(row)
+        except serializers.ValidationError as exc:
+            report.add_error(line, exc.detail)
+            continue
+        batch.append((line, data))
+        if len(batch) >= batch_size:
+            _create_batch(batch, owner, report)
+            batch = []
+    if batch:
+        _create_batch(batch, owner, report)
+    return report
+
+
+def _create_batch(batch, default_owner, report):
+    owners = _resolve_owners({data['owner'] for _, data in batch if data.get('owner')})
+    products, images = [], []
+    for line, data in batch:
+        key = data.get('owner')
+        owner_id = owners.get(key) if key else getattr(default_owner, 'pk', None)
+        if owner_id is None:
+            report.add_error(line, {'owner': [f'No user {key!r}.' if key else 'This field is required.']})
+            continue
+        product = Product(
+            owner_id=owner_id, title=data['title'], description=data['description'],
+            category=data['category'], price=data['price'],
+        )
+        products.append(product)
+        images.append(data['images'])
+    if not products:
+        return
+
+    with transaction.atomic():
+        Product.objects.bulk_create(products)
+        ProductImage.objects.bulk_create([
+            ProductImage(product=product, image=path, position=position)
+            for product, paths in zip(products, images)
+            for position, path in enumerate(paths)
+        ])
+        index_products(products)
+    invalidate_feed()
+    report.created += len(products)
+
+
+def _resolve_owners(keys):
+    """{email or id string: user id} for the keys that name an existing user; one query."""
+    if not keys:
+        return {}
+    ids = {key for key in keys if key.isdigit()}
+    emails = {key.lower(): key for key in keys - ids}
+    resolved = {}
+    users = User.objects.filter(email__in=emails) | User.objects.filter(pk__in=ids)
+    for pk, email in users.values_list('pk', 'email'):
+        if str(pk) in ids:
+            resolved[str(pk)] = pk
+        if email in emails:
+            resolved[emails[email]] = pk
+    return resolved
+
+
+# ── export ───────────────────────────────────────────────────────────────────
+def export_rows(queryset=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield one COLUMNS dict per product in id order, fetched chunk_size rows at a time."""
+    queryset = Product.objects.all() if queryset is None else queryset
+    queryset = (
+        queryset.order_by('id')
+        .with_owner(columns=['id', 'title', 'description', 'category', 'price', 'created_at', 'updated_at'])
+        # with iterator(), prefetches run once per chunk
+        .prefetch_related(Prefetch('images', queryset=ProductImage.objects.only('product_id', 'image', 'position')))
+    )
+    for product in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': product.id,
+            'owner': product.owner.email,
+            'title': product.title,
+            'description': product.description,
+            'category': product.category,
+            'price': product.price,
+            'images': [image.image.name for image in product.images.all()],
+            'created_at': product.created_at,
+            'updated_at': product.updated_at,
+        }
+
+
+def export_lines(fmt, rows):
+    """Encode export_rows() output as CSV or JSONL, one line per yielded string."""
+    if fmt == 'jsonl':
+        for row in rows:
+            yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+    elif fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=COLUMNS)
+
+        def flush():
+            line = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            return line
+
+        writer.writeheader()
+        yield flush()
+        for row in rows:
+            writer.writerow({
+                **row,
+                'images': IMAGE_SEPARATOR.join(row['images']),
+                'created_at': row['created_at'].isoformat(),
+                'updated_at': row['updated_at'].isoformat(),
+            })
+            yield flush()
+    else:
+        raise CatalogError(f'Unknown format {fmt!r}; expected one of: {", ".join(FORMATS)}.')
@@ -0,0 +1,60 @@
+# products/conditional.py
+"""
+Validators for conditional GETs (ETag / Last-Modified -> 304).
+
+Use with django.views.decorators.http.condition: the view's etag and
+last_modified functions run one cheap query (or none) and the view,
+including serialization, is skipped entirely when the client's copy is
+current.
+"""
+import hashlib
+from calendar import timegm
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(request, *parts):
+    """
+    Strong ETag over the resource validator `parts` plus everything else
+    that changes the bytes of the representation: host, path + query
+    (?fields=, ?cursor=, ...) and the Accept header (JSON vs browsable API).
+    """
+    raw = '|'.join(str(part) for part in (
+        request.get_host(), request.get_full_path(), request.META.get('HTTP_ACCEPT', ''), *parts,
+    ))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+
+def is_read(request):
+    return request.method in ('GET', 'HEAD')
+
+
+def request_memo(request, name, compute):
+    """
+    condition() calls the etag and last_modified functions separately;
+    share one validator query between them by caching it on the request.
+    """
+    attr = f'_conditional_{name}'
+    if not hasattr(request, attr):
+        setattr(request, attr, compute())
+    return getattr(request, attr)
+
+
+# condition() calls its validator functions synchronously, so async views
+# compute validators with the async ORM and use these two halves instead.
+def conditional_response(request, etag=None, last_modified=None):
+    """The 304/412 response for this request, or None to render normally."""
+    return get_conditional_response(
+        request,
+        etag=quote_etag(etag) if etag else None,
+        last_modified=timegm(last_modified.utctimetuple()) if last_modified else None,
+    )
+
+
+def set_validators(response, etag=None, last_modified=None):
+    if etag:
+        response.headers.setdefault('ETag', quote_etag(etag))
+    if last_modified and not response.has_header('Last-Modified'):
+        response.headers['Last-Modified'] = http_date(timegm(last_modified.utctimetuple()))
+    return response
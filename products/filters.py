@@ -0,0 +1,59 @@
+# products/filters.py
+from decimal import Decimal, InvalidOperation
+
+from rest_framework.exceptions import ValidationError
+
+from .models import Product
+
+# ?sort= value -> keyset ordering (last field unique so cursors never tie)
+SORT_ORDERINGS = {
+    'date': ('-created_at', '-id'),
+    'price': ('price', 'id'),
+    '-price': ('-price', '-id'),
+    'title': ('title', 'id'),
+}
+DEFAULT_SORT = 'date'
+
+CATEGORIES = {value for value, _ in Product.CATEGORY_CHOICES}
+
+
+def filter_products(queryset, params):
+    """
+    Apply the public list filters to `queryset`:
+        ?category=<choice>  ?min_price=<n>  ?max_price=<n>  ?sort=date|price|-price|title
+    Returns (queryset, ordering); raises ValidationError (400) on bad input.
+    Each sort walks an index on Product (created_at, price or title), and
+    ?category= with a price range or price sort uses (category, price). Other
+    combinations, such as ?category= with ?sort=title, filter while walking
+    the sort's index.
+    """
+    category = params.get('category')
+    if category:
+        if category not in CATEGORIES:
+            raise ValidationError({'category': f'Must be one of: {", ".join(sorted(CATEGORIES))}.'})
+        queryset = queryset.filter(category=category)
+
+    min_price = _price(params, 'min_price')
+    if min_price is not None:
+        queryset = queryset.filter(price__gte=min_price)
+    max_price = _price(params, 'max_price')
+    if max_price is not None:
+        queryset = queryset.filter(price__lte=max_price)
+
+    sort = params.get('sort') or DEFAULT_SORT
+    if sort not in SORT_ORDERINGS:
+        raise ValidationError({'sort': f'Must be one of: {", ".join(SORT_ORDERINGS)}.'})
+    return queryset, SORT_ORDERINGS[sort]
+
+
+def _price(params, name):
+    raw = params.get(name)
+    if raw in (None, ''):
+        return None
+    try:
+        value = Decimal(raw)
+    except InvalidOperation:
+        raise ValidationError({name: 'Must be a number.'})
+    if not value.is_finite() or value < 0:
+        raise ValidationError({name: 'Must be a non-negative number.'})
+    return value
@@ -4,6 +4,13 @@ from django import forms
 from .models import Product
 
 class ProductForm(forms.ModelForm):
+    # images are ProductImage rows now; these slots map to positions 0..4
+    image1 = forms.ImageField(required=False)
+    image2 = forms.ImageField(required=False)
+    image3 = forms.ImageField(required=False)
+    image4 = forms.ImageField(required=False)
+    image5 = forms.ImageField(required=False)
+
     class Meta:
         model = Product
-        fields = ['title', 'description', 'category', 'price', 'image1', 'image2', 'image3', 'image4', 'image5']
+        fields = ['title', 'description', 'category', 'price']
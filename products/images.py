@@ -0,0 +1,187 @@
+# products/images.py
+"""
+Resized, EXIF-free variants of uploaded images.
+
+For an original stored as  product_images/shoe.jpg  the variants live at
+    product_images/variants/shoe/<variant>.webp
+    product_images/variants/shoe/<variant>.jpg
+so their URLs follow from the original's name without any extra columns.
+Variants are written when the owning model is saved (products/signals.py,
+users/signals.py); `python manage.py generate_image_variants` backfills
+existing media.
+
+Originals are stored under their content hash, shoe.3f2a9c1b7e4d.jpg, so a
+URL never changes content and can be cached for good (nova_project/media.py).
+Variants keep fixed names: they are rewritten when the sizes change.
+
+Originals are served too (image1..image5, images[].image, profile pictures),
+so they are stored without metadata as well: strip_metadata() rewrites the
+upload before it is hashed.
+"""
+import hashlib
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import models
+from django.db.models.fields.files import ImageFieldFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# legacy API field names; imageN is the ProductImage at position N - 1
+PRODUCT_IMAGE_FIELDS = ('image1', 'image2', 'image3', 'image4', 'image5')
+
+# variant name -> longest edge in pixels (never upscaled)
+PRODUCT_VARIANTS = {'card': 400, 'detail': 1024, 'full': 2048}
+PROFILE_VARIANTS = {'thumb': 128, 'card': 400}
+
+# EXIF tag holding the camera's orientation
+ORIENTATION = 0x0112
+# Image.info entries strip_metadata() must not let Pillow write back
+METADATA_INFO_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment')
+
+# file extension -> (Pillow format, save options)
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def variant_name(name, variant, ext):
+    base, _ = os.path.splitext(name)
+    directory, filename = os.path.split(base)
+    return f'{directory}/variants/{filename}/{variant}.{ext}'
+
+
+def strip_metadata(content):
+    """
+    `content` rewritten in its own format without EXIF (camera, GPS), XMP or
+    comments, its EXIF orientation applied to the pixels; the ICC profile is
+    kept. JPEGs keep their quantization tables, so they lose next to nothing.
+    Returns `content` as is when Pillow cannot rewrite it.
+    """
+    content.seek(0)
+    try:
+        with Image.open(content) as image:
+            # phone cameras write MPO: a JPEG with an embedded preview (dropped)
+            pil_format = 'JPEG' if image.format in ('JPEG', 'MPO') else image.format
+            options = {}
+            if image.info.get('icc_profile'):
+                options['icc_profile'] = image.info['icc_profile']
+            if getattr(image, 'n_frames', 1) > 1 and pil_format != 'JPEG':
+                # animations are rewritten frame by frame, as they are
+                options['save_all'] = True
+            elif image.getexif().get(ORIENTATION, 1) != 1:
+                image = ImageOps.exif_transpose(image)
+            if pil_format == 'JPEG':
+                options['quality'] = 'keep' if image.format == 'JPEG' else FORMATS['jpg'][1]['quality']
+            # some writers fall back to these when they are not passed
+            for key in METADATA_INFO_KEYS:
+                image.info.pop(key, None)
+            buffer = BytesIO()
+            image.save(buffer, pil_format, **options)
+    except (OSError, ValueError, KeyError, Image.DecompressionBombError):
+        logger.warning("Could not strip metadata from %s", getattr(content, 'name', 'an upload'), exc_info=True)
+        content.seek(0)
+        return content
+    return ContentFile(buffer.getvalue(), name=getattr(content, 'name', None))
+
+
+def hashed_name(name, content):
+    """shoe.jpg -> shoe.<first 12 hex digits of the content's MD5>.jpg"""
+    digest = hashlib.md5(usedforsecurity=False)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    root, ext = os.path.splitext(name)
+    return f'{root}.{digest.hexdigest()[:12]}{ext}'
+
+
+class HashedImageFieldFile(ImageFieldFile):
+    def save(self, name, content, save=True):
+        content = strip_metadata(content)
+        super().save(hashed_name(name, content), content, save)
+
+
+class HashedImageField(models.ImageField):
+    """An ImageField that stores each upload metadata-free, under hashed_name()."""
+    attr_class = HashedImageFieldFile
+
+
+def variant_urls(fieldfile, variants, request=None):
+    """
+    { variant: { 'width': px, 'webp': url, 'jpg': url } } for a saved image,
+    or None when the field is empty. Clients build srcset from the widths.
+    """
+    if not fieldfile:
+        return None
+    storage = fieldfile.storage
+    urls = {}
+    for variant, width in variants.items():
+        entry = {'width': width}
+        for ext in FORMATS:
+            url = storage.url(variant_name(fieldfile.name, variant, ext))
+            entry[ext] = request.build_absolute_uri(url) if request else url
+        urls[variant] = entry
+    return urls
+
+
+def generate_variants(fieldfile, variants, overwrite=False):
+    """
+    Write every variant of `fieldfile` that is missing (or all of them with
+    overwrite=True). Orientation from EXIF is applied, then all metadata is
+    dropped. Returns the number of files written.
+    """
+    if not fieldfile:
+        return 0
+    storage = fieldfile.storage
+    todo = [
+        (variant, width, ext)
+        for variant, width in variants.items()
+        for ext in FORMATS
+        if overwrite or not storage.exists(variant_name(fieldfile.name, variant, ext))
+    ]
+    if not todo:
+        return 0
+
+    with storage.open(fieldfile.name, 'rb') as fh:
+        original = ImageOps.exif_transpose(Image.open(fh))
+        original.load()
+
+    written = 0
+    for variant, width, ext in todo:
+        image = original.copy()
+        image.thumbnail((width, width), Image.LANCZOS)
+        pil_format, options = FORMATS[ext]
+        if pil_format == 'JPEG' and image.mode != 'RGB':
+            image = _flatten(image)
+
+        buffer = BytesIO()
+        # Nothing from the original's info dict is passed on, so EXIF/GPS,
+        # XMP and ICC blocks are not carried into the variant.
+        image.save(buffer, pil_format, **options)
+        name = variant_name(fieldfile.name, variant, ext)
+        if storage.exists(name):
+            storage.delete(name)
+        storage.save(name, ContentFile(buffer.getvalue()))
+        written += 1
+    return written
+
+
+def _flatten(image):
+    """JPEG has no alpha channel: composite transparent images onto white."""
+    image = image.convert('RGBA')
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def generate_variants_safely(fieldfile, variants):
+    """generate_variants() for save hooks: a bad image must not fail the save."""
+    try:
+        return generate_variants(fieldfile, variants)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.exception("Could not generate variants for %s", fieldfile.name)
+        return 0
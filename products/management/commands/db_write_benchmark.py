@@ -0,0 +1,152 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.test.utils import override_settings
+
+from nova_project.sessions import SessionStore
+from nova_project.sqlite import sqlite_options
+from nova_project.write_queue import queued_write, write_queue
+from products.models import Product
+
+User = get_user_model()
+
+# name: (connection OPTIONS, write queue on)
+PROFILES = {
+    # Django's SQLite defaults: rollback journal, full fsync, DEFERRED, 5 s timeout
+    'stock': (sqlite_options(journal_mode='DELETE', synchronous='FULL', mmap_size=0, busy_timeout=5.0,
+                             transaction_mode=None), False),
+    'wal': (sqlite_options(), False),
+    'wal+queue': (sqlite_options(), True),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare SQLite under concurrent writes: Django's stock settings, the WAL profile "
+        "(nova_project/sqlite.py) and the profile plus the write queue. Writer threads each "
+        "create products and save a session (as product uploads and api_send_otp do) while "
+        "reader threads page the feed. Every profile runs on a fresh copy of the configured "
+        "database in a temporary directory; the database itself is not written."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=16, help="Concurrent writer threads.")
+        parser.add_argument("--requests", type=int, default=50, help="Writes (product + session) per writer.")
+        parser.add_argument("--readers", type=int, default=4, help="Concurrent reader threads.")
+        parser.add_argument("--profile", action="append", choices=list(PROFILES),
+                            help="Profile to run (repeatable; default: all).")
+
+    def handle(self, *args, **options):
+        connection = connections["default"]
+        if connection.vendor != "sqlite":
+            raise CommandError("The default database is not SQLite.")
+
+        settings_dict = connection.settings_dict
+        original = {"NAME": settings_dict["NAME"], "OPTIONS": settings_dict["OPTIONS"]}
+        reports = {}
+        source = sqlite3.connect(settings_dict["NAME"])
+        with tempfile.TemporaryDirectory() as directory:
+            try:
+                for name in options["profile"] or PROFILES:
+                    path = os.path.join(directory, f"{name}.sqlite3")
+                    copy = sqlite3.connect(path)
+                    source.backup(copy)
+                    copy.close()
+
+                    options_, queued = PROFILES[name]
+                    # every thread's connection is built from this dict
+                    connections.close_all()
+                    settings_dict.update(NAME=path, OPTIONS=options_)
+                    with override_settings(WRITE_QUEUE={"ENABLED": queued}):
+                        reports[name] = self.bench(options["writers"], options["requests"], options["readers"])
+                        write_queue.stop()
+                        self.stdout.write(f"{name}: done")
+            finally:
+                source.close()
+                connections.close_all()
+                settings_dict.update(original)
+
+        labels = [label for label, _ in next(iter(reports.values()))]
+        self.stdout.write("")
+        self.stdout.write(f"{'':<22}" + "".join(f"{name:>16}" for name in reports))
+        for row, label in enumerate(labels):
+            self.stdout.write(f"{label:<22}" + "".join(f"{report[row][1]:>16}" for report in reports.values()))
+
+    def bench(self, writers, requests, readers):
+        owner = User.objects.create_user(email=f"bench-{time.time_ns()}@example.invalid")
+        stats_before = write_queue.stats()
+        write_latencies, read_latencies, errors = [], [], []
+        writing = threading.Event()
+        writing.set()
+
+        def write(worker):
+            try:
+                for n in range(requests):
+                    started = time.perf_counter()
+                    try:
+                        queued_write(
+                            Product.objects.create,
+                            owner=owner, title=f"Bench {worker}-{n}", description="benchmark listing", price=1,
+                        )
+                        session = SessionStore()
+                        session["otp_email"] = f"bench-{worker}-{n}@example.invalid"
+                        session.save()
+                    except OperationalError as exc:
+                        errors.append(str(exc))
+                    else:
+                        write_latencies.append(time.perf_counter() - started)
+            finally:
+                connections.close_all()
+
+        def read():
+            try:
+                while writing.is_set():
+                    started = time.perf_counter()
+                    list(Product.objects.order_by("-created_at", "-id")[:20])
+                    read_latencies.append(time.perf_counter() - started)
+            finally:
+                connections.close_all()
+
+        reader_threads = [threading.Thread(target=read) for _ in range(readers)]
+        writer_threads = [threading.Thread(target=write, args=(i,)) for i in range(writers)]
+        for thread in reader_threads:
+            thread.start()
+        started = time.perf_counter()
+        for thread in writer_threads:
+            thread.start()
+        for thread in writer_threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        writing.clear()
+        for thread in reader_threads:
+            thread.join()
+
+        stats = write_queue.stats()
+        batches = stats["batches"] - stats_before["batches"]
+        queued = stats["written"] - stats_before["written"]
+
+        def pct(latencies, p):
+            if not latencies:
+                return "-"
+            latencies = sorted(latencies)
+            return f"{latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000:.1f} ms"
+
+        return [
+            ("requests ok", len(write_latencies)),
+            ("locked / timed out", len(errors)),
+            ("elapsed", f"{elapsed:.2f} s"),
+            ("requests/s", f"{len(write_latencies) / elapsed:.0f}"),
+            ("request p50", pct(write_latencies, 0.5)),
+            ("request p99", pct(write_latencies, 0.99)),
+            ("request max", f"{max(write_latencies, default=0) * 1000:.1f} ms"),
+            ("reads", len(read_latencies)),
+            ("read p50", pct(read_latencies, 0.5)),
+            ("read p99", pct(read_latencies, 0.99)),
+            ("writes per commit", f"{queued / batches:.1f}" if batches else "1"),
+        ]
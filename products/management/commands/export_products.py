@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from products.catalog import EXPORT_CHUNK_SIZE, FORMATS, export_lines, export_rows, format_for
+
+
+class Command(BaseCommand):
+    help = "Export every product as CSV or JSONL, streaming (see products/catalog.py for the columns)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", "-o", default="-", help="File to write, or - for stdout (default).")
+        parser.add_argument("--format", choices=FORMATS, help="Default: from the output file extension, else jsonl.")
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options["output"]
+        fmt = options["format"] or format_for(path, default="jsonl")
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be positive.")
+
+        lines = export_lines(fmt, export_rows(chunk_size=options["chunk_size"]))
+        if path == "-":
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+
+        with open(path, "w", encoding="utf-8", newline="") as stream:
+            stream.writelines(lines)
+        self.stdout.write(self.style.SUCCESS(f"Exported the catalog to {path}."))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from products.images import PRODUCT_VARIANTS, PROFILE_VARIANTS, generate_variants
+from products.models import ProductImage
+from users.models import Profile
+
+
+class Command(BaseCommand):
+    help = "Generate resized WebP/JPEG variants for existing product and profile images."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--overwrite", action="store_true",
+            help="Regenerate variants that already exist (e.g. after changing sizes).",
+        )
+
+    def handle(self, *args, **options):
+        overwrite = options["overwrite"]
+        written = failed = 0
+
+        def run(fieldfile, variants):
+            nonlocal written, failed
+            try:
+                written += generate_variants(fieldfile, variants, overwrite=overwrite)
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f"{fieldfile.name}: {exc}")
+
+        for image in ProductImage.objects.only("id", "image").iterator():
+            run(image.image, PRODUCT_VARIANTS)
+
+        for profile in Profile.objects.exclude(profile_picture="").only("id", "profile_picture").iterator():
+            run(profile.profile_picture, PROFILE_VARIANTS)
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} variant files ({failed} images failed)."))
@@ -0,0 +1,50 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from products.catalog import BATCH_SIZE, FORMATS, CatalogError, format_for, import_rows, read_rows
+
+
+class Command(BaseCommand):
+    help = "Import products from a CSV or JSONL file (see products/catalog.py for the columns)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to read, or - for stdin.")
+        parser.add_argument("--format", choices=FORMATS, help="Default: from the file extension.")
+        parser.add_argument("--owner", help="Email of the owner for rows without an owner column.")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or format_for(path)
+        if fmt is None:
+            raise CommandError("Can't tell the format from the file name; pass --format.")
+
+        owner = None
+        if options["owner"]:
+            User = get_user_model()
+            try:
+                owner = User.objects.get(email=options["owner"].lower())
+            except User.DoesNotExist:
+                raise CommandError(f"No user {options['owner']!r}.")
+
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+
+        stream = sys.stdin if path == "-" else open(path, encoding="utf-8", newline="")
+        try:
+            report = import_rows(read_rows(stream, fmt), owner=owner, batch_size=options["batch_size"])
+        except CatalogError as exc:
+            raise CommandError(str(exc))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for error in report.as_dict()["errors"]:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        if report.failed > len(report.errors):
+            self.stderr.write(f"... and {report.failed - len(report.errors)} more rejected rows.")
+        self.stdout.write(self.style.SUCCESS(f"Created {report.created} products ({report.failed} rows rejected)."))
+        if report.created:
+            self.stdout.write("Run `python manage.py generate_image_variants` to build variants of imported images.")
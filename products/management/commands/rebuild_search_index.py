@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products.search import fts_available, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the products full-text search index from the products table."
+
+    def handle(self, *args, **options):
+        if not fts_available():
+            self.stdout.write(self.style.WARNING("Full-text index is only used on SQLite; nothing to do."))
+            return
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} products."))
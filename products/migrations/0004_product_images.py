@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+LEGACY_FIELDS = ('image1', 'image2', 'image3', 'image4', 'image5')
+
+
+def copy_images_forward(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    ProductImage = apps.get_model('products', 'ProductImage')
+    rows = []
+    for product in Product.objects.only('id', *LEGACY_FIELDS).iterator():
+        for position, field in enumerate(LEGACY_FIELDS):
+            name = getattr(product, field).name
+            if name:
+                rows.append(ProductImage(product_id=product.id, image=name, position=position))
+    ProductImage.objects.bulk_create(rows, batch_size=500)
+
+
+def copy_images_backward(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    ProductImage = apps.get_model('products', 'ProductImage')
+    for image in ProductImage.objects.filter(position__lt=len(LEGACY_FIELDS)).iterator():
+        Product.objects.filter(pk=image.product_id).update(**{LEGACY_FIELDS[image.position]: image.image.name})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.ImageField(upload_to='product_images/')),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='products.product')),
+            ],
+            options={
+                'ordering': ['position', 'id'],
+                'constraints': [models.UniqueConstraint(fields=('product', 'position'), name='product_image_position_uniq')],
+            },
+        ),
+        migrations.RunPython(copy_images_forward, copy_images_backward),
+        migrations.RemoveField(
+            model_name='product',
+            name='image1',
+        ),
+        migrations.RemoveField(
+            model_name='product',
+            name='image2',
+        ),
+        migrations.RemoveField(
+            model_name='product',
+            name='image3',
+        ),
+        migrations.RemoveField(
+            model_name='product',
+            name='image4',
+        ),
+        migrations.RemoveField(
+            model_name='product',
+            name='image5',
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:21
+
+import products.images
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_product_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='productimage',
+            name='image',
+            field=products.images.HashedImageField(upload_to='product_images/'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:55
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_price_title_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_updated_idx',
+        ),
+    ]
@@ -5,6 +5,42 @@ from django.conf import settings
 from django.db import models
 from django.conf import settings
 
+from .images import HashedImageField
+
+
+class ProductQuerySet(models.QuerySet):
+    # owner columns ProductSerializer.get_owner actually reads
+    OWNER_FIELDS = ('owner__id', 'owner__email', 'owner__username')
+
+    def with_owner(self, slim=True, columns=None):
+        """
+        Join the owner in the same query so serializing N products costs one
+        query, not N + 1. With slim=True only the owner columns the serializer
+        reads are selected (no password hash, flags or dates), along with
+        `columns` of the product itself (default: all of them).
+        """
+        qs = self.select_related('owner')
+        if slim:
+            own = columns or [f.attname for f in self.model._meta.concrete_fields]
+            qs = qs.only(*own, 'owner', *self.OWNER_FIELDS)
+        return qs
+
+    def with_primary_image(self):
+        """
+        Annotate `primary_image` (the storage name of the lowest-position
+        ProductImage) with a correlated subquery, so list pages get their
+        card image in the same query as the products.
+        """
+        first = ProductImage.objects.filter(product=models.OuterRef('pk')).order_by('position', 'id')
+        return self.annotate(primary_image=models.Subquery(first.values('image')[:1]))
+
+    def with_images(self):
+        """Prefetch every image in order: one extra query for the whole page."""
+        return self.prefetch_related(
+            models.Prefetch('images', queryset=ProductImage.objects.order_by('position', 'id'))
+        )
+
+
 class Product(models.Model):
     CATEGORY_CHOICES = [
         ('vehicle', 'Vehicle'),
@@ -19,12 +55,45 @@ class Product(models.Model):
     description = models.TextField()
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES)
     price = models.DecimalField(max_digits=10, decimal_places=2)
-    image1 = models.ImageField(upload_to='product_images/', blank=True, null=True)
-    image2 = models.ImageField(upload_to='product_images/', blank=True, null=True)
-    image3 = models.ImageField(upload_to='product_images/', blank=True, null=True)
-    image4 = models.ImageField(upload_to='product_images/', blank=True, null=True)
-    image5 = models.ImageField(upload_to='product_images/', blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # bumped on every save and whenever one of its images changes (signals);
+    # backs the ETag/Last-Modified validators
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # feed / list in date order (keyset on created_at, id)
+            models.Index(fields=['created_at'], name='product_created_idx'),
+            # ?category= with a price range or ?sort=price
+            models.Index(fields=['category', 'price'], name='product_category_price_idx'),
+            # a price range or ?sort=price without ?category=
+            models.Index(fields=['price'], name='product_price_idx'),
+            # ?sort=title
+            models.Index(fields=['title'], name='product_title_idx'),
+            # ?my=true newest first
+            models.Index(fields=['owner', 'created_at'], name='product_owner_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class ProductImage(models.Model):
+    """
+    One image of a product. `position` orders them (0 is the primary/card
+    image); the legacy API fields image1..image5 address positions 0..4.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="images")
+    image = HashedImageField(upload_to='product_images/')
+    position = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ['position', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'position'], name='product_image_position_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}#{self.position}: {self.image.name}"
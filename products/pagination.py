@@ -0,0 +1,163 @@
+# products/pagination.py
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class ProductCursorPagination(BasePagination):
+    """
+    Keyset (cursor) pagination over a composite ordering, by default
+    (created_at, id) newest first.
+
+    The cursor is an opaque token holding the ordering values of the row at
+    the page edge, so every page is a single indexed range scan:
+        WHERE (created_at, id) < (:created_at, :id) ORDER BY ... LIMIT n
+    Deep pages cost the same as page one, unlike OFFSET pagination.
+
+    Response shape: { "next": url|null, "previous": url|null, "results": [...] }
+    """
+    cursor_query_param = 'cursor'
+    page_size = getattr(settings, 'PRODUCTS_PAGE_SIZE', 20)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'PRODUCTS_MAX_PAGE_SIZE', 100)
+    invalid_cursor_message = 'Invalid cursor'
+
+    # Last field must be unique so positions never tie.
+    ordering = ('-created_at', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() for async views: the page is fetched with the async ORM."""
+        return self.set_page([row async for row in self.page_queryset(queryset, request)])
+
+    def page_queryset(self, queryset, request):
+        """The (unevaluated) queryset for the requested page, plus one lookahead row."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = tuple(self.ordering)
+
+        reverse, position = self.decode_cursor(request)
+        # the request's own position doubles as the fallback when the page comes back empty
+        self._reverse, self._edge_position = reverse, position
+
+        # A "previous" cursor walks the ordering backwards from its position.
+        query_ordering = self.ordering
+        if reverse:
+            query_ordering = tuple(_reverse_field(field) for field in self.ordering)
+
+        queryset = queryset.order_by(*query_ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(query_ordering, position))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, rows):
+        reverse, position = self._reverse, self._edge_position
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size,
+                )
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = self._position(self.page[-1]) if self.page else self._edge_position
+        return self.encode_cursor(False, position)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self._position(self.page[0]) if self.page else self._edge_position
+        return self.encode_cursor(True, position)
+
+    # ── cursor encoding ──────────────────────────────────────────────────────
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            reverse, position = bool(payload['r']), payload['p']
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, position
+
+    def encode_cursor(self, reverse, position):
+        if position is None:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        payload = json.dumps({'r': int(reverse), 'p': position}, separators=(',', ':'))
+        encoded = urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    # ── keyset helpers ───────────────────────────────────────────────────────
+    def _position(self, instance):
+        values = []
+        for field in self.ordering:
+            value = getattr(instance, field.lstrip('-'))
+            values.append(value if isinstance(value, (int, float, str)) else str(value))
+        return values
+
+    @staticmethod
+    def _after(ordering, position):
+        """
+        Rows strictly after `position` in `ordering`, expanded to
+        (a > x) OR (a = x AND b > y) OR ... since SQLite has no row-value
+        comparison that mixes ASC and DESC columns.
+        """
+        condition = Q()
+        prefix = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= prefix & Q(**{f'{name}__{lookup}': value})
+            prefix &= Q(**{name: value})
+        return condition
+
+
+def _reverse_field(field):
+    return field[1:] if field.startswith('-') else '-' + field
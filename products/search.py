@@ -0,0 +1,109 @@
+# products/search.py
+"""
+Full-text product search over an SQLite FTS5 table.
+
+products_product_fts(title, description) holds one row per product with
+rowid = Product.id. It is kept in sync by products/signals.py and can be
+rebuilt from scratch with `python manage.py rebuild_search_index`.
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'products_product_fts'
+
+# bm25() column weights: a hit in the title counts 10x one in the description
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    """
+    Turn free text into a safe FTS5 MATCH string: every word becomes a
+    quoted prefix term ("car"* "red"*), so user input can never inject
+    FTS operators or column filters.
+    """
+    terms = re.findall(r'\w+', query.lower())
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_products(queryset, query):
+    """
+    Restrict `queryset` to products matching `query` and annotate `rank`
+    (BM25, lower is better). Order by ('rank', 'id') to page by relevance.
+    """
+    match = match_expression(query)
+    if not match:
+        return queryset.none()
+
+    if not fts_available():
+        # Other backends: plain substring match; every hit ranks equally.
+        for term in re.findall(r'\w+', query):
+            queryset = queryset.filter(Q(title__icontains=term) | Q(description__icontains=term))
+        return queryset.annotate(rank=RawSQL('0', [], output_field=FloatField()))
+
+    table = connection.ops.quote_name(FTS_TABLE)
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[f'{table}.rowid = products_product.id', f'{table} MATCH %s'],
+        params=[match],
+    ).annotate(
+        rank=RawSQL(
+            f'bm25({table}, %s, %s)', (TITLE_WEIGHT, DESCRIPTION_WEIGHT), output_field=FloatField()
+        )
+    )
+
+
+def index_product(product):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (%s, %s, %s)',
+            [product.pk, product.title, product.description],
+        )
+
+
+def index_products(products, replace=False):
+    """
+    index_product() for a batch (bulk_create / bulk_update send no signals).
+    replace=True first drops the products' existing rows.
+    """
+    if not fts_available() or not products:
+        return
+    with connection.cursor() as cursor:
+        if replace:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(product.pk,) for product in products])
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (%s, %s, %s)',
+            [(product.pk, product.title, product.description) for product in products],
+        )
+
+
+def unindex_product(pk):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+
+
+def rebuild_index():
+    """Repopulate the FTS table from products_product; returns rows indexed."""
+    if not fts_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, description) '
+            f'SELECT id, title, description FROM products_product'
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE}')
+        return cursor.fetchone()[0]
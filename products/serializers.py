@@ -2,20 +2,108 @@
 
 # products/serializers.py
 from rest_framework import serializers
-from .models import Product
+from .models import Product, ProductImage
+from .images import PRODUCT_IMAGE_FIELDS, PRODUCT_VARIANTS, variant_urls
+from chat.presence import PresenceField, PresenceListSerializer
+
+# every key ProductSerializer can render, in output order
+PRODUCT_API_FIELDS = (
+    "id", "title", "description", "category", "price", *PRODUCT_IMAGE_FIELDS,
+    "image_variants", "images", "owner", "owner_presence", "created_at",
+)
+
+# Rendered only when named in ?fields=: they change without the product
+# changing, so responses carrying them skip the feed cache and validators.
+LIVE_FIELDS = frozenset(("owner_presence",))
+
+# keys rendered from ProductImage rows rather than product columns
+IMAGE_KEYS = frozenset((*PRODUCT_IMAGE_FIELDS, "image_variants", "images"))
+
+# named ?fields= presets
+PRODUCT_FIELDSETS = {
+    # what a feed/list card shows
+    "compact": ("id", "title", "category", "price", "image1", "created_at"),
+}
+
+
+class ProductImageSerializer(serializers.ModelSerializer):
+    variants = serializers.SerializerMethodField(read_only=True)
+
+    class Meta:
+        model = ProductImage
+        fields = ["id", "position", "image", "variants"]
+
+    def get_variants(self, obj):
+        return variant_urls(obj.image, PRODUCT_VARIANTS, self.context.get("request"))
+
 
 class ProductSerializer(serializers.ModelSerializer):
+    """
+    Images live in ProductImage rows. The legacy fields image1..image5 still
+    work: uploads go to positions 0..4 and are echoed back as URLs.
+
+    What gets rendered depends on how the product was loaded:
+      - Product.objects.with_images() (detail): image1..image5, `images`
+        with every image, and variants for each.
+      - Product.objects.with_primary_image() (lists): only image1, the
+        primary image, with its variants.
+
+    Pass fields=[...] (see parse_fields) to render a sparse subset; pair it
+    with setup_queryset() so unrequested columns are not selected either.
+    """
     # return basic owner info
     owner = serializers.SerializerMethodField(read_only=True)
+    # seller online / last seen (chat presence); batched per page
+    owner_presence = PresenceField(source="owner_id")
+
+    # legacy upload slots -> ProductImage positions 0..4
+    image1 = serializers.ImageField(required=False, allow_null=True, write_only=True)
+    image2 = serializers.ImageField(required=False, allow_null=True, write_only=True)
+    image3 = serializers.ImageField(required=False, allow_null=True, write_only=True)
+    image4 = serializers.ImageField(required=False, allow_null=True, write_only=True)
+    image5 = serializers.ImageField(required=False, allow_null=True, write_only=True)
 
     class Meta:
         model = Product
         fields = [
             "id", "title", "description", "category",
             "price", "image1", "image2", "image3", "image4", "image5",
-            "owner", "created_at"
+            "owner", "owner_presence", "created_at"
         ]
         read_only_fields = ["owner", "created_at"]
+        list_serializer_class = PresenceListSerializer
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.requested_fields = frozenset(fields) if fields is not None else None
+        # without ?fields=, everything but the opt-in LIVE_FIELDS
+        keep = self.requested_fields if self.requested_fields is not None else set(self.fields) - LIVE_FIELDS
+        for name in list(self.fields):
+            if name not in keep:
+                self.fields.pop(name)
+
+    @classmethod
+    def setup_queryset(cls, queryset, fields=None, ordering=(), images="primary"):
+        """
+        Load exactly what rendering `fields` needs: the owner join only when
+        `owner` is wanted, image rows only when an image key is wanted, and
+        only() the product columns those fields (and the keyset `ordering`)
+        read. images="all" prefetches every image instead of the primary.
+        """
+        wanted = set(fields) if fields is not None else set(PRODUCT_API_FIELDS)
+        columns = {f.attname for f in Product._meta.concrete_fields}
+        needed = {"id"} | (wanted & columns)
+        if "owner_presence" in wanted:
+            needed.add("owner_id")
+        needed |= {field.lstrip("-") for field in ordering} & columns
+
+        if "owner" in wanted:
+            queryset = queryset.with_owner(columns=sorted(needed))
+        else:
+            queryset = queryset.only(*needed)
+        if wanted & IMAGE_KEYS:
+            queryset = queryset.with_images() if images == "all" else queryset.with_primary_image()
+        return queryset
 
     def get_owner(self, obj):
         u = obj.owner
@@ -23,3 +111,119 @@ class ProductSerializer(serializers.ModelSerializer):
             return None
         # adapt depending on your User model fields
         return {"id": u.id, "email": getattr(u, "email", ""), "username": getattr(u, "username", "")}
+
+    # ── output ───────────────────────────────────────────────────────────────
+    def to_representation(self, obj):
+        data = super().to_representation(obj)
+        request = self.context.get("request")
+        wanted = self.requested_fields
+
+        if wanted is not None and not wanted & IMAGE_KEYS:
+            return data
+        if hasattr(obj, "primary_image") and not _images_prefetched(obj):
+            slots = {"image1": _fieldfile(obj.primary_image)} if obj.primary_image else {}
+            legacy = ["image1"]
+            images = None
+        else:
+            images = list(obj.images.all())
+            by_position = {img.position: img.image for img in images}
+            slots = {
+                field: by_position[position]
+                for position, field in enumerate(PRODUCT_IMAGE_FIELDS)
+                if position in by_position
+            }
+            legacy = PRODUCT_IMAGE_FIELDS
+
+        # keep the historical key order: ... price, image1..image5, ..., owner
+        out = {}
+        for key in PRODUCT_API_FIELDS:
+            if key in data:
+                out[key] = data[key]
+            elif key in legacy:
+                out[key] = _url(slots.get(key), request)
+            elif key == "image_variants":
+                out[key] = {
+                    field: variant_urls(fieldfile, PRODUCT_VARIANTS, request)
+                    for field, fieldfile in slots.items()
+                    if field in legacy
+                }
+            elif key == "images" and images is not None:
+                out[key] = ProductImageSerializer(images, many=True, context=self.context).data
+        if wanted is not None:
+            out = {key: value for key, value in out.items() if key in wanted}
+        return out
+
+    # ── input ────────────────────────────────────────────────────────────────
+    def create(self, validated_data):
+        uploads = self._pop_uploads(validated_data)
+        product = super().create(validated_data)
+        self._save_uploads(product, uploads)
+        return product
+
+    def update(self, instance, validated_data):
+        uploads = self._pop_uploads(validated_data)
+        product = super().update(instance, validated_data)
+        self._save_uploads(product, uploads)
+        return product
+
+    @staticmethod
+    def _pop_uploads(validated_data):
+        return {
+            position: validated_data.pop(field)
+            for position, field in enumerate(PRODUCT_IMAGE_FIELDS)
+            if field in validated_data
+        }
+
+    @staticmethod
+    def _save_uploads(product, uploads):
+        for position, upload in uploads.items():
+            if upload:
+                image = ProductImage.objects.filter(product=product, position=position).first()
+                image = image or ProductImage(product=product, position=position)
+                image.image = upload
+                image.save()
+            else:
+                # explicit null clears the slot, as it did with the old column
+                ProductImage.objects.filter(product=product, position=position).delete()
+        if uploads and _images_prefetched(product):
+            del product._prefetched_objects_cache["images"]
+
+
+def parse_fields(value):
+    """
+    Parse ?fields= into a tuple of field names, or None for "everything".
+    Accepts a preset name from PRODUCT_FIELDSETS or a comma-separated list.
+    """
+    if not value:
+        return None
+    if value in PRODUCT_FIELDSETS:
+        return PRODUCT_FIELDSETS[value]
+    fields = tuple(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    unknown = [name for name in fields if name not in PRODUCT_API_FIELDS]
+    if unknown:
+        raise serializers.ValidationError({"fields": f"Unknown field(s): {', '.join(unknown)}."})
+    return fields
+
+
+def wants_live_fields(query_params):
+    """True when ?fields= names a LIVE_FIELDS entry (invalid ?fields= is left to the view)."""
+    try:
+        fields = parse_fields(query_params.get("fields"))
+    except serializers.ValidationError:
+        return False
+    return fields is not None and not LIVE_FIELDS.isdisjoint(fields)
+
+
+def _images_prefetched(obj):
+    return "images" in getattr(obj, "_prefetched_objects_cache", {})
+
+
+def _fieldfile(name):
+    field = ProductImage._meta.get_field("image")
+    return field.attr_class(None, field, name)
+
+
+def _url(fieldfile, request):
+    if not fieldfile:
+        return None
+    return request.build_absolute_uri(fieldfile.url) if request else fieldfile.url
@@ -0,0 +1,44 @@
+# products/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from nova_project.write_queue import after_write
+
+from .cache import invalidate_feed
+from .images import PRODUCT_VARIANTS, generate_variants_safely
+from .models import Product, ProductImage
+from .search import index_product, unindex_product
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def invalidate_feed_cache(sender, instance, **kwargs):
+    invalidate_feed()
+
+
+@receiver(post_save, sender=Product)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not {'title', 'description'} & set(update_fields):
+        return
+    index_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_search_index(sender, instance, **kwargs):
+    unindex_product(instance.pk)
+
+
+@receiver(post_save, sender=ProductImage)
+def generate_image_variants(sender, instance, **kwargs):
+    # resizing is slow: off the writer thread when the save was queued
+    after_write(lambda: generate_variants_safely(instance.image, PRODUCT_VARIANTS))
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def touch_product(sender, instance, **kwargs):
+    # image changes alter the product's representation: move its validator
+    Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
@@ -7,7 +7,7 @@ async function fetchPublicProducts() {
         const response = await fetch(PUBLIC_API_BASE);
         if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
         const data = await response.json();
-        renderProducts(data);
+        renderProducts(data.results);
     } catch (err) {
         console.error("Error fetching public products:", err);
         alert("Failed to fetch public products.");
@@ -286,5 +286,5 @@ async function loadMyProducts() {
         headers: { "Authorization": `Bearer ${token}` }
     });
     const data = await res.json();
-    renderProducts(data); // reuse your existing render function
+    renderProducts(data.results); // reuse your existing render function
 }
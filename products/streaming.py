@@ -0,0 +1,109 @@
+# products/streaming.py
+"""
+Streaming list mode (?stream=true): the whole result as one JSON array,
+written while it is read.
+
+DRF renders a page by building serializer.data and then the full JSON
+string. Here the queryset is walked with .iterator(chunk_size) and each
+chunk is serialized, encoded and sent before the next is fetched, so
+memory is bounded by one chunk and the first byte leaves after the first
+chunk, however many rows follow. The response is a bare array in the
+requested ordering; there are no cursors.
+
+Under ASGI Django would buffer a synchronous iterator into a list before
+sending it, so ASGI requests get an async iterator instead (the async views
+use aiterator(); sync views hand chunks over from their request thread).
+streaming_response() does the same for any other streamed body, such as the
+catalog export.
+"""
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+from .serializers import ProductSerializer
+
+CHUNK_SIZE = getattr(settings, 'PRODUCTS_STREAM_CHUNK_SIZE', 500)
+# bytes handed from the request thread to the event loop at a time
+ASYNC_BLOCK_SIZE = 64 * 1024
+
+
+def wants_stream(request):
+    return request.query_params.get('stream') == 'true'
+
+
+def _encode_chunk(products, fields, request, first):
+    data = ProductSerializer(products, many=True, fields=fields, context={'request': request}).data
+    # the chunk's array without its brackets: its elements, comma-separated
+    body = json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))[1:-1]
+    return (body if first else ',' + body).encode('utf-8')
+
+
+def iter_json_array(queryset, request, fields=None, chunk_size=None):
+    """Yield `queryset` serialized by ProductSerializer as JSON array bytes, chunk by chunk."""
+    chunk_size = chunk_size or CHUNK_SIZE
+    rows = queryset.iterator(chunk_size=chunk_size)
+    yield b'['
+    first = True
+    while chunk := list(islice(rows, chunk_size)):
+        yield _encode_chunk(chunk, fields, request, first)
+        first = False
+    yield b']'
+
+
+async def aiter_json_array(queryset, request, fields=None, chunk_size=None):
+    """iter_json_array() for async views, reading through aiterator()."""
+    chunk_size = chunk_size or CHUNK_SIZE
+    yield b'['
+    first = True
+    chunk = []
+    async for product in queryset.aiterator(chunk_size=chunk_size):
+        chunk.append(product)
+        if len(chunk) == chunk_size:
+            yield _encode_chunk(chunk, fields, request, first)
+            first, chunk = False, []
+    if chunk:
+        yield _encode_chunk(chunk, fields, request, first)
+    yield b']'
+
+
+def _blocks(parts, size=ASYNC_BLOCK_SIZE):
+    """Join str/bytes `parts` into bytes blocks of at least `size` (but the last)."""
+    block, length = [], 0
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        block.append(part)
+        length += len(part)
+        if length >= size:
+            yield b''.join(block)
+            block, length = [], 0
+    if block:
+        yield b''.join(block)
+
+
+async def _to_async(iterator):
+    # thread-sensitive: the chunks are read on the request's own thread and DB connection
+    next_part = sync_to_async(next)
+    while (part := await next_part(iterator, None)) is not None:
+        yield part
+
+
+def streaming_response(request, content, content_type):
+    """A StreamingHttpResponse over `content` (a sync or async iterator of str or bytes)."""
+    if isinstance(getattr(request, '_request', request), ASGIRequest) and not hasattr(content, '__aiter__'):
+        # one thread hop per block rather than per part (the export yields a line per row)
+        content = _to_async(_blocks(content))
+    response = StreamingHttpResponse(content, content_type=content_type)
+    # a proxy must not hold the whole body back before passing it on
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def streaming_json_response(request, content):
+    """A JSON streaming_response() over `content`."""
+    return streaming_response(request, content, 'application/json')
@@ -1,3 +1,1085 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from nova_project import db_routing
+from nova_project.sessions import SessionStore
+from nova_project.test_runner import run_in_other_process
+from nova_project.write_queue import WriteQueue, after_write
+from PIL import Image
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .batch import MAX_OPERATIONS
+from .cache import feed_version, single_flight
+from .images import FORMATS, PRODUCT_VARIANTS, variant_name
+from .models import Product, ProductImage
+from .views import ProductViewSet
+
+User = get_user_model()
+
+
+def make_products(owner, count, **extra):
+    """Create `count` products with distinct, increasing created_at values."""
+    base = timezone.now()
+    products = []
+    for i in range(count):
+        product = Product.objects.create(
+            owner=owner,
+            title=extra.get('title', f'Product {i}'),
+            description='desc',
+            category=extra.get('category', 'other'),
+            price=extra.get('price', 10 + i),
+        )
+        products.append(product)
+    # auto_now_add ignores explicit values, so spread timestamps afterwards
+    for i, product in enumerate(products):
+        Product.objects.filter(pk=product.pk).update(created_at=base + timedelta(seconds=i))
+    return products
+
+
+class ProductPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user(email='seller@example.com', password='pass1234')
+        self.other = User.objects.create_user(email='other@example.com', password='pass1234')
+
+    def walk(self, url):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [item['id'] for item in response.data['results']]
+            url = response.data['next']
+            pages += 1
+        return ids, pages
+
+    def test_feed_walks_every_product_once_newest_first(self):
+        products = make_products(self.owner, 7)
+        ids, pages = self.walk('/products/api/products/feed/?page_size=3')
+        self.assertEqual(ids, [p.id for p in reversed(products)])
+        self.assertEqual(pages, 3)
+
+    def test_ties_on_created_at_are_broken_by_id(self):
+        products = make_products(self.owner, 5)
+        Product.objects.update(created_at=timezone.now())
+        ids, _ = self.walk('/products/api/products/feed/?page_size=2')
+        self.assertEqual(ids, sorted((p.id for p in products), reverse=True))
+
+    def test_previous_link_returns_the_prior_page(self):
+        make_products(self.owner, 5)
+        first = self.client.get('/products/api/products/feed/?page_size=2').data
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual(back['results'], first['results'])
+
+    def test_my_filter_is_paginated(self):
+        make_products(self.owner, 3)
+        make_products(self.other, 2)
+        self.client.force_authenticate(self.owner)
+        ids, _ = self.walk('/products/api/products/?my=true&page_size=2')
+        self.assertEqual(len(ids), 3)
+        self.assertEqual(Product.objects.filter(id__in=ids, owner=self.owner).count(), 3)
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get('/products/api/products/feed/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+
+class ProductQueryCountTests(TestCase):
+    """
+    Every product endpoint must run a constant number of queries, however
+    many rows it serializes (no per-row owner lookups).
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.owner = User.objects.create_user(email='seller@example.com', password='pass1234')
+
+    def count_queries(self, url, rows):
+        # the feed's cache is invalidated once the rows are committed
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.all().delete()
+            owners = [
+                User.objects.create_user(email=f'owner{rows}-{i}@example.com')
+                for i in range(rows)
+            ]
+            for owner in owners:
+                make_products(owner, 1)
+            make_products(self.owner, rows)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def assertConstantQueries(self, url):
+        self.assertEqual(self.count_queries(url, 1), self.count_queries(url, 10))
+
+    def test_feed(self):
+        self.assertConstantQueries('/products/api/products/feed/?page_size=50')
+
+    def test_list(self):
+        self.assertConstantQueries('/products/api/products/?page_size=50')
+
+    def test_my_list(self):
+        self.client.force_authenticate(self.owner)
+        self.assertConstantQueries('/products/api/products/?my=true&page_size=50')
+
+    def test_viewset_list(self):
+        view = ProductViewSet.as_view({'get': 'list'})
+        factory = APIRequestFactory()
+        counts = []
+        for rows in (1, 10):
+            make_products(self.owner, rows)
+            request = factory.get('/?page_size=50')
+            force_authenticate(request, self.owner)
+            with CaptureQueriesContext(connection) as ctx:
+                view(request).render()
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_detail_is_validator_product_and_one_image_prefetch(self):
+        product = make_products(self.owner, 1)[0]
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/products/api/products/{product.id}/')
+        self.assertEqual(response.data['owner']['email'], self.owner.email)
+
+    def test_slim_owner_projection_skips_password(self):
+        make_products(self.owner, 1)
+        owner = Product.objects.with_owner().get().owner
+        self.assertIn('password', owner.get_deferred_fields())
+
+
+class ProductFeedCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user(email='seller@example.com', password='pass1234')
+
+    def test_repeat_feed_hits_are_served_without_queries(self):
+        make_products(self.owner, 3)
+        first = self.client.get('/products/api/products/feed/')
+        with self.assertNumQueries(0):
+            second = self.client.get('/products/api/products/feed/')
+        self.assertEqual(first.data, second.data)
+
+    def test_save_and_delete_invalidate_the_feed(self):
+        product = make_products(self.owner, 1)[0]
+        self.client.get('/products/api/products/feed/')
+
+        product.title = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        response = self.client.get('/products/api/products/feed/')
+        self.assertEqual(response.data['results'][0]['title'], 'Renamed')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        response = self.client.get('/products/api/products/feed/')
+        self.assertEqual(response.data['results'], [])
+
+    def test_write_in_another_worker_invalidates_this_one(self):
+        make_products(self.owner, 1)
+        first = self.client.get('/products/api/products/feed/')
+        # another worker process saves a product (the row changes without signals here)
+        Product.objects.update(title='Renamed')
+        run_in_other_process('from products.cache import bump_feed_version; bump_feed_version()')
+        response = self.client.get('/products/api/products/feed/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['title'], 'Renamed')
+
+    def test_query_string_gets_its_own_entry(self):
+        make_products(self.owner, 3)
+        self.client.get('/products/api/products/feed/?page_size=1')
+        response = self.client.get('/products/api/products/feed/?page_size=2')
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_concurrent_misses_build_once(self):
+        calls = []
+
+        def build():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'results': []}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(single_flight('sf-test', build, 60)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'results': []}] * 8)
+
+
+class ProductFilterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user(email='seller@example.com', password='pass1234')
+        self.car = Product.objects.create(owner=self.owner, title='Car', description='d', category='vehicle', price=5000)
+        self.bike = Product.objects.create(owner=self.owner, title='Bike', description='d', category='vehicle', price=300)
+        self.sofa = Product.objects.create(owner=self.owner, title='Sofa', description='d', category='furniture', price=700)
+
+    def ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_category_and_price_range(self):
+        self.assertEqual(
+            self.ids('/products/api/products/?category=vehicle&max_price=1000'), [self.bike.id]
+        )
+        self.assertEqual(
+            set(self.ids('/products/api/products/feed/?min_price=500')), {self.car.id, self.sofa.id}
+        )
+
+    def test_sort_keys(self):
+        self.assertEqual(self.ids('/products/api/products/feed/?sort=price'), [self.bike.id, self.sofa.id, self.car.id])
+        self.assertEqual(self.ids('/products/api/products/feed/?sort=-price'), [self.car.id, self.sofa.id, self.bike.id])
+        self.assertEqual(self.ids('/products/api/products/feed/?sort=title'), [self.bike.id, self.car.id, self.sofa.id])
+
+    def test_sorted_pages_follow_cursor(self):
+        ids, url = [], '/products/api/products/?sort=price&page_size=1'
+        while url:
+            data = self.client.get(url).data
+            ids += [item['id'] for item in data['results']]
+            url = data['next']
+        self.assertEqual(ids, [self.bike.id, self.sofa.id, self.car.id])
+
+    def test_bad_parameters_are_400(self):
+        for query in ('category=boats', 'min_price=cheap', 'max_price=-1', 'sort=rating'):
+            response = self.client.get(f'/products/api/products/feed/?{query}')
+            self.assertEqual(response.status_code, 400, query)
+
+    def test_category_price_filter_uses_index(self):
+        qs = Product.objects.filter(category='vehicle', price__lte=1000).order_by('price', 'id')
+        self.assertIn('product_category_price_idx', qs.explain())
+
+    def test_sorts_without_category_use_an_index(self):
+        for ordering, index in ((('price', 'id'), 'product_price_idx'), (('-price', '-id'), 'product_price_idx'),
+                                (('title', 'id'), 'product_title_idx')):
+            plan = Product.objects.order_by(*ordering)[:20].explain()
+            self.assertIn(index, plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.owner = User.objects.create_user(email='seller@example.com', password='pass1234')
+
+    def create(self, title, description='', category='other', price=10):
+        return Product.objects.create(
+            owner=self.owner, title=title, description=description, category=category, price=price
+        )
+
+    def ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['results']]
+
+    def test_title_hits_rank_above_description_hits(self):
+        mention = self.create('Roof rack', 'fits any car')
+        car = self.create('Red car', 'low mileage')
+        self.create('Sofa', 'three seats')
+        self.assertEqual(self.ids('/products/api/products/search/?q=car'), [car.id, mention.id])
+
+    def test_prefix_and_multi_word_queries(self):
+        car = self.create('Electric cars', 'long range')
+        self.create('Electric kettle')
+        self.assertEqual(self.ids('/products/api/products/search/?q=electric car'), [car.id])
+
+    def test_index_follows_update_and_delete(self):
+        product = self.create('Guitar')
+        product.title = 'Violin'
+        product.save()
+        self.assertEqual(self.ids('/products/api/products/search/?q=guitar'), [])
+        self.assertEqual(self.ids('/products/api/products/search/?q=violin'), [product.id])
+        product.delete()
+        self.assertEqual(self.ids('/products/api/products/search/?q=violin'), [])
+
+    def test_combines_with_filters_and_paginates(self):
+        cheap = [self.create(f'Lamp {i}', category='furniture', price=5) for i in range(3)]
+        self.create('Lamp deluxe', category='furniture', price=500)
+        ids, url = [], '/products/api/products/search/?q=lamp&max_price=100&page_size=2'
+        while url:
+            data = self.client.get(url).data
+            ids += [item['id'] for item in data['results']]
+            url = data['next']
+        self.assertEqual(sorted(ids), [p.id for p in cheap])
+
+    def test_fts_syntax_in_query_is_treated_as_text(self):
+        self.create('Table "oak" NEAR chair')
+        response = self.client.get('/products/api/products/search/?q=oak" OR title:*')
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_query_is_400(self):
+        self.assertEqual(self.client.get('/products/api/products/search/').status_code, 400)
+
+    def test_rebuild_command_restores_index(self):
+        product = self.create('Bicycle')
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM products_product_fts')
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.ids('/products/api/products/search/?q=bicycle'), [product.id])
+
+
+def jpeg_upload(name='photo.jpg', size=(3000, 2000), orientation=1):
+    """A JPEG carrying EXIF (camera make, orientation, GPS position), like a phone upload."""
+    exif = Image.Exif()
+    exif[0x010F] = 'PhoneCam'  # Make
+    exif[0x0112] = orientation
+    exif.get_ifd(0x8825)[2] = (52.0, 31.0, 12.0)  # GPSLatitude
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, 'JPEG', exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class ProductImageVariantTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.owner = User.objects.create_user(email='seller@example.com', password='pass1234')
+
+    def product_with_image(self):
+        product = Product.objects.create(owner=self.owner, title='Car', description='d', category='vehicle', price=1)
+        ProductImage.objects.create(product=product, image=jpeg_upload(), position=0)
+        return product
+
+    def test_variants_are_resized_and_exif_free(self):
+        product = self.product_with_image()
+        for variant, edge in PRODUCT_VARIANTS.items():
+            for ext in FORMATS:
+                path = os.path.join(self.media, variant_name(product.images.get().image.name, variant, ext))
+                with Image.open(path) as image:
+                    self.assertLessEqual(max(image.size), edge)
+                    self.assertEqual(len(image.getexif()), 0)
+
+    def test_stored_original_is_metadata_free_and_upright(self):
+        product = Product.objects.create(owner=self.owner, title='Car', description='d', category='vehicle', price=1)
+        image = ProductImage.objects.create(product=product, image=jpeg_upload(size=(300, 200), orientation=6))
+        with Image.open(os.path.join(self.media, image.image.name)) as original:
+            self.assertEqual(len(original.getexif()), 0)
+            self.assertEqual(original.size, (200, 300))
+        with open(os.path.join(self.media, image.image.name), 'rb') as fh:
+            self.assertNotIn(b'PhoneCam', fh.read())
+
+    def test_serializer_exposes_variant_urls(self):
+        product = self.product_with_image()
+        response = APIClient().get(f'/products/api/products/{product.id}/')
+        variants = response.data['image_variants']
+        self.assertEqual(list(variants), ['image1'])
+        self.assertEqual(variants['image1']['card']['width'], 400)
+        self.assertTrue(variants['image1']['card']['webp'].endswith('/card.webp'))
+
+    def test_backfill_command_writes_missing_variants(self):
+        product = self.product_with_image()
+        card = os.path.join(self.media, variant_name(product.images.get().image.name, 'card', 'webp'))
+        os.remove(card)
+        call_command('generate_image_variants', stdout=StringIO())
+        self.assertTrue(os.path.exists(card))
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        owner = User.objects.create_user(email='seller@example.com')
+        product = Product.objects.create(owner=owner, title='Shoe', description='d', category='other', price=1)
+        self.image = ProductImage.objects.create(product=product, image=jpeg_upload('shoe.jpg', (60, 40))).image
+        with open(self.image.path, 'rb') as fh:
+            self.body = fh.read()
+
+    def get(self, url=None, **headers):
+        return self.client.get(url or self.image.url, headers=headers)
+
+    def test_uploads_are_stored_under_their_content_hash(self):
+        digest = hashlib.md5(self.body).hexdigest()[:12]
+        self.assertEqual(self.image.name, f'product_images/shoe.{digest}.jpg')
+
+    def test_hashed_names_are_cached_as_immutable(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.getvalue(), self.body)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+
+        # variants are rewritten in place when the sizes change
+        response = self.get(self.image.storage.url(variant_name(self.image.name, 'card', 'webp')))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=3600', response['Cache-Control'])
+
+    def test_conditional_get(self):
+        response = self.get(**{'If-None-Match': self.get()['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_range_requests(self):
+        size = len(self.body)
+        response = self.get(Range='bytes=0-9')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.getvalue(), self.body[:10])
+        self.assertEqual(response['Content-Range'], f'bytes 0-9/{size}')
+        self.assertEqual(response['Content-Length'], '10')
+
+        self.assertEqual(self.get(Range='bytes=-5').getvalue(), self.body[-5:])
+        self.assertEqual(self.get(Range=f'bytes={size - 3}-{size + 100}').getvalue(), self.body[-3:])
+
+        response = self.get(Range=f'bytes={size}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{size}')
+
+        # a stale If-Range, or several ranges: the whole file
+        self.assertEqual(self.get(Range='bytes=0-9', **{'If-Range': '"stale"'}).status_code, 200)
+        self.assertEqual(self.get(Range='bytes=0-1,5-6').status_code, 200)
+
+    async def test_served_asynchronously_under_asgi(self):
+        size = len(self.body)
+        response = await AsyncClient().get(self.image.url, headers={'Range': 'bytes=5-14'})
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response.is_async)
+        self.assertEqual(b''.join([part async for part in response.streaming_content]), self.body[5:15])
+        self.assertEqual(response['Content-Range'], f'bytes 5-14/{size}')
+
+        response = await AsyncClient().get(self.image.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        self.assertEqual(response['Content-Length'], str(size))
+        self.assertEqual(b''.join([part async for part in response.streaming_content]), self.body)
+
+    def test_transfer_is_handed_to_the_front_proxy(self):
+        with override_settings(MEDIA_SERVING={'ACCEL': 'x-accel'}):
+            response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.image.name}')
+        self.assertEqual(response.content, b'')
+        self.assertIn('immutable', response['Cache-Control'])
+
+        with override_settings(MEDIA_SERVING={'ACCEL': 'x-sendfile'}):
+            response = self.get()
+        self.assertEqual(response['X-Sendfile'], self.image.path)
+
+    def test_only_files_inside_media_root(self):
+        self.assertEqual(self.get('/media/%2e%2e/manage.py').status_code, 404)
+        self.assertEqual(self.get('/media/product_images/').status_code, 404)
+        self.assertEqual(self.get('/media/product_images/missing.jpg').status_code, 404)
+
+
+class ProductImageTableTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client = APIClient()
+        self.owner = User.objects.create_user(email='seller@example.com', password='pass1234')
+        self.client.force_authenticate(self.owner)
+
+    def create_via_api(self, **images):
+        data = {'title': 'Car', 'description': 'd', 'category': 'vehicle', 'price': '10', **images}
+        response = self.client.post('/products/api/products/', data, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def test_legacy_fields_create_ordered_rows(self):
+        data = self.create_via_api(image1=jpeg_upload('a.jpg', (50, 50)), image3=jpeg_upload('c.jpg', (50, 50)))
+        self.assertEqual(
+            list(ProductImage.objects.filter(product_id=data['id']).values_list('position', flat=True)), [0, 2]
+        )
+        self.assertTrue(data['image1'].endswith('.jpg'))
+        self.assertIsNone(data['image2'])
+        self.assertEqual([img['position'] for img in data['images']], [0, 2])
+
+    def test_list_returns_only_primary_image(self):
+        self.create_via_api(image1=jpeg_upload('a.jpg', (50, 50)), image2=jpeg_upload('b.jpg', (50, 50)))
+        item = self.client.get('/products/api/products/feed/').data['results'][0]
+        self.assertTrue(item['image1'].endswith('.jpg'))
+        self.assertNotIn('image2', item)
+        self.assertNotIn('images', item)
+        self.assertEqual(list(item['image_variants']), ['image1'])
+
+    def test_patch_replaces_and_clears_slots(self):
+        data = self.create_via_api(image1=jpeg_upload('a.jpg', (50, 50)), image2=jpeg_upload('b.jpg', (50, 50)))
+        url = f"/products/api/products/{data['id']}/"
+        response = self.client.patch(url, {'image2': jpeg_upload('new.jpg', (50, 50))}, format='multipart')
+        self.assertIn('new', response.data['data']['image2'])
+        response = self.client.patch(url, {'image1': ''}, format='multipart')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(list(ProductImage.objects.values_list('position', flat=True)), [1])
+
+    def test_image_queries_do_not_grow_with_rows(self):
+        def list_queries(rows):
+            for _ in range(rows):
+                product = make_products(self.owner, 1)[0]
+                ProductImage.objects.bulk_create(
+                    ProductImage(product=product, image=f'product_images/x{position}.jpg', position=position)
+                    for position in range(3)
+                )
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get('/products/api/products/?page_size=50')
+            return len(ctx.captured_queries)
+
+        self.assertEqual(list_queries(1), list_queries(10))
+
+    def test_detail_loads_all_images_with_one_prefetch(self):
+        product = make_products(self.owner, 1)[0]
+        ProductImage.objects.bulk_create(
+            ProductImage(product=product, image=f'product_images/x{position}.jpg', position=position)
+            for position in range(5)
+        )
+        with self.assertNumQueries(3):  # ETag validator, product + owner, images
+            data = self.client.get(f'/products/api/products/{product.id}/').data
+        self.assertEqual(len(data['images']), 5)
+        self.assertTrue(data['image5'].endswith('x4.jpg'))
+
+
+class ProductSparseFieldsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user(email='seller@example.com', password='pass1234')
+        self.product = make_products(self.owner, 1)[0]
+        ProductImage.objects.bulk_create([ProductImage(product=self.product, image='product_images/a.jpg')])
+
+    def test_fields_list_limits_payload_and_select(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/products/api/products/?fields=id,title,price')
+        self.assertEqual(list(response.data['results'][0]), ['id', 'title', 'price'])
+        self.assertEqual(len(ctx.captured_queries), 1)
+        sql = ctx.captured_queries[0]['sql']
+        self.assertNotIn('description', sql)
+        self.assertNotIn('users_user', sql)
+        self.assertNotIn('productimage', sql)
+
+    def test_compact_preset(self):
+        item = self.client.get('/products/api/products/feed/?fields=compact').data['results'][0]
+        self.assertEqual(list(item), ['id', 'title', 'category', 'price', 'image1', 'created_at'])
+        self.assertTrue(item['image1'].endswith('a.jpg'))
+
+    def test_sorted_sparse_page_keeps_cursor_columns_loaded(self):
+        make_products(self.owner, 3)
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get('/products/api/products/?fields=id&sort=price&page_size=2').data
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIsNotNone(data['next'])
+
+    def test_detail_accepts_fields(self):
+        data = self.client.get(f'/products/api/products/{self.product.id}/?fields=title,images').data
+        self.assertEqual(list(data), ['title', 'images'])
+        self.assertEqual(len(data['images']), 1)
+
+    def test_unknown_field_is_400(self):
+        response = self.client.get('/products/api/products/?fields=id,password')
+        self.assertEqual(response.status_code, 400)
+
+
+class ProductConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user(email='seller@example.com', password='pass1234')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product = make_products(self.owner, 2)[0]
+
+    def test_detail_revalidates_with_etag_without_serializing(self):
+        url = f'/products/api/products/{self.product.id}/'
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', first)
+
+        with self.assertNumQueries(1):
+            again = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+        self.product.title = 'Changed'
+        self.product.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+    def test_image_change_moves_the_detail_etag(self):
+        url = f'/products/api/products/{self.product.id}/'
+        etag = self.client.get(url)['ETag']
+        ProductImage.objects.create(product=self.product, image='product_images/x.jpg')
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+
+    def test_feed_304_and_invalidation_on_delete(self):
+        url = '/products/api/products/feed/'
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.latest('id').delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_feed_if_modified_since(self):
+        url = '/products/api/products/feed/'
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_feed_etag_varies_with_query(self):
+        plain = self.client.get('/products/api/products/feed/')['ETag']
+        compact = self.client.get('/products/api/products/feed/?fields=compact')['ETag']
+        self.assertNotEqual(plain, compact)
+
+    def test_bad_feed_params_still_400(self):
+        for query in ('sort=nope', 'fields=bogus'):
+            response = self.client.get(f'/products/api/products/feed/?{query}')
+            self.assertEqual(response.status_code, 400)
+            self.assertNotIn('ETag', response)
+            self.assertNotIn('Last-Modified', response)
+
+
+class ProductAsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(email='seller@example.com', password='pass1234')
+        self.products = make_products(self.owner, 5)
+        self.client = APIClient()
+        self.async_client = AsyncClient()
+
+    async def test_list_matches_sync_view_across_pages(self):
+        sync_page = await sync_to_async(self.client.get)('/products/api/products/?page_size=2&sort=price')
+        response = await self.async_client.get('/products/api/async/products/?page_size=2&sort=price')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['results'], json.loads(json.dumps(sync_page.data['results'])))
+
+        ids = [item['id'] for item in data['results']]
+        while data['next']:
+            data = (await self.async_client.get(data['next'])).json()
+            ids += [item['id'] for item in data['results']]
+        self.assertEqual(ids, [p.id for p in self.products])
+
+    async def test_my_listings_require_authentication(self):
+        response = await self.async_client.get('/products/api/async/products/?my=true')
+        self.assertEqual(response.status_code, 401)
+
+        token = RefreshToken.for_user(self.owner).access_token
+        response = await self.async_client.get('/products/api/async/products/?my=true',
+                                               headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(len(response.json()['results']), 5)
+
+    async def test_detail_and_conditional_get(self):
+        url = f'/products/api/async/products/{self.products[0].id}/'
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['title'], 'Product 0')
+
+        again = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual((await self.async_client.get('/products/api/async/products/999999/')).status_code, 404)
+
+    async def test_feed_is_cached_and_validates(self):
+        url = '/products/api/async/products/feed/?fields=compact'
+        first = await self.async_client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(set(first.json()['results'][0]), {'id', 'title', 'category', 'price', 'image1', 'created_at'})
+        self.assertEqual((await self.async_client.get(url, headers={'If-None-Match': first['ETag']})).status_code, 304)
+        self.assertEqual((await self.async_client.get(url + '&sort=nope')).status_code, 400)
+
+        # a write handled by another worker process moves this worker's validator too
+        await sync_to_async(run_in_other_process)('from products.cache import bump_feed_version; bump_feed_version()')
+        self.assertEqual((await self.async_client.get(url, headers={'If-None-Match': first['ETag']})).status_code, 200)
+
+    async def test_writes_are_not_allowed(self):
+        self.assertEqual((await self.async_client.post('/products/api/async/products/')).status_code, 405)
+
+
+class ProductCatalogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+        os.makedirs(os.path.join(self.media, 'product_images'))
+        for name in ('a.jpg', 'b.jpg'):
+            with open(os.path.join(self.media, 'product_images', name), 'wb') as fh:
+                fh.write(b'x')
+        self.seller = User.objects.create_user(email='seller@example.com')
+        self.staff = User.objects.create_user(email='staff@example.com', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def upload(self, name, text, **data):
+        return self.client.post('/products/api/catalog/import/', {
+            'file': SimpleUploadedFile(name, text.encode('utf-8')), **data,
+        }, format='multipart')
+
+    def test_csv_import_reports_bad_rows_and_creates_the_rest(self):
+        csv_text = (
+            'owner,title,description,category,price,images\n'
+            'seller@example.com,Red car,fast,vehicle,10.50,product_images/a.jpg;product_images/b.jpg\n'
+            'seller@example.com,,x,vehicle,1,\n'
+            'nobody@example.com,Sofa,x,furniture,5,\n'
+            'seller@example.com,Lamp,x,other,abc,\n'
+            'seller@example.com,Desk,x,furniture,7,../secret.txt\n'
+            ',Chair,x,furniture,3,\n'
+        )
+        response = self.upload('products.csv', csv_text, owner='staff@example.com')
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 4))
+        self.assertEqual([e['line'] for e in response.data['errors']], [3, 4, 5, 6])
+        self.assertIn('owner', response.data['errors'][1]['errors'])
+
+        car = Product.objects.get(title='Red car')
+        self.assertEqual(car.owner, self.seller)
+        self.assertEqual(list(car.images.values_list('image', flat=True)),
+                         ['product_images/a.jpg', 'product_images/b.jpg'])
+        self.assertEqual(Product.objects.get(title='Chair').owner, self.staff)
+        # bulk_create skips signals: the import indexes and invalidates itself
+        search = self.client.get('/products/api/products/search/?q=red')
+        self.assertEqual([p['title'] for p in search.data['results']], ['Red car'])
+        self.assertEqual(len(self.client.get('/products/api/products/feed/').data['results']), 2)
+
+    def test_jsonl_import_batches(self):
+        lines = [json.dumps({'owner': self.seller.id, 'title': f'P{n}', 'category': 'other', 'price': n})
+                 for n in range(5)]
+        lines.insert(2, '{broken')
+        stdout = StringIO()
+        path = os.path.join(self.media, 'products.jsonl')
+        with open(path, 'w') as fh:
+            fh.write('\n'.join(lines) + '\n')
+        with CaptureQueriesContext(connection) as queries:
+            call_command('import_products', path, '--batch-size', '2', stdout=stdout, stderr=StringIO())
+        self.assertIn('Created 5 products (1 rows rejected)', stdout.getvalue())
+        self.assertEqual(Product.objects.filter(owner=self.seller).count(), 5)
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "products_product"')]
+        self.assertEqual(len(inserts), 3)
+
+    def test_export_streams_what_import_reads(self):
+        product = Product.objects.create(owner=self.seller, title='Bike', description='d', category='other', price=3)
+        ProductImage.objects.bulk_create([ProductImage(product=product, image='product_images/a.jpg')])
+        Product.objects.create(owner=self.seller, title='Tent, "big"', description='', category='other', price=4)
+
+        response = self.client.get('/products/api/catalog/export.jsonl')
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([(r['title'], r['owner'], r['images']) for r in rows], [
+            ('Bike', 'seller@example.com', ['product_images/a.jpg']),
+            ('Tent, "big"', 'seller@example.com', []),
+        ])
+
+        csv_text = b''.join(self.client.get('/products/api/catalog/export.csv').streaming_content).decode()
+        response = self.upload('again.csv', csv_text)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 0))
+        self.assertEqual(Product.objects.filter(title='Tent, "big"').count(), 2)
+
+    async def test_export_streams_asynchronously_under_asgi(self):
+        for n in range(3):
+            await Product.objects.acreate(owner=self.seller, title=f'P{n}', description='', category='other', price=n)
+        token = await sync_to_async(lambda: str(RefreshToken.for_user(self.staff).access_token))()
+        response = await AsyncClient().get(
+            '/products/api/catalog/export.jsonl', headers={'Authorization': f'Bearer {token}'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="products.jsonl"')
+        body = b''.join([part async for part in response.streaming_content])
+        self.assertEqual([json.loads(line)['title'] for line in body.decode().splitlines()], ['P0', 'P1', 'P2'])
+
+    def test_staff_only(self):
+        self.client.force_authenticate(self.seller)
+        self.assertEqual(self.client.get('/products/api/catalog/export.csv').status_code, 403)
+        self.assertEqual(self.upload('p.csv', 'title\n').status_code, 403)
+        self.client.force_authenticate(self.staff)
+        self.assertEqual(self.client.get('/products/api/catalog/export.xml').status_code, 404)
+        self.assertEqual(self.upload('p.txt', 'title\n').status_code, 400)
+
+
+class ProductBatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.seller = User.objects.create_user(email='seller@example.com')
+        self.other = User.objects.create_user(email='other@example.com')
+        self.mine = make_products(self.seller, 3)
+        self.theirs = make_products(self.other, 1)[0]
+        self.client = APIClient()
+        self.client.force_authenticate(self.seller)
+
+    def batch(self, *operations):
+        return self.client.post('/products/api/products/batch/', {'operations': list(operations)}, format='json')
+
+    def test_mixed_batch_applies_in_one_go(self):
+        first, second, third = self.mine
+        before, first_updated_at = feed_version(), first.updated_at
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = self.batch(
+                {'op': 'create', 'title': 'Lamp', 'description': 'bright', 'category': 'other', 'price': '12.00'},
+                {'op': 'update', 'id': first.id, 'price': '9.99', 'title': 'Cheap red bike'},
+                {'op': 'update', 'id': second.id, 'price': '1.00'},
+                {'op': 'delete', 'id': third.id},
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual([r['status'] for r in response.data['results']], [201, 200, 200, 204])
+        lamp = Product.objects.get(pk=response.data['results'][0]['id'])
+        self.assertEqual(lamp.owner, self.seller)
+        first.refresh_from_db()
+        self.assertEqual((str(first.price), first.title), ('9.99', 'Cheap red bike'))
+        self.assertGreater(first.updated_at, first_updated_at)
+        self.assertFalse(Product.objects.filter(pk=third.id).exists())
+        # one invalidation for the whole batch
+        self.assertEqual(feed_version(), before + 1)
+        self.assertEqual(sum('UPDATE "products_product"' in q['sql'] for q in queries.captured_queries), 1)
+
+        search = self.client.get('/products/api/products/search/?q=cheap')
+        self.assertEqual([p['id'] for p in search.data['results']], [first.id])
+        self.assertEqual(self.client.get('/products/api/products/search/?q=lamp').data['results'][0]['id'], lamp.id)
+
+    def test_any_bad_operation_rejects_the_batch(self):
+        response = self.batch(
+            {'op': 'update', 'id': self.mine[0].id, 'price': '5'},
+            {'op': 'update', 'id': self.theirs.id, 'price': '1'},
+            {'op': 'delete', 'id': 999999},
+            {'op': 'update', 'id': self.mine[1].id, 'price': 'free'},
+            {'op': 'create', 'title': 'No category', 'description': 'x', 'price': '1'},
+            {'op': 'delete', 'id': self.mine[0].id},
+            {'op': 'rename'},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([r['status'] for r in response.data['results']], [424, 403, 404, 400, 400, 400, 400])
+        self.assertIn('price', response.data['results'][3]['errors'])
+        self.assertEqual(Product.objects.get(pk=self.mine[0].id).price, self.mine[0].price)
+
+    def test_operation_limit(self):
+        response = self.batch(*[{'op': 'delete', 'id': self.mine[0].id}] * (MAX_OPERATIONS + 1))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('operations', response.data)
+
+
+class ProductStreamingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(email='seller@example.com')
+        self.products = make_products(self.owner, 7, category='vehicle')
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def test_streams_every_match_in_order_chunk_by_chunk(self):
+        with mock.patch('products.streaming.CHUNK_SIZE', 3), \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/products/api/products/?stream=true&fields=id,title,owner')
+            self.assertTrue(response.streaming)
+            parts = list(response.streaming_content)
+        # '[', three chunks of at most 3, ']'
+        self.assertEqual(len(parts), 5)
+        data = json.loads(b''.join(parts))
+        self.assertEqual([p['id'] for p in data], [p.id for p in reversed(self.products)])
+        self.assertEqual(data[0]['owner']['email'], 'seller@example.com')
+        self.assertNotIn('description', data[0])
+        # one query per chunk (SQLite has no server-side cursors), owner joined in
+        self.assertLessEqual(len(queries), 3)
+
+    def test_empty_and_filtered(self):
+        response = self.client.get('/products/api/products/?stream=true&category=furniture')
+        self.assertEqual(b''.join(response.streaming_content), b'[]')
+        self.assertEqual(self.client.get('/products/api/products/?stream=true&min_price=x').status_code, 400)
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/products/api/products/?stream=true').status_code, 401)
+
+    async def test_async_view_streams_asynchronously(self):
+        token = await sync_to_async(lambda: str(RefreshToken.for_user(self.owner).access_token))()
+        response = await AsyncClient().get(
+            '/products/api/async/products/?stream=true&fields=id', headers={'Authorization': f'Bearer {token}'},
+        )
+        self.assertEqual(response.status_code, 200, getattr(response, "content", b""))
+        self.assertTrue(response.is_async)
+        body = b''.join([part async for part in response.streaming_content])
+        self.assertEqual(len(json.loads(body)), 7)
+
+        # the sync DRF view under ASGI hands its chunks over instead of being buffered
+        response = await AsyncClient().get(
+            '/products/api/products/?stream=true&fields=id', headers={'Authorization': f'Bearer {token}'},
+        )
+        self.assertTrue(response.is_async)
+        body = b''.join([part async for part in response.streaming_content])
+        self.assertEqual(len(json.loads(body)), 7)
+
+
+@override_settings(DATABASE_ROUTING={'PRIMARY': 'default', 'REPLICAS': ['replica'], 'STICKY_SECONDS': 5})
+class DatabaseRoutingTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        caches['shared'].clear()
+        self.owner = User.objects.create_user(email='seller@example.com')
+        make_products(self.owner, 2)
+        self.client = APIClient()
+
+    def feed_queries(self, **kwargs):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            self.assertEqual(self.client.get('/products/api/products/?page_size=1', **kwargs).status_code, 200)
+        return len(primary), len(replica)
+
+    def test_reads_go_to_the_replica(self):
+        primary, replica = self.feed_queries()
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_writer_reads_from_primary_for_the_sticky_window(self):
+        self.client.force_authenticate(self.owner)
+        response = self.client.post('/products/api/products/', {
+            'title': 'Car', 'description': 'd', 'category': 'vehicle', 'price': '10',
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(db_routing.COOKIE_NAME, response.cookies)
+
+        self.assertEqual(self.feed_queries()[1], 0)
+        # a client without the cookie (JWT) is pinned through its user, on any
+        # worker (another worker's local cache knows nothing of the write)
+        self.client.cookies.clear()
+        cache.clear()
+        self.assertEqual(self.feed_queries()[1], 0)
+        # anyone else still reads from the replica
+        self.client.force_authenticate(None)
+        self.assertEqual(self.feed_queries()[0], 0)
+
+        # once the window has passed, the writer is back on the replica
+        self.client.cookies[db_routing.COOKIE_NAME] = response.cookies[db_routing.COOKIE_NAME].value
+        self.assertEqual(self.feed_queries()[1], 0)
+        caches['shared'].delete(db_routing.pin_key(self.owner.pk))
+        with mock.patch('nova_project.db_routing.time.time', return_value=time.time() + 60):
+            self.assertEqual(self.feed_queries()[0], 0)
+
+    def test_without_replicas_everything_uses_the_primary(self):
+        with override_settings(DATABASE_ROUTING={'REPLICAS': []}):
+            self.assertEqual(self.feed_queries()[1], 0)
+
+
+class WriteQueueTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(email='seller@example.com')
+        self.queue = WriteQueue(batch_size=10)
+        self.addCleanup(self.queue.stop)
+
+    def create(self, title, fail=False):
+        def write():
+            product = Product.objects.create(owner=self.owner, title=title, description='', price=1)
+            if fail:
+                raise ValueError(title)
+            return product
+        return lambda: self.queue.submit(write)
+
+    def submit_together(self, *calls):
+        """Run `calls` in their own threads while the writer is busy, so they queue up into one batch."""
+        started, release = threading.Event(), threading.Event()
+        holder = threading.Thread(target=self.queue.submit, args=(lambda: (started.set(), release.wait(5)),))
+        holder.start()
+        self.assertTrue(started.wait(5))
+
+        outcomes = [None] * len(calls)
+
+        def run(i, call):
+            try:
+                outcomes[i] = call()
+            except Exception as exc:
+                outcomes[i] = exc
+
+        threads = [threading.Thread(target=run, args=(i, call)) for i, call in enumerate(calls)]
+        for thread in threads:
+            thread.start()
+        while self.queue.depth() < len(calls) + 1:
+            time.sleep(0.01)
+        release.set()
+        for thread in [holder, *threads]:
+            thread.join(5)
+        return outcomes
+
+    def test_queued_writes_commit_as_one_batch(self):
+        outcomes = self.submit_together(*(self.create(f'P{i}') for i in range(5)))
+        self.assertEqual(sorted(product.title for product in outcomes), ['P0', 'P1', 'P2', 'P3', 'P4'])
+        self.assertEqual(Product.objects.count(), 5)
+        stats = self.queue.stats()
+        self.assertEqual((stats['written'], stats['batches']), (6, 2))
+
+    def test_a_failing_write_rolls_back_alone(self):
+        kept, failed = self.submit_together(self.create('kept'), self.create('failed', fail=True))
+        self.assertIsInstance(kept, Product)
+        self.assertIsInstance(failed, ValueError)
+        self.assertEqual(list(Product.objects.values_list('title', flat=True)), ['kept'])
+        self.assertEqual(self.queue.stats()['failed'], 1)
+
+    def test_runs_inline_inside_a_transaction(self):
+        # the caller may hold the write lock already: queueing would deadlock
+        with transaction.atomic():
+            self.assertIs(self.queue.submit(threading.current_thread), threading.current_thread())
+        self.assertIsNot(self.queue.submit(threading.current_thread), threading.current_thread())
+
+    def test_after_write_runs_on_the_caller_once_committed(self):
+        seen = []
+
+        def write():
+            product = Product.objects.create(owner=self.owner, title='Lamp', description='', price=1)
+            after_write(lambda: seen.append(
+                (threading.current_thread(), Product.objects.filter(pk=product.pk).exists())
+            ))
+        self.queue.submit(write)
+        self.assertEqual(seen, [(threading.current_thread(), True)])
+
+    def test_feed_is_invalidated_after_the_batch_commits(self):
+        # a bump inside the batch would let a read cache the old feed under the new version
+        before = feed_version()
+        versions = []
+
+        def write():
+            Product.objects.create(owner=self.owner, title='Lamp', description='', price=1)
+            versions.append(feed_version())
+        self.queue.submit(write)
+        self.assertEqual(versions, [before])
+        self.assertGreater(feed_version(), before)
+
+    @override_settings(WRITE_QUEUE={'ENABLED': True})
+    def test_product_create_and_sessions_use_the_queue(self):
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        with mock.patch('nova_project.write_queue.write_queue', self.queue):
+            response = client.post('/products/api/products/', {
+                'title': 'Car', 'description': 'd', 'category': 'vehicle', 'price': '10',
+            }, format='multipart')
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(self.queue.stats()['written'], 1)
+
+            session = SessionStore()
+            session['otp_email'] = 'buyer@example.com'
+            session.save()
+            self.assertEqual(self.queue.stats()['written'], 2)
+        self.assertEqual(SessionStore(session.session_key)['otp_email'], 'buyer@example.com')
@@ -1,13 +1,24 @@
 # products/urls.py
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     
     # API endpoints
     path('api/products/', views.product_list_create, name='product-list-create'),        # GET & POST
     path('api/products/<int:id>/', views.product_detail, name='product-detail'),         # GET, PUT, PATCH, DELETE
+    path('api/products/batch/', views.product_batch, name='product-batch'),              # POST many writes at once
     path('api/products/feed/', views.product_feed, name='product-feed'),                 # public feed
+    path('api/products/search/', views.product_search, name='product-search'),           # full-text search
+
+    # bulk catalog (staff): multipart upload in, streamed CSV/JSONL out
+    path('api/catalog/import/', views.catalog_import, name='catalog-import'),
+    path('api/catalog/export.<str:fmt>', views.catalog_export, name='catalog-export'),
+
+    # async (ASGI) read endpoints, same payloads as above
+    path('api/async/products/', async_views.product_list, name='product-list-async'),
+    path('api/async/products/<int:id>/', async_views.product_detail, name='product-detail-async'),
+    path('api/async/products/feed/', async_views.product_feed, name='product-feed-async'),
     
     
     path('dashboard/', views.dashboard, name='dashboard'),
@@ -1,10 +1,16 @@
 # products/views.py
+import io
+
 from rest_framework.decorators import api_view, permission_classes, parser_classes
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from rest_framework import permissions, status
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404, render
-from rest_framework.exceptions import PermissionDenied
+from django.views.decorators.http import condition
+from rest_framework.exceptions import NotAuthenticated, NotFound, PermissionDenied, ValidationError
+from django.contrib.auth import get_user_model
+
+from nova_project.write_queue import queued_write
 
 
 
@@ -15,7 +21,54 @@ from rest_framework.exceptions import PermissionDenied
 
 
 from .models import Product
-from .serializers import ProductSerializer
+from .serializers import ProductSerializer, parse_fields, wants_live_fields
+from .pagination import ProductCursorPagination
+from .cache import cached_feed_page, feed_changed_at, feed_version
+from .filters import filter_products
+from .search import search_products
+from .conditional import is_read, make_etag, request_memo
+from .batch import apply_batch
+from .streaming import iter_json_array, streaming_json_response, streaming_response, wants_stream
+from .catalog import CatalogError, export_lines, export_rows, format_for, import_rows, read_rows
+
+User = get_user_model()
+
+CATALOG_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+def paginated_products(request, queryset, ordering=None):
+    """
+    Serialize one keyset page of `queryset` as a paginated Response.
+    Honours ?fields= (a list or a preset such as `compact`): unrequested
+    fields are neither rendered nor selected from the database.
+    """
+    fields = parse_fields(request.query_params.get('fields'))
+    paginator = ProductCursorPagination()
+    if ordering:
+        paginator.ordering = ordering
+    queryset = ProductSerializer.setup_queryset(queryset, fields, paginator.ordering)
+    page = paginator.paginate_queryset(queryset, request)
+    serializer = ProductSerializer(page, many=True, fields=fields, context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
+
+
+def listed_products(request, queryset, ordering=None):
+    """
+    paginated_products(), or with ?stream=true (authenticated callers only)
+    every match as one streamed JSON array (see products/streaming.py).
+    """
+    if not wants_stream(request):
+        return paginated_products(request, queryset, ordering)
+    if not request.user.is_authenticated:
+        raise NotAuthenticated("Streaming lists require authentication.")
+    fields = parse_fields(request.query_params.get('fields'))
+    ordering = ordering or ProductCursorPagination.ordering
+    queryset = ProductSerializer.setup_queryset(queryset, fields, ordering).order_by(*ordering)
+    return streaming_json_response(request, iter_json_array(queryset, request, fields))
+
 
 # API: list & create
 @api_view(['GET', 'POST'])
@@ -24,32 +77,63 @@ from .serializers import ProductSerializer
 def product_list_create(request):
     if request.method == 'GET':
         if request.user.is_authenticated and request.GET.get('my') == 'true':
-            products = Product.objects.filter(owner=request.user).order_by('-created_at')
+            products = Product.objects.filter(owner=request.user)
         else:
-            products = Product.objects.all().order_by('-created_at')
-        serializer = ProductSerializer(products, many=True, context={'request': request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
+            products = Product.objects.all()
+        products, ordering = filter_products(products, request.query_params)
+        return listed_products(request, products, ordering)
 
     # POST → create
     serializer = ProductSerializer(data=request.data, context={'request': request})
     if serializer.is_valid():
-        serializer.save(owner=request.user)
+        queued_write(serializer.save, owner=request.user)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+# API: batch create / update / delete of your own products (see products/batch.py)
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+@parser_classes([JSONParser])
+def product_batch(request):
+    operations = request.data.get('operations') if isinstance(request.data, dict) else None
+    applied, results = queued_write(apply_batch, request.user, operations)
+    if not applied:
+        return Response({"detail": "No operation was applied.", "results": results},
+                        status=status.HTTP_400_BAD_REQUEST)
+    return Response({"results": results}, status=status.HTTP_200_OK)
+
+
 # API: retrieve, update, delete
 
+def _detail_updated_at(request, id):
+    if not is_read(request) or wants_live_fields(request.GET):
+        return None
+    return request_memo(
+        request, 'product',
+        lambda: Product.objects.filter(id=id).values_list('updated_at', flat=True).first(),
+    )
+
+
+def _detail_etag(request, id):
+    updated_at = _detail_updated_at(request, id)
+    return make_etag(request, id, updated_at.isoformat()) if updated_at else None
+
+
+@condition(etag_func=_detail_etag, last_modified_func=_detail_updated_at)
 @api_view(['GET', 'PUT', 'PATCH', 'DELETE'])
 @permission_classes([permissions.IsAuthenticatedOrReadOnly])
 @parser_classes([MultiPartParser, FormParser])
 def product_detail(request, id):
-    product = get_object_or_404(Product, id=id)
-
     if request.method == 'GET':
-        serializer = ProductSerializer(product, context={'request': request})
+        fields = parse_fields(request.query_params.get('fields'))
+        products = ProductSerializer.setup_queryset(Product.objects.all(), fields, images='all')
+        product = get_object_or_404(products, id=id)
+        serializer = ProductSerializer(product, fields=fields, context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    product = get_object_or_404(Product.objects.with_owner().with_images(), id=id)
+
     if request.method in ['PUT', 'PATCH']:
         if not request.user.is_authenticated:
             raise PermissionDenied("Authentication credentials were not provided.")
@@ -77,12 +161,105 @@ def product_detail(request, id):
         return Response({"message": "Product deleted successfully"}, status=status.HTTP_204_NO_CONTENT)
 
 # API: feed (public)
+def _feed_is_valid(request):
+    # 400s must not carry validators; checking the filters and fields needs no query.
+    # Live fields (seller presence) change without the feed changing.
+    if wants_live_fields(request.GET):
+        return False
+    try:
+        filter_products(Product.objects.none(), request.GET)
+        parse_fields(request.GET.get('fields'))
+    except ValidationError:
+        return False
+    return True
+
+
+def _feed_etag(request):
+    # The feed-cache version moves on every product/image write, in the
+    # shared cache so every worker agrees on it, and the validator costs no
+    # database query at all.
+    if not is_read(request) or not _feed_is_valid(request):
+        return None
+    return make_etag(request, feed_version())
+
+
+def _feed_last_modified(request):
+    if not is_read(request) or not _feed_is_valid(request):
+        return None
+    return feed_changed_at()
+
+
+@condition(etag_func=_feed_etag, last_modified_func=_feed_last_modified)
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
 def product_feed(request):
-    products = Product.objects.all().order_by('-created_at')
-    serializer = ProductSerializer(products, many=True, context={'request': request})
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    # Anonymous hot path: serve serialized pages from the versioned feed cache.
+    def build():
+        products, ordering = filter_products(Product.objects.all(), request.query_params)
+        return paginated_products(request, products, ordering).data
+
+    data = build() if wants_live_fields(request.query_params) else cached_feed_page(request, build)
+    return Response(data, status=status.HTTP_200_OK)
+
+
+# API: full-text search (public)
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def product_search(request):
+    """
+    GET ?q=<text> — BM25-ranked matches on title/description, best first.
+    Accepts the same category/price filters as the feed; ?sort= overrides
+    relevance ordering.
+    """
+    query = (request.query_params.get('q') or '').strip()
+    if not query:
+        raise ValidationError({'q': 'This parameter is required.'})
+
+    products, ordering = filter_products(Product.objects.all(), request.query_params)
+    if not request.query_params.get('sort'):
+        ordering = ('rank', 'id')
+    return listed_products(request, search_products(products, query), ordering)
+
+
+# API: bulk catalog import / export (staff only; see products/catalog.py)
+@api_view(['POST'])
+@permission_classes([permissions.IsAdminUser])
+@parser_classes([MultiPartParser, FormParser])
+def catalog_import(request):
+    """
+    multipart: file=<products.csv | products.jsonl>, optional owner=<email>
+    for rows without an owner column. Valid rows are created in batches even
+    when others are rejected; the response lists the rejected lines.
+    """
+    upload = request.FILES.get('file')
+    if upload is None:
+        raise ValidationError({'file': 'This field is required.'})
+    fmt = format_for(upload.name)
+    if fmt is None:
+        raise ValidationError({'file': 'Expected a .csv or .jsonl file.'})
+
+    owner = None
+    if request.data.get('owner'):
+        owner = User.objects.filter(email=request.data['owner'].lower()).first()
+        if owner is None:
+            raise ValidationError({'owner': f"No user {request.data['owner']!r}."})
+
+    stream = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+    try:
+        report = import_rows(read_rows(stream, fmt), owner=owner)
+    except (CatalogError, UnicodeDecodeError) as exc:
+        raise ValidationError({'file': str(exc)})
+    return Response(report.as_dict(), status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def catalog_export(request, fmt):
+    if fmt not in CATALOG_CONTENT_TYPES:
+        raise NotFound()
+    response = streaming_response(request, export_lines(fmt, export_rows()), CATALOG_CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="products.{fmt}"'
+    return response
 
 
 # HTML dashboard view (protected; used under /products/dashboard/)
@@ -129,12 +306,33 @@ from rest_framework import viewsets, permissions
 from .models import Product
 from .serializers import ProductSerializer
 from .permissions import IsOwnerOrReadOnly
+from .pagination import ProductCursorPagination
+from .serializers import parse_fields
 
 class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all().order_by('-created_at')
+    queryset = Product.objects.all().order_by('-created_at', '-id')
     serializer_class = ProductSerializer
+    pagination_class = ProductCursorPagination
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
 
+    def get_queryset(self):
+        # lists render only the primary image; single objects render them all
+        if self.action == 'list':
+            fields = self.requested_fields()
+            return ProductSerializer.setup_queryset(self.queryset, fields, self.paginator.ordering)
+        if self.action == 'retrieve':
+            fields = self.requested_fields()
+            return ProductSerializer.setup_queryset(self.queryset, fields, images='all')
+        return self.queryset.with_owner().with_images()
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ('list', 'retrieve'):
+            kwargs.setdefault('fields', self.requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def requested_fields(self):
+        return parse_fields(self.request.query_params.get('fields'))
+
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
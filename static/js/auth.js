@@ -31,7 +31,9 @@ const Tokens = {
 const SignupState = {
   setEmail(email) { sessionStorage.setItem('signup_email', email); },
   getEmail()      { return sessionStorage.getItem('signup_email'); },
-  clear()         { sessionStorage.removeItem('signup_email'); }
+  setToken(token) { sessionStorage.setItem('signup_token', token); },
+  getToken()      { return sessionStorage.getItem('signup_token'); },
+  clear()         { sessionStorage.removeItem('signup_email'); sessionStorage.removeItem('signup_token'); }
 };
 
 // Generic JSON fetch with CSRF + session cookie (needed for OTP flow)
@@ -79,12 +81,13 @@ function bindSignupPage() {
     if (!email) return alert('Email is required');
 
     try {
-      // pure API: send only email here
-      await apiFetch('/users/api/send-otp/', {
+      // stateless: the server hands back a signed token instead of a session
+      const data = await apiFetch('/users/api/send-otp/', {
         method: 'POST',
-        body: { email }
+        body: { email, stateless: true }
       });
       SignupState.setEmail(email);
+      SignupState.setToken(data.signup_token);
       alert('OTP sent to your email');
       // Go to HTML page that contains the OTP form
       window.location.href = `/users/complete-otp/?email=${encodeURIComponent(email)}`;
@@ -111,10 +114,11 @@ function bindVerifyOtpPage() {
     if (!otp) return alert('Enter the OTP');
 
     try {
-      await apiFetch('/users/api/verify-otp/', {
+      const data = await apiFetch('/users/api/verify-otp/', {
         method: 'POST',
-        body: { otp } // backend reads email from session set in send-otp step
+        body: { otp, signup_token: SignupState.getToken() } // token carries the email
       });
+      SignupState.setToken(data.signup_token);
       alert('OTP verified!');
       window.location.href = '/users/update-password/';
     } catch (err) {
@@ -137,7 +141,7 @@ function bindSetPasswordPage() {
     try {
       const data = await apiFetch('/users/api/set-password/', {
         method: 'POST',
-        body: { password }
+        body: { password, signup_token: SignupState.getToken() }
       });
       // API returns { access_token, refresh_token }
       Tokens.set({ access: data.access_token, refresh: data.refresh_token });
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, Profile, OTP, PasswordResetSession
+from .models import User, Profile, PasswordResetSession
 
 
 @admin.register(User)
@@ -30,13 +30,6 @@ class ProfileAdmin(admin.ModelAdmin):
     search_fields = ["user__email", "nickname"]
 
 
-@admin.register(OTP)
-class OTPAdmin(admin.ModelAdmin):
-    list_display = ["email", "otp", "created_at"]
-    list_filter = ["created_at"]
-    search_fields = ["email"]
-
-
 @admin.register(PasswordResetSession)
 class PasswordResetSessionAdmin(admin.ModelAdmin):
     list_display = ["user", "is_verified", "created_at"]
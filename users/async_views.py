@@ -0,0 +1,87 @@
+# users/async_views.py
+"""
+Async (ASGI) login.
+
+PBKDF2 is deliberately slow CPU work. Run inline it would stall the event
+loop, and as a sync view under ASGI it would queue behind every other sync
+view on the one thread-sensitive executor. Here the user row comes from the
+async ORM and only the hash comparison goes to HASH_POOL, a small dedicated
+thread pool (settings.AUTH_HASH_THREADS), so hashing concurrency is bounded
+and the loop keeps serving other connections meanwhile.
+"""
+import asyncio
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from rest_framework.request import Request
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .throttling import check_throttles
+
+User = get_user_model()
+
+HASH_POOL = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'AUTH_HASH_THREADS', 4),
+    thread_name_prefix='auth-hash',
+)
+
+
+async def run_hasher(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(HASH_POOL, func, *args)
+
+
+async def aauthenticate(email, password):
+    """ModelBackend.authenticate() with the hashing moved to HASH_POOL."""
+    try:
+        user = await User._default_manager.aget_by_natural_key(email)
+    except User.DoesNotExist:
+        # Hash anyway so unknown emails take as long as wrong passwords.
+        await run_hasher(User().set_password, password)
+        return None
+    if not await run_hasher(user.check_password, password):
+        return None
+    return user if getattr(user, 'is_active', True) else None
+
+
+# Same contract as users.views.login_view; CSRF-exempt like the DRF view.
+@csrf_exempt
+@require_POST
+async def login_view(request):
+    """
+    Body: { "email": "...", "password": "..." }
+    """
+    request = Request(request, parsers=[JSONParser(), FormParser(), MultiPartParser()])
+    try:
+        data = request.data
+    except ParseError as exc:
+        return JsonResponse({"detail": exc.detail}, status=400)
+
+    email = (data.get("email") or "").strip().lower()
+    password = data.get("password")
+    if not email or not password:
+        return JsonResponse({"error": "Email and password are required"}, status=400)
+
+    wait = await sync_to_async(check_throttles)(request, 'login')
+    if wait is not None:
+        response = JsonResponse({"detail": "Request was throttled."}, status=429)
+        response['Retry-After'] = str(math.ceil(wait))
+        return response
+
+    user = await aauthenticate(email, password)
+    if user is None:
+        return JsonResponse({"error": "Invalid email or password"}, status=401)
+
+    refresh = RefreshToken.for_user(user)
+    return JsonResponse({
+        "message": "Login successful",
+        "access_token": str(refresh.access_token),
+        "refresh_token": str(refresh)
+    }, status=200)
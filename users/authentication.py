@@ -0,0 +1,70 @@
+# users/authentication.py
+"""
+JWT authentication that resolves request.user from the cache.
+
+SimpleJWT's JWTAuthentication loads the user by primary key on every
+request. CachedJWTAuthentication keeps the loaded User in the cache for
+AUTH_USER_CACHE_TIMEOUT seconds (default 60) under users:auth:<id>, so most
+authenticated hits cost no query. Any save or delete of the user drops the
+entry (users/signals.py), which covers is_active and password changes; bulk
+queryset.update() calls bypass signals and are bounded by the timeout.
+
+The save may be handled by any worker, so the entries live in
+AUTH_USER_CACHE_ALIAS, which must be a cache they all share.
+
+Tokens revoked at logout (users/revocation.py) are rejected here too.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .revocation import revocations
+
+USER_CACHE_TIMEOUT = getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 60)
+
+
+def user_cache():
+    return caches[getattr(settings, 'AUTH_USER_CACHE_ALIAS', 'default')]
+
+
+def user_cache_key(user_id):
+    return f'users:auth:{user_id}'
+
+
+def forget_user(user_id):
+    user_cache().delete(user_cache_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        jti = token.get(api_settings.JTI_CLAIM)
+        if jti and revocations.is_revoked(jti):
+            raise InvalidToken(_("Token has been revoked"))
+        return token
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)  # raises InvalidToken
+
+        key = user_cache_key(user_id)
+        cache = user_cache()
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(key, user, timeout=USER_CACHE_TIMEOUT)
+            return user
+
+        # same checks super() makes, against the cached row
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
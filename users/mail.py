@@ -0,0 +1,200 @@
+# users/mail.py
+"""
+Background outbound email.
+
+queue_mail() has send_mail()'s signature but returns as soon as the message
+is queued. A single daemon thread per process drains the queue in batches
+over one persistent backend connection (one SMTP login for many messages),
+retries failures with exponential backoff, and closes the connection again
+after IDLE_TIMEOUT seconds without mail.
+
+Settings (all optional), e.g.:
+    MAIL_QUEUE = {'BATCH_SIZE': 50, 'MAX_ATTEMPTS': 5, 'BACKOFF_SECONDS': 2, 'IDLE_TIMEOUT': 30}
+"""
+import atexit
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BATCH_SIZE': 50,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_SECONDS': 2.0,
+    'IDLE_TIMEOUT': 30.0,
+}
+
+
+def queue_setting(name):
+    return getattr(settings, 'MAIL_QUEUE', {}).get(name, DEFAULTS[name])
+
+
+class MailQueue:
+    def __init__(self, connection_factory=None, batch_size=None, max_attempts=None,
+                 backoff=None, idle_timeout=None):
+        self.connection_factory = connection_factory or (lambda: get_connection(fail_silently=False))
+        self.batch_size = batch_size or queue_setting('BATCH_SIZE')
+        self.max_attempts = max_attempts or queue_setting('MAX_ATTEMPTS')
+        self.backoff = backoff if backoff is not None else queue_setting('BACKOFF_SECONDS')
+        self.idle_timeout = idle_timeout if idle_timeout is not None else queue_setting('IDLE_TIMEOUT')
+
+        self._cond = threading.Condition()
+        self._ready = deque()        # (attempt, message)
+        self._delayed = []           # heap of (due_at, seq, attempt, message)
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._thread = None
+        self._stopping = False
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+
+    # ── producer side ────────────────────────────────────────────────────────
+    def enqueue(self, message):
+        with self._cond:
+            self._ready.append((0, message))
+            self._start()
+            self._cond.notify()
+
+    def depth(self):
+        """Messages not yet delivered (ready, waiting to retry, or sending)."""
+        with self._cond:
+            return len(self._ready) + len(self._delayed) + self._in_flight
+
+    def stats(self):
+        with self._cond:
+            return {
+                'queued': len(self._ready),
+                'retrying': len(self._delayed),
+                'in_flight': self._in_flight,
+                'sent': self.sent,
+                'failed': self.failed,
+                'retried': self.retried,
+                'worker_alive': bool(self._thread and self._thread.is_alive()),
+            }
+
+    def flush(self, timeout=10.0):
+        """Block until everything queued so far is delivered or given up on."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._ready or self._delayed or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self, timeout=10.0):
+        self.flush(timeout)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread:
+            thread.join(timeout)
+
+    def _start(self):
+        # Started lazily so every (forked) worker process gets its own thread.
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='mail-queue', daemon=True)
+            self._thread.start()
+
+    # ── worker side ──────────────────────────────────────────────────────────
+    def _run(self):
+        connection = None
+        while True:
+            batch = self._next_batch(connection_open=connection is not None)
+            if batch is None:
+                break
+            if not batch:
+                # idle: don't hold an SMTP session open forever
+                connection = self._close(connection)
+                continue
+            for attempt, message in batch:
+                try:
+                    if connection is None:
+                        connection = self.connection_factory()
+                        connection.open()
+                    connection.send_messages([message])
+                except Exception:
+                    logger.warning("Sending mail to %s failed (attempt %d)", message.to, attempt + 1, exc_info=True)
+                    connection = self._close(connection)
+                    self._retry(attempt + 1, message)
+                else:
+                    with self._cond:
+                        self.sent += 1
+                finally:
+                    with self._cond:
+                        self._in_flight -= 1
+                        self._cond.notify_all()
+        self._close(connection)
+
+    def _next_batch(self, connection_open):
+        """
+        Wait for work. Returns a batch of (attempt, message), [] when the
+        connection has been idle for idle_timeout, or None to stop.
+        """
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, _, attempt, message = heapq.heappop(self._delayed)
+                    self._ready.append((attempt, message))
+                if self._ready:
+                    size = min(self.batch_size, len(self._ready))
+                    batch = [self._ready.popleft() for _ in range(size)]
+                    self._in_flight += len(batch)
+                    return batch
+                if self._stopping:
+                    return None
+
+                timeout = self.idle_timeout if connection_open else None
+                if self._delayed:
+                    until_due = self._delayed[0][0] - now
+                    timeout = until_due if timeout is None else min(timeout, until_due)
+                notified = self._cond.wait(timeout)
+                if not notified and connection_open and not self._delayed and not self._ready:
+                    return []
+
+    def _retry(self, attempt, message):
+        with self._cond:
+            if attempt >= self.max_attempts:
+                self.failed += 1
+                logger.error("Giving up on mail to %s after %d attempts", message.to, attempt)
+                return
+            self.retried += 1
+            due = time.monotonic() + self.backoff * (2 ** (attempt - 1))
+            heapq.heappush(self._delayed, (due, next(self._seq), attempt, message))
+            self._cond.notify_all()
+
+    @staticmethod
+    def _close(connection):
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                logger.debug("Error closing mail connection", exc_info=True)
+        return None
+
+
+mail_queue = MailQueue()
+atexit.register(mail_queue.stop, 5.0)
+
+
+def queue_mail(subject, message, recipient_list, from_email=None):
+    """send_mail() that returns immediately; delivery happens on the mail thread."""
+    email = EmailMessage(
+        subject=subject,
+        body=message,
+        from_email=from_email or getattr(settings, 'DEFAULT_FROM_EMAIL', None),
+        to=recipient_list,
+    )
+    mail_queue.enqueue(email)
@@ -0,0 +1,16 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:34
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_profile_updated_at'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='OTP',
+        ),
+    ]
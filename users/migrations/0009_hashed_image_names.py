@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:21
+
+import products.images
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_delete_otp'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='profile_picture',
+            field=products.images.HashedImageField(blank=True, null=True, upload_to='profile_pics/'),
+        ),
+    ]
@@ -4,6 +4,8 @@ from django.utils import timezone
 from django.conf import settings
 import uuid
 
+from products.images import HashedImageField
+
 
 class UserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
@@ -41,24 +43,13 @@ class User(AbstractBaseUser, PermissionsMixin):
 class Profile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="profile")
     nickname = models.CharField(max_length=50, blank=True, null=True)
-    profile_picture = models.ImageField(upload_to="profile_pics/", blank=True, null=True)
+    profile_picture = HashedImageField(upload_to="profile_pics/", blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.user.email
 
 
-class OTP(models.Model):
-    email = models.EmailField()
-    otp = models.CharField(max_length=6)
-    created_at = models.DateTimeField(auto_now_add=True)
-
-    def is_expired(self):
-        return timezone.now() > self.created_at + timezone.timedelta(minutes=10)
-
-    def __str__(self):
-        return f"{self.email} - {self.otp}"
-
-
 class PasswordResetSession(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     session_token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
@@ -0,0 +1,131 @@
+# users/otp.py
+"""
+One-time codes kept in Django's cache, shared by every worker process.
+
+Each issued code is one cache entry with native expiry:
+    otp:<purpose>:<email>           -> salted HMAC of the code
+    otp:<purpose>:<email>:attempts  -> failed-guess counter (atomic incr)
+Lookups are a single cache get, nothing is written to the database, and
+codes vanish on their own after TTL_SECONDS. Signup and password reset use
+separate purposes, so a code issued for one can't be spent on the other.
+
+Settings (optional):
+    OTP = {'TTL_SECONDS': 600, 'MAX_ATTEMPTS': 5, 'CACHE_ALIAS': 'shared'}
+CACHE_ALIAS must name a cache every worker process sees (settings.CACHES
+'shared': Redis, or files on one host). With a per-process cache such as
+LocMemCache a code sent by one worker fails verification on the others.
+"""
+import enum
+import secrets
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+DEFAULTS = {
+    'TTL_SECONDS': 600,
+    'MAX_ATTEMPTS': 5,
+    'CACHE_ALIAS': 'default',
+}
+
+
+def otp_setting(name):
+    return getattr(settings, 'OTP', {}).get(name, DEFAULTS[name])
+
+
+class OTPResult(enum.Enum):
+    VALID = 'valid'
+    INVALID = 'invalid'      # wrong code, attempts left
+    MISSING = 'missing'      # never issued, expired or already used
+    LOCKED = 'locked'        # too many wrong guesses; code destroyed
+
+
+class OTPStore:
+    def __init__(self, purpose, ttl=None, max_attempts=None):
+        self.purpose = purpose
+        self.ttl = ttl or otp_setting('TTL_SECONDS')
+        self.max_attempts = max_attempts or otp_setting('MAX_ATTEMPTS')
+
+    @property
+    def cache(self):
+        return caches[otp_setting('CACHE_ALIAS')]
+
+    def _key(self, email):
+        return f'otp:{self.purpose}:{email.strip().lower()}'
+
+    def _digest(self, email, code):
+        return salted_hmac(f'otp:{self.purpose}', f'{email.strip().lower()}:{code}').hexdigest()
+
+    def issue(self, email):
+        """Create (or replace) the code for `email` and return it."""
+        code = f'{secrets.randbelow(1_000_000):06d}'
+        key = self._key(email)
+        self.cache.set_many({key: self._digest(email, code), f'{key}:attempts': 0}, timeout=self.ttl)
+        return code
+
+    def verify(self, email, code, consume=True):
+        key = self._key(email)
+        digest = self.cache.get(key)
+        if digest is None:
+            return OTPResult.MISSING
+
+        if constant_time_compare(digest, self._digest(email, (code or '').strip())):
+            if consume:
+                self.discard(email)
+            return OTPResult.VALID
+
+        try:
+            attempts = self.cache.incr(f'{key}:attempts')
+        except ValueError:  # counter evicted: start over
+            self.cache.set(f'{key}:attempts', 1, timeout=self.ttl)
+            attempts = 1
+        if attempts >= self.max_attempts:
+            self.discard(email)
+            return OTPResult.LOCKED
+        return OTPResult.INVALID
+
+    def discard(self, email):
+        key = self._key(email)
+        self.cache.delete_many([key, f'{key}:attempts'])
+
+
+signup_otps = OTPStore('signup')
+reset_otps = OTPStore('reset')
+
+
+# ── stateless signup ─────────────────────────────────────────────────────────
+# The signup flow can carry its state in a signed token instead of the
+# session: {'e': email, 'v': verified?, 'p': password fingerprint}. Nothing is
+# stored server-side, so any worker can handle any step.
+SIGNUP_TOKEN_SALT = 'users.signup'
+
+
+class SignupTokenError(Exception):
+    pass
+
+
+def password_fingerprint(user):
+    """Changes whenever the password does, which makes a verified token single-use."""
+    password = user.password if user is not None else ''
+    return salted_hmac(SIGNUP_TOKEN_SALT, password).hexdigest()[:16]
+
+
+def make_signup_token(email, verified=False, user=None):
+    payload = {'e': email, 'v': verified}
+    if verified:
+        payload['p'] = password_fingerprint(user)
+    return signing.dumps(payload, salt=SIGNUP_TOKEN_SALT)
+
+
+def read_signup_token(token, verified=False):
+    """Return the token's payload; raise SignupTokenError if bad, expired or at the wrong step."""
+    try:
+        payload = signing.loads(token, salt=SIGNUP_TOKEN_SALT, max_age=otp_setting('TTL_SECONDS'))
+    except signing.SignatureExpired:
+        raise SignupTokenError("Signup token expired. Please restart signup.")
+    except signing.BadSignature:
+        raise SignupTokenError("Invalid signup token.")
+    if verified and not payload.get('v'):
+        raise SignupTokenError("Access denied. Verify OTP first.")
+    return payload
@@ -0,0 +1,185 @@
+# users/revocation.py
+"""
+Revoked JWTs, keyed by jti.
+
+The authoritative store is the cache: one key per revoked token,
+    users:revoked:<jti>
+expiring when the token itself would (its `exp` claim), so the store never
+outgrows the set of still-valid tokens.
+
+Every authenticated request asks is_revoked(), so a per-process bloom filter
+sits in front of the store: a negative answer (almost every request) costs
+no cache round trip. To keep all workers' filters complete, revoke() also
+records (jti, exp) in a shared log and bumps a version number; each process
+checks that version at most every SYNC_INTERVAL seconds and rebuilds its
+filter from the log when it moved.
+
+The log is split into hourly buckets by token expiry,
+    users:revoked:log:<hour>  -> {jti: exp}
+so a revocation rewrites one bucket, not the whole log, and each bucket
+leaves the cache once its last token has expired; rebuilding skips them,
+which is how the filter "forgets". Appends take a short cache lock; one
+that can't get it raises instead of writing unlocked.
+
+CACHE_ALIAS must name a cache every worker process shares: a token revoked
+on logout in one worker has to be refused by all of them.
+
+Settings (optional):
+    TOKEN_REVOCATION = {'CAPACITY': 100000, 'ERROR_RATE': 0.01, 'SYNC_INTERVAL': 1.0, 'CACHE_ALIAS': 'shared'}
+"""
+import hashlib
+import math
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+
+REVOKED_KEY_PREFIX = 'users:revoked:'
+LOG_KEY_PREFIX = 'users:revoked:log:'
+LAST_BUCKET_KEY = 'users:revoked:log:last'
+VERSION_KEY = 'users:revoked:version'
+LOG_LOCK_KEY = 'users:revoked:log:lock'
+
+BUCKET_SECONDS = 3600
+# a holder that died lets go after LOCK_TIMEOUT, so waiting a bit longer
+# only fails when the log is really busy
+LOCK_TIMEOUT = 5
+LOCK_WAIT = LOCK_TIMEOUT + 1
+
+DEFAULTS = {
+    'CAPACITY': 100_000,
+    'ERROR_RATE': 0.01,
+    'SYNC_INTERVAL': 1.0,
+    'CACHE_ALIAS': 'default',
+}
+
+
+def revocation_setting(name):
+    return getattr(settings, 'TOKEN_REVOCATION', {}).get(name, DEFAULTS[name])
+
+
+class RevocationLogBusy(Exception):
+    """The shared log's lock could not be taken; the revocation was not logged."""
+
+
+def _bucket(exp):
+    return int(exp // BUCKET_SECONDS)
+
+
+class BloomFilter:
+    """Fixed-size bloom filter; k bit positions by double hashing one sha256."""
+
+    def __init__(self, capacity, error_rate):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.sha256(item.encode('utf-8')).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:16], 'big') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RevocationList:
+    def __init__(self, capacity=None, error_rate=None, sync_interval=None):
+        self.capacity = capacity or revocation_setting('CAPACITY')
+        self.error_rate = error_rate or revocation_setting('ERROR_RATE')
+        self.sync_interval = sync_interval if sync_interval is not None else revocation_setting('SYNC_INTERVAL')
+        self._lock = threading.Lock()
+        self._filter = BloomFilter(self.capacity, self.error_rate)
+        self._version = None
+        self._checked_at = 0.0
+
+    @property
+    def cache(self):
+        return caches[revocation_setting('CACHE_ALIAS')]
+
+    # ── writes ───────────────────────────────────────────────────────────────
+    def revoke(self, jti, exp):
+        """Revoke token `jti` until its expiry (a unix timestamp)."""
+        ttl = int(exp - time.time())
+        if ttl <= 0:
+            return
+        self.cache.set(f'{REVOKED_KEY_PREFIX}{jti}', 1, timeout=ttl)
+        self._append_to_log(jti, exp)
+        with self._lock:
+            self._filter.add(jti)
+
+    def revoke_token(self, token):
+        self.revoke(token['jti'], token['exp'])
+
+    def _append_to_log(self, jti, exp):
+        bucket = _bucket(exp)
+        key = f'{LOG_KEY_PREFIX}{bucket}'
+        with self._log_lock():
+            entries = self.cache.get(key) or {}
+            entries[jti] = exp
+            # kept until the last token it can hold has expired
+            self.cache.set(key, entries, timeout=int((bucket + 1) * BUCKET_SECONDS - time.time()) + 1)
+            last = self.cache.get(LAST_BUCKET_KEY)
+            if last is None or last < bucket:
+                self.cache.set(LAST_BUCKET_KEY, bucket, timeout=None)
+            try:
+                self.cache.incr(VERSION_KEY)
+            except ValueError:
+                self.cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+
+    @contextmanager
+    def _log_lock(self):
+        # Revocations are rare (logout), so a short cache lock is plenty.
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + LOCK_WAIT
+        while not self.cache.add(LOG_LOCK_KEY, token, timeout=LOCK_TIMEOUT):
+            if time.monotonic() > deadline:
+                raise RevocationLogBusy('Timed out waiting for the revocation log lock.')
+            time.sleep(0.01)
+        try:
+            yield
+        finally:
+            # ours only: after a stall past LOCK_TIMEOUT it may be someone else's
+            if self.cache.get(LOG_LOCK_KEY) == token:
+                self.cache.delete(LOG_LOCK_KEY)
+
+    # ── reads ────────────────────────────────────────────────────────────────
+    def is_revoked(self, jti):
+        self._sync()
+        with self._lock:
+            if jti not in self._filter:
+                return False
+        # maybe: ask the authoritative store (also weeds out false positives)
+        return self.cache.get(f'{REVOKED_KEY_PREFIX}{jti}') is not None
+
+    def _sync(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.sync_interval:
+            return
+        self._checked_at = now
+        cache = self.cache
+        version = cache.get(VERSION_KEY)
+        if version == self._version:
+            return
+        wall = time.time()
+        last = cache.get(LAST_BUCKET_KEY)
+        keys = [] if last is None else [f'{LOG_KEY_PREFIX}{b}' for b in range(_bucket(wall), last + 1)]
+        fresh = BloomFilter(self.capacity, self.error_rate)
+        for entries in cache.get_many(keys).values():
+            for jti, exp in entries.items():
+                if exp > wall:
+                    fresh.add(jti)
+        with self._lock:
+            self._filter = fresh
+            self._version = version
+
+
+revocations = RevocationList()
@@ -3,12 +3,23 @@ from rest_framework import serializers
 from .models import Profile
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
+from products.images import PROFILE_VARIANTS, variant_urls
+from chat.presence import PresenceField, PresenceListSerializer
 
 # Profile serializer (for viewing)
 class ProfileSerializer(serializers.ModelSerializer):
+    # resized WebP/JPEG URLs of the picture, for srcset
+    profile_picture_variants = serializers.SerializerMethodField(read_only=True)
+    # online / last seen, from chat presence (no database query)
+    presence = PresenceField(source="user_id")
+
     class Meta:
         model = Profile
-        fields = ["id", "nickname", "profile_picture"]
+        fields = ["id", "nickname", "profile_picture", "profile_picture_variants", "presence"]
+        list_serializer_class = PresenceListSerializer
+
+    def get_profile_picture_variants(self, obj):
+        return variant_urls(obj.profile_picture, PROFILE_VARIANTS, self.context.get("request"))
 
 
 # Profile update serializer (for editing nickname, profile picture, etc.)
@@ -1,5 +1,5 @@
 # users/signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.conf import settings
 
@@ -9,3 +9,17 @@ def create_user_profile(sender, instance, created, **kwargs):
     if created:
         from .models import Profile   # 👈 import inside function to avoid circular import
         Profile.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def forget_cached_auth_user(sender, instance, **kwargs):
+    # is_active / password / anything else may have changed
+    from .authentication import forget_user
+    forget_user(instance.pk)
+
+
+@receiver(post_save, sender="users.Profile")
+def generate_profile_picture_variants(sender, instance, **kwargs):
+    from products.images import PROFILE_VARIANTS, generate_variants_safely
+    generate_variants_safely(instance.profile_picture, PROFILE_VARIANTS)
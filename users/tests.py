@@ -1,3 +1,547 @@
-from django.test import TestCase
+import os
+import re
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from io import BytesIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail import EmailMessage
+from django.core.mail.backends.smtp import EmailBackend as SMTPBackend
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from nova_project.test_runner import run_in_other_process
+
+from .authentication import user_cache_key
+from .mail import MailQueue, mail_queue
+from .otp import OTPResult, OTPStore, reset_otps, signup_otps
+from .revocation import BUCKET_SECONDS, LOG_LOCK_KEY, BloomFilter, RevocationList, RevocationLogBusy, revocations
+from .throttling import parse_rate
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:  # optional: only needed for the SMTP stand-in tests
+    Controller = None
+
+User = get_user_model()
+
+
+def clear_caches():
+    # codes, revocations and throttle counters live in the shared cache
+    # (the test run's own directory, see nova_project/test_runner.py)
+    cache.clear()
+    caches['shared'].clear()
+
+
+class ProfilePictureVariantTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_profile_exposes_picture_variants(self):
+        user = User.objects.create_user(email='me@example.com', password='pass1234')
+        buffer = BytesIO()
+        Image.new('RGB', (900, 900)).save(buffer, 'PNG')
+        user.profile.profile_picture = SimpleUploadedFile('me.png', buffer.getvalue())
+        user.profile.save()
+
+        client = APIClient()
+        client.force_authenticate(user)
+        variants = client.get('/users/api/profile/').data['profile_picture_variants']
+        self.assertEqual(set(variants), {'thumb', 'card'})
+        self.assertTrue(variants['thumb']['jpg'].endswith('/thumb.jpg'))
+
+
+class ProfileConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='me@example.com', password='pass1234')
+        self.client.force_authenticate(self.user)
+
+    def test_own_profile_304_until_updated(self):
+        etag = self.client.get('/users/api/profile/')['ETag']
+        self.assertEqual(self.client.get('/users/api/profile/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.client.put('/users/api/profile/update/', {'nickname': 'new'}, format='multipart')
+        self.assertEqual(self.client.get('/users/api/profile/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_own_profile_etag_differs_between_users(self):
+        other = User.objects.create_user(email='other@example.com', password='pass1234')
+        mine = self.client.get('/users/api/profile/')['ETag']
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get('/users/api/profile/', HTTP_IF_NONE_MATCH=mine).status_code, 200)
+
+    def test_public_profile_304(self):
+        url = f'/users/api/profile/{self.user.profile.id}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class SMTPRecorder:
+    """aiosmtpd handler counting SMTP sessions (EHLOs) and delivered messages."""
+
+    def __init__(self):
+        self.sessions = 0
+        self.messages = []
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return '250 OK'
+
+
+class FlakyConnection:
+    """Backend stand-in that fails the first `failures` sends."""
+
+    def __init__(self, failures, log):
+        self.failures = failures
+        self.log = log
+
+    def open(self):
+        return True
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        if self.failures[0] > 0:
+            self.failures[0] -= 1
+            raise ConnectionError('server went away')
+        self.log.extend(messages)
+        return len(messages)
+
+
+@skipUnless(Controller, 'aiosmtpd is not installed')
+class MailQueueSMTPTests(TestCase):
+    def setUp(self):
+        self.handler = SMTPRecorder()
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        self.controller = Controller(self.handler, hostname='127.0.0.1', port=port)
+        self.controller.start()
+        self.addCleanup(self.controller.stop)
+        self.queue = MailQueue(
+            connection_factory=lambda: SMTPBackend(host='127.0.0.1', port=port, fail_silently=False),
+            idle_timeout=5,
+        )
+        self.addCleanup(self.queue.stop, 1)
+
+    def test_batch_is_sent_over_one_smtp_session(self):
+        for i in range(10):
+            self.queue.enqueue(EmailMessage(f'Code {i}', 'body', 'noreply@nova.com', [f'u{i}@example.com']))
+        self.assertTrue(self.queue.flush(5))
+        self.assertEqual(len(self.handler.messages), 10)
+        self.assertEqual(self.handler.sessions, 1)
+        self.assertEqual(self.queue.stats()['sent'], 10)
+        self.assertEqual(self.queue.depth(), 0)
+
+
+class MailQueueRetryTests(TestCase):
+    def test_failed_sends_are_retried_with_backoff(self):
+        failures, delivered = [2], []
+        queue = MailQueue(connection_factory=lambda: FlakyConnection(failures, delivered), backoff=0.01)
+        self.addCleanup(queue.stop, 1)
+        with self.assertLogs('users.mail', 'WARNING') as logs:
+            queue.enqueue(EmailMessage('hi', 'body', 'noreply@nova.com', ['a@example.com']))
+            self.assertTrue(queue.flush(5))
+        self.assertEqual(len(delivered), 1)
+        self.assertEqual(queue.stats()['retried'], 2)
+        self.assertEqual([record.levelname for record in logs.records], ['WARNING', 'WARNING'])
+        self.assertEqual([record.getMessage() for record in logs.records], [
+            "Sending mail to ['a@example.com'] failed (attempt 1)",
+            "Sending mail to ['a@example.com'] failed (attempt 2)",
+        ])
+
+    def test_gives_up_after_max_attempts(self):
+        queue = MailQueue(connection_factory=lambda: FlakyConnection([99], []), backoff=0.01, max_attempts=3)
+        self.addCleanup(queue.stop, 1)
+        with self.assertLogs('users.mail', 'WARNING') as logs:
+            queue.enqueue(EmailMessage('hi', 'body', 'noreply@nova.com', ['a@example.com']))
+            self.assertTrue(queue.flush(5))
+        self.assertEqual(queue.stats()['failed'], 1)
+        self.assertEqual([record.levelname for record in logs.records], ['WARNING'] * 3 + ['ERROR'])
+        self.assertEqual(logs.records[-1].getMessage(), "Giving up on mail to ['a@example.com'] after 3 attempts")
+
+
+class SendOTPQueueTests(TestCase):
+    def setUp(self):
+        clear_caches()
+
+    def test_send_otp_returns_before_delivery_and_mail_arrives(self):
+        response = APIClient().post('/users/api/send-otp/', {'email': 'new@example.com'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(mail_queue.flush(5))
+        self.assertEqual(mail.outbox[-1].to, ['new@example.com'])
+
+
+class OTPStoreTests(TestCase):
+    def setUp(self):
+        clear_caches()
+
+    def test_suite_never_touches_the_live_shared_cache(self):
+        location = settings.CACHES['shared']['LOCATION']
+        self.assertTrue(os.path.basename(location).startswith('nova-test-cache-'))
+        self.assertEqual(caches['shared']._dir, os.path.abspath(location))
+
+    def test_code_verifies_once_from_any_store_instance(self):
+        code = OTPStore('signup').issue('A@Example.com')
+        # a fresh instance stands in for another worker process
+        other = OTPStore('signup')
+        self.assertEqual(other.verify('a@example.com', code), OTPResult.VALID)
+        self.assertEqual(other.verify('a@example.com', code), OTPResult.MISSING)
+
+    def test_code_sent_by_one_process_verifies_in_another(self):
+        code = run_in_other_process("from users.otp import signup_otps; print(signup_otps.issue('a@example.com'))")
+        self.assertEqual(signup_otps.verify('a@example.com', code), OTPResult.VALID)
+
+    def test_purposes_are_separate(self):
+        code = OTPStore('signup').issue('a@example.com')
+        self.assertEqual(OTPStore('reset').verify('a@example.com', code), OTPResult.MISSING)
+
+    def test_wrong_guesses_lock_the_code(self):
+        store = OTPStore('signup', max_attempts=3)
+        code = store.issue('a@example.com')
+        wrong = '000000' if code != '000000' else '111111'
+        self.assertEqual(store.verify('a@example.com', wrong), OTPResult.INVALID)
+        self.assertEqual(store.verify('a@example.com', wrong), OTPResult.INVALID)
+        self.assertEqual(store.verify('a@example.com', wrong), OTPResult.LOCKED)
+        self.assertEqual(store.verify('a@example.com', code), OTPResult.MISSING)
+
+    def test_reissue_resets_attempts(self):
+        store = OTPStore('signup', max_attempts=2)
+        store.issue('a@example.com')
+        store.verify('a@example.com', 'nope')
+        code = store.issue('a@example.com')
+        self.assertEqual(store.verify('a@example.com', 'nope'), OTPResult.INVALID)
+        self.assertEqual(store.verify('a@example.com', code), OTPResult.VALID)
+
+    def test_code_expires(self):
+        store = OTPStore('signup', ttl=1)
+        code = store.issue('a@example.com')
+        time.sleep(1.1)
+        self.assertEqual(store.verify('a@example.com', code), OTPResult.MISSING)
+
+
+class OTPFlowTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def _mailed_code(self):
+        self.assertTrue(mail_queue.flush(5))
+        return re.search(r'\d{6}', mail.outbox[-1].body).group()
+
+    def test_signup_flow_without_database_codes(self):
+        self.client.post('/users/api/send-otp/', {'email': 'new@example.com'}, format='json')
+        code = self._mailed_code()
+
+        response = self.client.post('/users/api/verify-otp/', {'otp': code}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post('/users/api/set-password/', {'password': 'S3cure-pass!'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(User.objects.get(email='new@example.com').check_password('S3cure-pass!'))
+
+    def test_signup_verify_locks_after_max_attempts(self):
+        self.client.post('/users/api/send-otp/', {'email': 'new@example.com'}, format='json')
+        statuses = [
+            self.client.post('/users/api/verify-otp/', {'otp': 'x'}, format='json').status_code
+            for _ in range(5)
+        ]
+        self.assertEqual(statuses, [400, 400, 400, 400, 429])
+
+    def test_password_reset_flow(self):
+        user = User.objects.create_user(username='r', email='r@example.com', password='old-pass')
+        self.client.post('/users/api/password/request-otp/', {'email': user.email}, format='json')
+        code = self._mailed_code()
+
+        response = self.client.post('/users/api/password/verify-otp/', {'email': user.email, 'otp': code}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post('/users/api/password/reset/', {
+            'email': user.email, 'new_password': 'new-pass-123', 'session_token': response.data['session_token'],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.check_password('new-pass-123'))
+
+        # the code was spent on verification
+        self.assertEqual(reset_otps.verify(user.email, code), OTPResult.MISSING)
+
+
+class StatelessSignupTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+
+    def _start(self, email='new@example.com'):
+        response = self.client.post('/users/api/send-otp/', {'email': email, 'stateless': True}, format='json')
+        self.assertTrue(mail_queue.flush(5))
+        return response.data['signup_token'], re.search(r'\d{6}', mail.outbox[-1].body).group()
+
+    def test_flow_never_touches_the_session(self):
+        token, code = self._start()
+        response = self.client.post('/users/api/verify-otp/', {'otp': code, 'signup_token': token}, format='json')
+        self.assertEqual(response.status_code, 200)
+        token = response.data['signup_token']
+
+        response = self.client.post('/users/api/set-password/', {'password': 'S3cure-pass!', 'signup_token': token},
+                                    format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access_token', response.data)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+        self.assertFalse(Session.objects.exists())
+
+    def test_unverified_token_cannot_set_password(self):
+        token, _ = self._start()
+        response = self.client.post('/users/api/set-password/', {'password': 'x', 'signup_token': token}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_tampered_token_is_rejected(self):
+        token, code = self._start()
+        response = self.client.post('/users/api/verify-otp/', {'otp': code, 'signup_token': token + 'x'}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_verified_token_is_single_use(self):
+        token, code = self._start()
+        token = self.client.post('/users/api/verify-otp/', {'otp': code, 'signup_token': token},
+                                 format='json').data['signup_token']
+        first = self.client.post('/users/api/set-password/', {'password': 'one-pass-1', 'signup_token': token},
+                                 format='json')
+        second = self.client.post('/users/api/set-password/', {'password': 'two-pass-2', 'signup_token': token},
+                                  format='json')
+        self.assertEqual((first.status_code, second.status_code), (200, 403))
+        self.assertTrue(User.objects.get(email='new@example.com').check_password('one-pass-1'))
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(email='me@example.com', password='pass1234')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def _user_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/users/api/profile/')
+        self.assertEqual(response.status_code, 200)
+        return [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT') and 'FROM "users_user"' in q['sql']]
+
+    def test_user_lookup_served_from_cache(self):
+        self.assertEqual(len(self._user_queries()), 1)
+        self.assertEqual(self._user_queries(), [])
+
+    def test_deactivation_takes_effect_immediately(self):
+        self._user_queries()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/users/api/profile/').status_code, 401)
+
+    def test_password_change_drops_cached_user(self):
+        self._user_queries()
+        self.user.set_password('new-pass-123')
+        self.user.save()
+        self.assertIsNone(caches['shared'].get(user_cache_key(self.user.pk)))
+        self.assertEqual(len(self._user_queries()), 1)
+
+    def test_deactivation_in_another_worker_takes_effect_here(self):
+        self._user_queries()
+        # the other worker's save: the row changes, its signal drops the entry there
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        run_in_other_process(f'from users.authentication import forget_user; forget_user({self.user.pk})')
+        self.assertEqual(self.client.get('/users/api/profile/').status_code, 401)
+
+
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(email='me@example.com', password='pass1234')
+        self.refresh = RefreshToken.for_user(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        response = self.client.post('/users/api/logout/', {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/users/api/profile/').status_code, 401)
+
+        response = APIClient().post('/users/api/token/refresh/', {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_logout_with_bad_refresh_token_is_an_error(self):
+        response = self.client.post('/users/api/logout/', {'refresh': 'garbage'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_unrevoked_tokens_skip_the_store(self):
+        revocations.revoke('other-jti', time.time() + 60)
+        shared = caches['shared']
+        with mock.patch.object(shared, 'get', wraps=shared.get) as spy:
+            revocations._checked_at = time.monotonic()  # no resync due
+            self.assertFalse(revocations.is_revoked('unrelated-jti'))
+        spy.assert_not_called()
+
+    def test_other_workers_see_revocations_after_sync(self):
+        other = RevocationList(sync_interval=0)
+        self.assertFalse(other.is_revoked('jti-1'))
+        revocations.revoke('jti-1', time.time() + 60)
+        self.assertTrue(other.is_revoked('jti-1'))
+
+    def test_revocations_are_read_from_every_expiry_bucket(self):
+        other = RevocationList(sync_interval=0)
+        revocations.revoke('jti-soon', time.time() + 60)
+        revocations.revoke('jti-later', time.time() + 3 * BUCKET_SECONDS)
+        self.assertTrue(other.is_revoked('jti-soon'))
+        self.assertTrue(other.is_revoked('jti-later'))
+
+    def test_busy_log_lock_is_not_taken_over(self):
+        shared = caches['shared']
+        shared.set(LOG_LOCK_KEY, 'another-worker', timeout=5)
+        with mock.patch('users.revocation.LOCK_WAIT', 0.05):
+            with self.assertRaises(RevocationLogBusy):
+                revocations.revoke('jti-3', time.time() + 60)
+            self.assertEqual(shared.get(LOG_LOCK_KEY), 'another-worker')
+
+            response = self.client.post('/users/api/logout/', {'refresh': str(self.refresh)}, format='json')
+            self.assertEqual(response.status_code, 503)
+        self.assertEqual(shared.get(LOG_LOCK_KEY), 'another-worker')
+
+    def test_revocation_expires_with_the_token(self):
+        revocations.revoke('jti-2', time.time() + 1)
+        time.sleep(1.1)
+        self.assertFalse(RevocationList(sync_interval=0).is_revoked('jti-2'))
+
+
+class BloomFilterTests(TestCase):
+    def test_no_false_negatives_and_few_false_positives(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f'in-{i}')
+        self.assertTrue(all(f'in-{i}' in bloom for i in range(1000)))
+        false_positives = sum(f'out-{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        User.objects.create_user(email='me@example.com', password='pass1234')
+        self.client = APIClient()
+
+    def _login(self, email='me@example.com', password='wrong', ip='10.0.0.1'):
+        return self.client.post('/users/api/login/', {'email': email, 'password': password},
+                                format='json', REMOTE_ADDR=ip)
+
+    def test_per_email_limit_returns_429_with_retry_after(self):
+        statuses = [self._login(ip=f'10.0.0.{i}').status_code for i in range(6)]
+        self.assertEqual(statuses, [401] * 5 + [429])
+        response = self._login(ip='10.0.0.99')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+    def test_per_ip_limit_spans_emails(self):
+        statuses = [self._login(email=f'u{i}@example.com').status_code for i in range(21)]
+        self.assertEqual(statuses[-1], 429)
+        self.assertNotIn(429, statuses[:20])
+
+    def test_window_slides(self):
+        with mock.patch('users.throttling.time.time', return_value=6000.0):
+            for _ in range(5):
+                self._login()
+            self.assertEqual(self._login().status_code, 429)
+        # two windows later the old hits no longer count
+        with mock.patch('users.throttling.time.time', return_value=6120.0):
+            self.assertEqual(self._login().status_code, 401)
+
+    def test_limit_holds_across_worker_processes(self):
+        for i in range(5):
+            self._login(ip=f'10.0.0.{i}')
+        wait = run_in_other_process(
+            "from django.test import RequestFactory; from users.throttling import check_throttles; "
+            "print(check_throttles(RequestFactory().post('/', {'email': 'me@example.com'}), 'login'))"
+        )
+        self.assertNotEqual(wait, 'None')
+        self.assertGreater(float(wait), 0)
+
+    def test_token_endpoint_is_throttled(self):
+        for _ in range(5):
+            self.client.post('/users/api/token/', {'email': 'me@example.com', 'password': 'x'}, format='json')
+        response = self.client.post('/users/api/token/', {'email': 'me@example.com', 'password': 'x'}, format='json')
+        self.assertEqual(response.status_code, 429)
+
+    def test_login_page_is_throttled(self):
+        for _ in range(5):
+            self.client.post('/users/login/', {'email': 'me@example.com', 'password': 'x'})
+        response = self.client.post('/users/login/', {'email': 'me@example.com', 'password': 'x'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('5/min'), (5, 60))
+        self.assertEqual(parse_rate('3/10min'), (3, 600))
+        self.assertEqual(parse_rate('10/hour'), (10, 3600))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AsyncLoginTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(email='me@example.com', password='pass1234')
+        self.client = AsyncClient()
+
+    async def _login(self, email='me@example.com', password='pass1234'):
+        return await self.client.post('/users/api/async/login/', {'email': email, 'password': password},
+                                      content_type='application/json')
+
+    async def test_login_returns_tokens(self):
+        response = await self._login()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access_token', response.json())
+
+    async def test_bad_credentials(self):
+        self.assertEqual((await self._login(password='nope')).status_code, 401)
+        self.assertEqual((await self._login(email='ghost@example.com')).status_code, 401)
+        self.assertEqual((await self._login(password='')).status_code, 400)
+
+    async def test_inactive_user_cannot_log_in(self):
+        await User.objects.filter(pk=self.user.pk).aupdate(is_active=False)
+        self.assertEqual((await self._login()).status_code, 401)
+
+    async def test_password_check_runs_in_hash_pool(self):
+        threads = []
+        original = User.check_password
+
+        def spy(user, raw_password):
+            threads.append(threading.current_thread().name)
+            return original(user, raw_password)
+
+        with mock.patch.object(User, 'check_password', spy):
+            await self._login()
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('auth-hash'))
+
+    async def test_throttled(self):
+        for _ in range(5):
+            await self._login(password='nope')
+        response = await self._login(password='nope')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
@@ -0,0 +1,134 @@
+# users/throttling.py
+"""
+Sliding-window rate limits for the endpoints that hash passwords or send mail.
+
+Each endpoint names a throttle_scope; its limits come from
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']:
+    '<scope>'        per client IP
+    '<scope>_email'  per account (the email in the body, or request.user)
+e.g. 'login': '20/min', 'login_email': '5/10min'. A scope without a rate
+isn't throttled.
+
+The window is the usual two-bucket approximation: hits in the current fixed
+window plus the previous window's count weighted by how much of it still
+overlaps the sliding window. Counters are plain cache integers bumped with
+cache.incr, and a check is two cache reads and one increment. Rejected
+attempts count too, so a client that keeps hammering stays blocked.
+
+The counters must live in a cache every worker process shares
+(settings.THROTTLE_CACHE_ALIAS, 'shared'): with a per-process cache each
+worker keeps its own count and the effective limit is multiplied by the
+number of workers. incr is atomic on Redis; on the file-based fallback
+concurrent hits can occasionally be counted once.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'5/min' -> (5, 60); '3/10m' -> (3, 600)."""
+    num, period = rate.split('/')
+    digits = ''.join(ch for ch in period if ch.isdigit())
+    unit = period[len(digits):][:1]
+    if unit not in PERIODS:
+        raise ImproperlyConfigured(f"Bad throttle rate {rate!r}")
+    return int(num), int(digits or 1) * PERIODS[unit]
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    rate_suffix = ''
+
+    def get_rate(self, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if not scope:
+            return None
+        return api_settings.DEFAULT_THROTTLE_RATES.get(f'{scope}{self.rate_suffix}')
+
+    def get_cache_ident(self, request):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        self._wait = None
+        rate = self.get_rate(view)
+        ident = self.get_cache_ident(request) if rate else None
+        if ident is None:
+            return True
+
+        limit, duration = parse_rate(rate)
+        now = time.time()
+        window = int(now // duration)
+        elapsed = now - window * duration
+        key = f'throttle:{view.throttle_scope}{self.rate_suffix}:{ident}'
+
+        cache = caches[getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')]
+        previous = cache.get(f'{key}:{window - 1}', 0)
+        cache.add(f'{key}:{window}', 0, timeout=2 * duration)
+        try:
+            current = cache.incr(f'{key}:{window}')
+        except ValueError:  # evicted between add and incr
+            cache.set(f'{key}:{window}', 1, timeout=2 * duration)
+            current = 1
+
+        if previous * (duration - elapsed) / duration + current <= limit:
+            return True
+        self._wait = self._time_until_allowed(limit, duration, elapsed, previous, current)
+        return False
+
+    @staticmethod
+    def _time_until_allowed(limit, duration, elapsed, previous, current):
+        # when would one more hit fit, if nothing else arrives meanwhile?
+        if current + 1 <= limit:
+            fits_at = duration * (1 - (limit - current - 1) / previous)
+            return max(0.0, fits_at - elapsed)
+        next_window = duration * (1 - (limit - 1) / current) if limit > 0 else duration
+        return duration - elapsed + max(0.0, next_window)
+
+    def wait(self):
+        return self._wait
+
+
+def _digest(value):
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()[:24]
+
+
+class IPSlidingWindowThrottle(SlidingWindowThrottle):
+    def get_cache_ident(self, request):
+        return _digest(self.get_ident(request) or '')
+
+
+class EmailSlidingWindowThrottle(SlidingWindowThrottle):
+    rate_suffix = '_email'
+
+    def get_cache_ident(self, request):
+        data = getattr(request, 'data', None) or getattr(request, 'POST', {})
+        email = data.get('email') if hasattr(data, 'get') else None
+        if not email and getattr(request, 'user', None) is not None and request.user.is_authenticated:
+            email = request.user.email
+        if not email or not isinstance(email, str):
+            return None
+        return _digest(email.strip().lower())
+
+
+AUTH_THROTTLES = [IPSlidingWindowThrottle, EmailSlidingWindowThrottle]
+
+
+def check_throttles(request, scope, throttle_classes=AUTH_THROTTLES):
+    """
+    For plain Django views: seconds to wait if `request` is over any of the
+    scope's limits, else None.
+    """
+    view = type('ThrottledView', (), {'throttle_scope': scope})()
+    waits = []
+    for throttle_class in throttle_classes:
+        throttle = throttle_class()
+        if not throttle.allow_request(request, view):
+            waits.append(throttle.wait())
+    return max(waits) if waits else None
@@ -1,5 +1,5 @@
 # users/urls.py
-from . import views
+from . import async_views, views
 from django.urls import path
 from django.urls import path
 
@@ -21,11 +21,10 @@ from .views import update_password_page
 from django.urls import path
 from .views import complete_otp_page, update_password_page
 
-from .views import logout_api
-from rest_framework_simplejwt.views import TokenRefreshView
+from .views import logout_api, mail_queue_status
 from .views import (
     # JWT
-    MyTokenObtainPairView,
+    MyTokenObtainPairView, RevocableTokenRefreshView,
 
     # OTP signup flow (APIs)
     api_send_otp, api_verify_otp, api_set_password,
@@ -62,7 +61,7 @@ urlpatterns = [
     # API ENDPOINTS - Authentication & JWT
     # ============================================================================
     path('api/token/', MyTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/token/refresh/', RevocableTokenRefreshView.as_view(), name='token_refresh'),
     
     # OTP Signup Flow
     path('api/send-otp/', api_send_otp, name='api_send_otp'),
@@ -72,8 +71,10 @@ urlpatterns = [
     # Authentication
     path('api/signup/', signup_api, name='api_signup'),          # Classic signup (no OTP)
     path('api/login/', login_view, name='api_login'),
+    path('api/async/login/', async_views.login_view, name='api_login_async'),
     path('api/logout/', logout_api, name='api_logout'),
     path('api/get-my-token/', get_my_token, name='get_my_token'),
+    path('api/mail-queue/', mail_queue_status, name='mail_queue_status'),    # staff only
     
     # ============================================================================
     # API ENDPOINTS - Profile Management
@@ -1,23 +1,30 @@
 # users/views.py
+import math
+
 from django.conf import settings
-from django.core.mail import send_mail
 from django.shortcuts import render
-from django.utils import timezone
 from django.contrib.auth import authenticate, get_user_model
 
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes, parser_classes
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.decorators import api_view, permission_classes, parser_classes, throttle_classes, throttle_scope
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-
-from .models import OTP, Profile
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 
-import random
+from .models import Profile
+from .mail import mail_queue, queue_mail
+from .revocation import RevocationLogBusy, revocations
+from .throttling import AUTH_THROTTLES, check_throttles
+from .otp import (
+    OTPResult, SignupTokenError, make_signup_token, password_fingerprint, read_signup_token,
+    reset_otps, signup_otps,
+)
 
 User = get_user_model()
 
@@ -34,6 +41,21 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
 
 class MyTokenObtainPairView(TokenObtainPairView):
     serializer_class = MyTokenObtainPairSerializer
+    throttle_classes = AUTH_THROTTLES
+    throttle_scope = 'login'
+
+
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if revocations.is_revoked(refresh[api_settings.JTI_CLAIM]):
+            raise InvalidToken("Token has been revoked")
+        return super().validate(attrs)
+
+class RevocableTokenRefreshView(TokenRefreshView):
+    serializer_class = RevocableTokenRefreshSerializer
+    throttle_classes = AUTH_THROTTLES
+    throttle_scope = 'token_refresh'
 
 
 # ───────────────────────────────────────────────────────────────────────────────
@@ -41,6 +63,8 @@ class MyTokenObtainPairView(TokenObtainPairView):
 # 1) /users/api/send-otp/     -> POST { email }
 # 2) /users/api/verify-otp/   -> POST { otp }
 # 3) /users/api/set-password/ -> POST { password } -> returns JWT
+#    Stateless mode: send { email, stateless: true } in step 1 and pass the
+#    returned signup_token along in steps 2 and 3; the session is never used.
 # 4) /users/api/password/forgot/ -> POST { PASSWORD REST VIA OTP }
 # 5) /users/api/password/verify-otp/ -> POST {User verifies OTP}
 # 6) /users/api/password/reset/ -> POST  {User sets a new password}
@@ -48,47 +72,63 @@ class MyTokenObtainPairView(TokenObtainPairView):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(AUTH_THROTTLES)
+@throttle_scope('otp')
 def api_send_otp(request):
     """
-    Body: { "email": "user@example.com" }
-    Stores the email in the session for the next steps.
+    Body: { "email": "user@example.com", "stateless": false }
+    Stores the email in the session for the next steps, or with
+    stateless=true returns it in a signed signup_token instead.
     """
     email = (request.data.get('email') or '').strip().lower()
     if not email:
         return Response({"error": "Email is required"}, status=400)
 
-    # generate & save OTP
-    otp_code = str(random.randint(100000, 999999))
-    OTP.objects.create(email=email, otp=otp_code)
+    # generate OTP (cache entry with a TTL; replaces any earlier code)
+    otp_code = signup_otps.issue(email)
 
-    # keep state in session for next steps
-    request.session['otp_email'] = email
-    request.session.pop('otp_verified', None)
+    stateless = str(request.data.get('stateless', '')).lower() in ('1', 'true', 'yes')
+    if not stateless:
+        # keep state in session for next steps
+        request.session['otp_email'] = email
+        request.session.pop('otp_verified', None)
 
     # DEV: print to console; PROD: configure SMTP
     if getattr(settings, 'EMAIL_BACKEND', '') == 'django.core.mail.backends.console.EmailBackend':
         print(f"[DEV OTP] {email} -> {otp_code}")
 
-    # send email (will print to console if console backend)
-    send_mail(
+    # queued: the background mail thread does the SMTP round trip
+    queue_mail(
         subject='Your NOVA OTP Code',
         message=f'Your OTP is: {otp_code}',
         from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', None),
         recipient_list=[email],
-        fail_silently=True,
     )
 
-    return Response({"message": "OTP sent to email"}, status=200)
+    data = {"message": "OTP sent to email"}
+    if stateless:
+        data["signup_token"] = make_signup_token(email)
+    return Response(data, status=200)
 
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(AUTH_THROTTLES)
+@throttle_scope('otp_verify')
 def api_verify_otp(request):
     """
-    Body: { "otp": "123456" }
-    Uses session['otp_email'] from previous step.
+    Body: { "otp": "123456", "signup_token": "..." }
+    Uses session['otp_email'] from previous step, or the signup_token
+    (then the response carries a new, verified signup_token).
     """
-    email = request.session.get('otp_email')
+    token = request.data.get('signup_token')
+    if token:
+        try:
+            email = read_signup_token(token)['e']
+        except SignupTokenError as exc:
+            return Response({"error": str(exc)}, status=403)
+    else:
+        email = request.session.get('otp_email')
     if not email:
         return Response({"error": "Session expired. Please restart signup."}, status=403)
 
@@ -96,33 +136,43 @@ def api_verify_otp(request):
     if not input_otp:
         return Response({"error": "OTP is required"}, status=400)
 
-    try:
-        otp_obj = OTP.objects.filter(email=email).latest('created_at')
-    except OTP.DoesNotExist:
-        return Response({"error": "OTP not found. Please request a new one."}, status=404)
-
-    # expiry: 10 minutes
-    if timezone.now() > otp_obj.created_at + timezone.timedelta(minutes=10):
-        return Response({"error": "OTP expired. Please request a new one."}, status=400)
-
-    if otp_obj.otp != input_otp:
+    result = signup_otps.verify(email, input_otp)
+    if result is OTPResult.MISSING:
+        return Response({"error": "OTP expired or not found. Please request a new one."}, status=404)
+    if result is OTPResult.LOCKED:
+        return Response({"error": "Too many attempts. Please request a new OTP."}, status=429)
+    if result is OTPResult.INVALID:
         return Response({"error": "Invalid OTP"}, status=400)
 
-    request.session['otp_verified'] = True
-    return Response({"message": "OTP verified. You can set your password now."}, status=200)
+    data = {"message": "OTP verified. You can set your password now."}
+    if token:
+        data["signup_token"] = make_signup_token(
+            email, verified=True, user=User.objects.filter(email=email).only('password').first(),
+        )
+    else:
+        request.session['otp_verified'] = True
+    return Response(data, status=200)
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def api_set_password(request):
     """
-    Body: { "password": "strongpass" }
-    Requires session['otp_verified'] and session['otp_email'].
+    Body: { "password": "strongpass", "signup_token": "..." }
+    Requires session['otp_verified'] and session['otp_email'], or a
+    verified signup_token.
     Returns: access_token, refresh_token
     """
-    if not request.session.get('otp_verified'):
-        return Response({"error": "Access denied. Verify OTP first."}, status=403)
-
-    email = request.session.get('otp_email')
+    token = request.data.get('signup_token')
+    if token:
+        try:
+            claims = read_signup_token(token, verified=True)
+        except SignupTokenError as exc:
+            return Response({"error": str(exc)}, status=403)
+        email = claims['e']
+    else:
+        if not request.session.get('otp_verified'):
+            return Response({"error": "Access denied. Verify OTP first."}, status=403)
+        email = request.session.get('otp_email')
     if not email:
         return Response({"error": "Session expired. Please restart signup."}, status=403)
 
@@ -130,8 +180,14 @@ def api_set_password(request):
     if not password:
         return Response({"error": "Password is required"}, status=400)
 
+    user = User.objects.filter(email=email).first()
+    # the fingerprint changes once a password is set, so each token works once
+    if token and claims.get('p') != password_fingerprint(user):
+        return Response({"error": "Signup token already used. Please restart signup."}, status=403)
+
     # ✅ Create user and profile together
-    user, created = User.objects.get_or_create(email=email, defaults={"username": email})
+    if user is None:
+        user = User.objects.create(email=email, username=email)
     user.set_password(password)
     user.save()
 
@@ -142,10 +198,10 @@ def api_set_password(request):
         # Add other default fields if needed
     })
 
-    # Clear session state and old OTPs for that email
-    request.session.pop('otp_verified', None)
-    request.session.pop('otp_email', None)
-    OTP.objects.filter(email=email).delete()
+    # Clear session state (the OTP was consumed when it was verified)
+    if not token:
+        request.session.pop('otp_verified', None)
+        request.session.pop('otp_email', None)
 
     refresh = RefreshToken.for_user(user)
     return Response({
@@ -160,21 +216,20 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.contrib.auth import get_user_model
 from .models import PasswordResetSession
-import random
 
 User = get_user_model()
 
-# Dummy OTP storage (replace with Redis/DB in production)
-OTP_STORE = {}
-
-def generate_otp():
-    return str(random.randint(100000, 999999))
-
 def send_otp_to_email(email, otp):
-    # 🔥 Replace with real email service
-    print(f"[DEBUG] Sending OTP {otp} to {email}")
+    queue_mail(
+        subject='Your NOVA password reset code',
+        message=f'Your password reset OTP is: {otp}',
+        recipient_list=[email],
+    )
 
 class RequestOTPView(APIView):
+    throttle_classes = AUTH_THROTTLES
+    throttle_scope = 'otp'
+
     def post(self, request):
         email = request.data.get("email")
         try:
@@ -182,8 +237,7 @@ class RequestOTPView(APIView):
         except User.DoesNotExist:
             return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        otp = generate_otp()
-        OTP_STORE[email] = otp
+        otp = reset_otps.issue(email)
         send_otp_to_email(email, otp)
 
         # Create/reset session
@@ -195,6 +249,9 @@ class RequestOTPView(APIView):
 
 
 class VerifyOTPView(APIView):
+    throttle_classes = AUTH_THROTTLES
+    throttle_scope = 'otp_verify'
+
     def post(self, request):
         email = request.data.get("email")
         otp = request.data.get("otp")
@@ -204,7 +261,11 @@ class VerifyOTPView(APIView):
         except User.DoesNotExist:
             return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        if OTP_STORE.get(email) != otp:
+        result = reset_otps.verify(email, otp)
+        if result is OTPResult.LOCKED:
+            return Response({"error": "Too many attempts. Please request a new OTP."},
+                            status=status.HTTP_429_TOO_MANY_REQUESTS)
+        if result is not OTPResult.VALID:
             return Response({"error": "Invalid or expired OTP"}, status=status.HTTP_400_BAD_REQUEST)
 
         session, _ = PasswordResetSession.objects.get_or_create(user=user)
@@ -242,8 +303,6 @@ class ResetPasswordView(APIView):
 
         # Destroy session after successful reset
         session.delete()
-        if email in OTP_STORE:
-            del OTP_STORE[email]
 
         return Response({"message": "Password reset successful"}, status=status.HTTP_200_OK)
 
@@ -282,6 +341,8 @@ def signup_api(request):
 # ───────────────────────────────────────────────────────────────────────────────
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(AUTH_THROTTLES)
+@throttle_scope('login')
 def login_view(request):
     """
     Body: { "email": "...", "password": "..." }
@@ -314,19 +375,32 @@ from rest_framework.permissions import IsAuthenticated
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def logout_api(request):
-    # Optional: blacklist the refresh token if using SimpleJWT blacklist
+    # Revoke the refresh token (if sent) and the access token used for this call
+    refresh_token = request.data.get("refresh")
     try:
-        refresh_token = request.data.get("refresh")
         if refresh_token:
-            from rest_framework_simplejwt.tokens import RefreshToken
-            token = RefreshToken(refresh_token)
-            token.blacklist()
-    except Exception:
-        pass
+            try:
+                revocations.revoke_token(RefreshToken(refresh_token))
+            except TokenError as exc:
+                return JsonResponse({"error": str(exc)}, status=400)
+        if request.auth is not None:
+            revocations.revoke_token(request.auth)
+    except RevocationLogBusy:
+        # not every worker would refuse the tokens yet: the client must retry
+        return JsonResponse({"error": "Logout is busy, please try again."}, status=503)
 
     return JsonResponse({"message": "Logged out successfully"}, status=200)
 
 
+# ───────────────────────────────────────────────────────────────────────────────
+# MAIL QUEUE STATUS (staff only): depth and delivery counters for this process
+# ───────────────────────────────────────────────────────────────────────────────
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def mail_queue_status(request):
+    return Response({"depth": mail_queue.depth(), **mail_queue.stats()})
+
+
 # ───────────────────────────────────────────────────────────────────────────────
 # PROFILE API (JWT-protected example)
 # ───────────────────────────────────────────────────────────────────────────────
@@ -380,7 +454,15 @@ def login_page(request):
     if request.method == 'POST':
         email = request.POST.get('email')
         password = request.POST.get('password')
-        
+
+        wait = check_throttles(request, 'login')
+        if wait is not None:
+            response = render(request, 'users/login.html', {
+                'error': 'Too many login attempts. Please try again later.'
+            }, status=429)
+            response['Retry-After'] = str(math.ceil(wait))
+            return response
+
         user = authenticate(request, username=email, password=password)
         if user:
             auth_login(request, user)
@@ -449,6 +531,10 @@ def update_password_page(request):
 
 ## profile managment api endpoints
 
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from products.conditional import make_etag, request_memo
+from chat.presence import presence_changed_at
 from rest_framework import generics, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -460,6 +546,32 @@ from .serializers import (
 )
 
 
+def _own_profile_updated_at(request, *args, **kwargs):
+    return request_memo(
+        request, 'profile',
+        lambda: Profile.objects.filter(user_id=request.user.pk).values_list('updated_at', flat=True).first(),
+    )
+
+
+def _profile_validators(request, updated_at, user_id):
+    """(etag parts, last modified) of a profile, its embedded presence included."""
+    if not updated_at:
+        return None, None
+    changed_at = request_memo(request, 'presence', lambda: presence_changed_at(user_id))
+    return (updated_at.isoformat(), changed_at), max(filter(None, (updated_at, changed_at)))
+
+
+def _own_profile_etag(request, *args, **kwargs):
+    parts, _ = _profile_validators(request, _own_profile_updated_at(request), request.user.pk)
+    # same URL for every user, so the user is part of the validator
+    return make_etag(request, request.user.pk, *parts) if parts else None
+
+
+def _own_profile_last_modified(request, *args, **kwargs):
+    return _profile_validators(request, _own_profile_updated_at(request), request.user.pk)[1]
+
+
+@method_decorator(condition(etag_func=_own_profile_etag, last_modified_func=_own_profile_last_modified), name='get')
 class ProfileView(generics.RetrieveAPIView):
     serializer_class = ProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -493,6 +605,8 @@ class ProfileUpdateView(generics.UpdateAPIView):
 
 class ChangePasswordView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = AUTH_THROTTLES
+    throttle_scope = 'password_change'
 
     def put(self, request):
         serializer = ChangePasswordSerializer(
@@ -508,6 +622,24 @@ from .models import Profile
 from .serializers import ProfileSerializer
 
 
+def _public_profile_validators(request, id):
+    row = request_memo(
+        request, 'profile',
+        lambda: Profile.objects.filter(id=id).values_list('updated_at', 'user_id').first(),
+    )
+    return _profile_validators(request, *row) if row else (None, None)
+
+
+def _public_profile_etag(request, id):
+    parts, _ = _public_profile_validators(request, id)
+    return make_etag(request, id, *parts) if parts else None
+
+
+def _public_profile_last_modified(request, id):
+    return _public_profile_validators(request, id)[1]
+
+
+@method_decorator(condition(etag_func=_public_profile_etag, last_modified_func=_public_profile_last_modified), name='get')
 class PublicProfileView(generics.RetrieveAPIView):
     queryset = Profile.objects.all()
     serializer_class = ProfileSerializer